@@ -1,5 +1,6 @@
 import os
-from flask import Flask, request, jsonify
+import sys
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import google.generativeai as gen_ai
 from werkzeug.utils import secure_filename
@@ -7,9 +8,23 @@ from dotenv import load_dotenv
 import requests
 import json
 from datetime import datetime
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from deep_translator import GoogleTranslator
-from langdetect import detect, LangDetectException
+from deep_translator.exceptions import (
+    InvalidSourceOrTargetLanguage, LanguageNotSupportedException, NotValidLength, NotValidPayload
+)
+
+# Moderation helpers are shared with the standalone sentiment service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment'))
+from flood_detector import FloodDetector
+from language_detection import LanguageDetector, translator_code
+from moderation_config import ConfigWatcher, build_snapshot
+from moderation_metrics import ModerationMetrics
+from moderation_stream import ModerationStream, SessionError
+from translation_cache import TranslationCache
+from translator_pool import TranslatorPool
+from vader_lexicon import load_shared_analyzer
+from verdict_cache import VerdictCache
+from warning_store import WarningStore
 
 # Load environment variables
 load_dotenv()
@@ -22,9 +37,13 @@ CORS(app)  # Enable CORS for all routes
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# Moderation config and state live next to this file, whatever the working directory (e.g. under WSGI)
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+os.makedirs(CONFIG_DIR, exist_ok=True)
 ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg"}
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "f591331d90774632bd62007d40c997ab")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+MAX_BATCH_SIZE = 500  # messages accepted by /moderate-messages per request
 
 # Configure Google Gemini-Pro AI model
 if GOOGLE_API_KEY:
@@ -41,10 +60,30 @@ CATEGORY_MAP = {
 }
 
 class MessageModerator:
-    def __init__(self, config_path='config/moderation_config.json'):
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+    def __init__(self, config_path=os.path.join(CONFIG_DIR, 'moderation_config.json'),
+                 warnings_db_path=os.path.join(CONFIG_DIR, 'moderation_warnings.db'),
+                 translation_cache_path=os.path.join(CONFIG_DIR, 'translation_cache.db'),
+                 vader_lexicon_path=os.path.join(CONFIG_DIR, 'vader_lexicon.bin'),
+                 config_reload_interval=2.0, translator_factory=None):
+        self.sentiment_analyzer = load_shared_analyzer(vader_lexicon_path)
         self.config_path = config_path
-       ## self.load_config()
+        self.warning_store = WarningStore(warnings_db_path)
+        self.translation_cache = TranslationCache(translation_cache_path)
+        if translator_factory is None:
+            translator_factory = lambda source_lang: GoogleTranslator(source=translator_code(source_lang), target='en')
+        # Rejected languages and texts are not translator outages, so they stay out of the circuit breaker
+        self.translator_pool = TranslatorPool(translator_factory, input_errors=(
+            LanguageNotSupportedException, InvalidSourceOrTargetLanguage, NotValidPayload, NotValidLength
+        ))
+        self.language_detector = LanguageDetector()
+        self.metrics = ModerationMetrics()
+        self.flood_detector = FloodDetector()
+        self.verdict_cache = VerdictCache()
+        self.load_config()
+
+        self.config_watcher = None
+        if config_reload_interval:
+            self.config_watcher = ConfigWatcher(config_path, self.reload_config, config_reload_interval).start()
 
     def load_config(self):
         try:
@@ -57,90 +96,288 @@ class MessageModerator:
                     "moron", "boob", "ass", "dick", "nigga", "whore", 
                     "slut", "trash", "sucks", "make love", 
                     "हरामी", "गंवार", "बेवकूफ", "चोर"
-                ],
-                'user_sentiment_warnings': {}
+                ]
             }
             self.save_config()
 
+        legacy_warnings = self.config.pop('user_sentiment_warnings', None)
+        if legacy_warnings is not None:
+            self.warning_store.import_counts(legacy_warnings)
+            self.save_config()
+
+        self.compile_offensive_terms()
+
+    def reload_config(self, data):
+        config = json.loads(data)
+        snapshot = build_snapshot(config)
+        if snapshot.digest == self.snapshot.digest:
+            return False
+        self.config = config
+        self.apply_snapshot(snapshot)
+        print(f"Moderation config reloaded ({len(snapshot.offensive_terms)} offensive terms)")
+        return True
+
     def save_config(self):
         with open(self.config_path, 'w') as f:
             json.dump(self.config, f, indent=4)
 
     def detect_language(self, text):
-        try:
-            return detect(text)
-        except LangDetectException:
+        with self.metrics.time('language_detection'):
+            language, confidence = self.language_detector.detect(text)
+        if not self.language_detector.should_translate(language, confidence):
             return "en"
+        return language
 
     def translate_to_english(self, text, source_lang=None):
         if source_lang is None:
             source_lang = self.detect_language(text)
         
         if source_lang == "en":
-            return text
-
-        try:
-            return GoogleTranslator(source=source_lang, target='en').translate(text)
-        except Exception as e:
-            print(f"Translation error: {e}")
-            return text
-
-    def check_offensive_content(self, text):
-        lower_text = text.lower()
-        offensive_terms = self.config.get('offensive_terms', [])
-        return any(term in lower_text for term in offensive_terms)
-
-    def analyze_sentiment(self, text):
-        sentiment_scores = self.sentiment_analyzer.polarity_scores(text)
+            return text, "full"
+
+        with self.metrics.time('translation'):
+            cached = self.translation_cache.get(source_lang, text)
+            if cached is not None:
+                return cached, "full"
+
+            translated = self.translator_pool.translate(source_lang, text)
+            if not translated:
+                return text, "degraded"
+
+            self.translation_cache.set(source_lang, text, translated)
+        return translated, "full"
+
+    def translate_batch_to_english(self, texts, source_langs=None):
+        if source_langs is None:
+            source_langs = [self.detect_language(text) for text in texts]
+
+        translated = list(texts)
+        modes = ["full"] * len(texts)
+        groups = {}
+        with self.metrics.time('translation'):
+            deadline = self.translator_pool.deadline()
+            for index, source_lang in enumerate(source_langs):
+                if source_lang == "en":
+                    continue
+                cached = self.translation_cache.get(source_lang, texts[index])
+                if cached is not None:
+                    translated[index] = cached
+                else:
+                    groups.setdefault(source_lang, []).append(index)
+
+            for source_lang, indices in groups.items():
+                results = self.translator_pool.translate_batch(
+                    source_lang, [texts[index] for index in indices], deadline
+                )
+                for index, result in zip(indices, results):
+                    if result:
+                        translated[index] = result
+                        self.translation_cache.set(source_lang, texts[index], result)
+                    else:
+                        modes[index] = "degraded"
+        return translated, modes
+
+    def compile_offensive_terms(self):
+        self.apply_snapshot(build_snapshot(self.config))
+
+    def apply_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        self.verdict_cache.clear()
+        self.flood_detector.forget_analyses()
+
+    def check_offensive_content(self, text, snapshot=None):
+        matcher = (snapshot or self.snapshot).offensive_matcher
+        with self.metrics.time('lexicon'):
+            return matcher.contains(text)
+
+    def analyze_sentiment(self, text, snapshot=None):
+        with self.metrics.time('sentiment'):
+            sentiment_scores = self.sentiment_analyzer.polarity_scores(text)
         compound_score = sentiment_scores['compound']
+        snapshot = snapshot or self.snapshot
 
-        if compound_score <= -0.6:
+        if compound_score <= snapshot.very_negative_threshold:
             return "Very Negative", False, compound_score
-        elif -0.6 < compound_score <= -0.3:
+        elif compound_score <= snapshot.negative_threshold:
             return "Negative", False, compound_score
-        elif -0.3 < compound_score < 0.0:
+        elif compound_score < 0.0:
             return "Slightly Negative", "warning", compound_score
         elif compound_score == 0.0:
             return "Neutral", True, compound_score
         else:
             return "Positive", True, compound_score
 
-    def increment_user_warning(self, username):
-        if 'user_sentiment_warnings' not in self.config:
-            self.config['user_sentiment_warnings'] = {}
-        
-        current_warnings = self.config['user_sentiment_warnings'].get(username, 0)
-        current_warnings += 1
-        self.config['user_sentiment_warnings'][username] = current_warnings
-        self.save_config()
-        return current_warnings >= 3
+    def analyze_sentiments(self, texts, snapshot=None):
+        return [self.analyze_sentiment(text, snapshot) for text in texts]
+
+    def increment_user_warning(self, username, snapshot=None):
+        with self.metrics.time('warnings'):
+            current_warnings = self.warning_store.increment(username)
+        return current_warnings >= (snapshot or self.snapshot).block_after_warnings
+
+    def increment_user_warnings(self, usernames, snapshot=None):
+        with self.metrics.time('warnings'):
+            counts = self.warning_store.increment_many(usernames)
+        limit = (snapshot or self.snapshot).block_after_warnings
+        return [count >= limit for count in counts]
+
+    def get_user_warnings(self, username):
+        return self.warning_store.get(username)
 
     def reset_user_warnings(self, username):
-        if 'user_sentiment_warnings' in self.config:
-            self.config['user_sentiment_warnings'][username] = 0
-            self.save_config()
+        self.warning_store.reset(username)
 
     def moderate_message(self, text, username):
-        translated_text = self.translate_to_english(text)
+        with self.metrics.time('total'):
+            verdict = self._moderate_message(text, username)
+        self.metrics.record_verdict(verdict[0], verdict[3])
+        return verdict
+
+    def _moderate_message(self, text, username):
+        snapshot = self.snapshot
+
+        verdict, analysis, signature = self.precheck_message(text, username, snapshot)
+        if verdict is not None:
+            return verdict
+
+        if analysis is None:
+            analysis = self.analyze_text(text, snapshot)
+            self.remember_analysis(text, signature, analysis, snapshot)
+
+        return self.apply_analysis(analysis, username, snapshot)
+
+    def precheck_message(self, text, username, snapshot):
+        analysis = self.verdict_cache.get(text, snapshot.digest)
+
+        if analysis is None and self.check_offensive_content(text, snapshot):
+            analysis = (True, None, False, None, "full")
+            self.verdict_cache.set(text, analysis, snapshot.digest)
+        if analysis is not None and analysis[0]:
+            return None, analysis, None
+
+        signature, similar_analysis, flooding = self.flood_detector.check(text, username)
+        if flooding:
+            return (False, "Flooding detected: too many near-identical messages", None, "full"), None, signature
+
+        return None, analysis or similar_analysis, signature
+
+    def remember_analysis(self, text, signature, analysis, snapshot):
+        if analysis[4] == "full":
+            self.flood_detector.remember(signature, analysis)
+            self.verdict_cache.set(text, analysis, snapshot.digest)
+
+    def analyze_text(self, text, snapshot=None):
+        translated_text, mode = self.translate_to_english(text)
+
+        if mode == "degraded":
+            return False, None, True, None, mode
 
-        if self.check_offensive_content(translated_text):
-            return False, "Offensive content detected", None
+        if translated_text != text and self.check_offensive_content(translated_text, snapshot):
+            return True, None, False, None, mode
 
-        sentiment, allow_post, sentiment_score = self.analyze_sentiment(translated_text)
+        sentiment, allow_post, sentiment_score = self.analyze_sentiment(translated_text, snapshot)
+        return False, sentiment, allow_post, sentiment_score, mode
+
+    def apply_analysis(self, analysis, username, snapshot=None):
+        should_block = False
+        if self.needs_warning(analysis):
+            should_block = self.increment_user_warning(username, snapshot)
+        return self.verdict_from_analysis(analysis, should_block)
+
+    def needs_warning(self, analysis):
+        offensive, _, allow_post, _, mode = analysis
+        return not offensive and mode == "full" and not allow_post
+
+    def verdict_from_analysis(self, analysis, should_block=False):
+        offensive, sentiment, allow_post, sentiment_score, mode = analysis
+
+        if offensive:
+            return False, "Offensive content detected", None, mode
+
+        if mode == "degraded":
+            return True, "Message allowed (lexicon check only)", None, mode
 
         if not allow_post:
-            should_block = self.increment_user_warning(username)
             if should_block:
-                return False, f"Blocked due to repeatedly sending {sentiment} messages", sentiment_score
-            return False, f"{sentiment} message not allowed", sentiment_score
+                return False, f"Blocked due to repeatedly sending {sentiment} messages", sentiment_score, mode
+            return False, f"{sentiment} message not allowed", sentiment_score, mode
 
         if allow_post == "warning":
-            return "warning", "Slightly negative message", sentiment_score
-
-        return True, "Message allowed", sentiment_score
+            return "warning", "Slightly negative message", sentiment_score, mode
+
+        return True, "Message allowed", sentiment_score, mode
+
+    def moderate_messages(self, messages):
+        snapshot = self.snapshot
+        analyses = [None] * len(messages)
+
+        rejected = {}
+        signatures = {}
+        clean = []
+        for index, (text, username) in enumerate(messages):
+            verdict, analysis, signature = self.precheck_message(text, username, snapshot)
+            if verdict is not None:
+                rejected[index] = verdict
+            elif analysis is None:
+                clean.append(index)
+                signatures[index] = signature
+            else:
+                analyses[index] = analysis
+
+        originals = [messages[index][0] for index in clean]
+        translated, modes = self.translate_batch_to_english(originals)
+
+        pending = []
+        for index, original, translated_text, mode in zip(clean, originals, translated, modes):
+            if mode == "degraded":
+                analyses[index] = (False, None, True, None, mode)
+            elif translated_text != original and self.check_offensive_content(translated_text, snapshot):
+                analyses[index] = (True, None, False, None, mode)
+            else:
+                pending.append((index, translated_text))
+
+        sentiments = self.analyze_sentiments([translated_text for _, translated_text in pending], snapshot)
+        for (index, _), (sentiment, allow_post, sentiment_score) in zip(pending, sentiments):
+            analyses[index] = (False, sentiment, allow_post, sentiment_score, "full")
+
+        for index in clean:
+            self.remember_analysis(messages[index][0], signatures[index], analyses[index], snapshot)
+
+        negative = [index for index, analysis in enumerate(analyses) if analysis and self.needs_warning(analysis)]
+        should_block = dict(zip(negative, self.increment_user_warnings([messages[index][1] for index in negative], snapshot)))
+
+        verdicts = [
+            rejected[index] if index in rejected else self.verdict_from_analysis(analysis, should_block.get(index, False))
+            for index, analysis in enumerate(analyses)
+        ]
+        for is_allowed, _, _, mode in verdicts:
+            self.metrics.record_verdict(is_allowed, mode)
+        return verdicts
+
+    def render_metrics(self):
+        cache_stats = self.translation_cache.stats()
+        verdict_stats = self.verdict_cache.stats()
+        return self.metrics.render([
+            ('translation_cache_lookups_total', 'Translation cache lookups by result.', 'counter', {
+                (('result', 'memory_hit'),): cache_stats['memory_hits'],
+                (('result', 'disk_hit'),): cache_stats['disk_hits'],
+                (('result', 'miss'),): cache_stats['misses'],
+            }),
+            ('verdict_cache_lookups_total', 'Verdict cache lookups by result.', 'counter', {
+                (('result', 'hit'),): verdict_stats['hits'],
+                (('result', 'miss'),): verdict_stats['misses'],
+            }),
+            ('verdict_cache_entries', 'Analyses currently held in the verdict cache.', 'gauge', {
+                (): verdict_stats['entries'],
+            }),
+            ('translator_circuit_open', 'Whether the translator circuit breaker is open.', 'gauge', {
+                (): int(self.translator_pool.breaker.state == 'open'),
+            }),
+        ])
 
 # Initialize message moderator
 moderator = MessageModerator()
+stream = ModerationStream(moderator)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -276,19 +513,56 @@ def moderate_message():
     text = data['text']
     username = data['username']
 
-    is_allowed, reason, sentiment_score = moderator.moderate_message(text, username)
+    is_allowed, reason, sentiment_score, mode = moderator.moderate_message(text, username)
 
     response = {
         'success': is_allowed is True,
         'message': reason,
         'allow_post': is_allowed,
-        'sentiment_score': sentiment_score
+        'sentiment_score': sentiment_score,
+        'moderation_mode': mode
     }
 
     status_code = 200 if is_allowed is True else 403
 
     return jsonify(response), status_code
 
+@app.route('/moderate-messages', methods=['POST'])
+def moderate_messages():
+    data = request.json
+    if isinstance(data, dict):
+        data = data.get('messages')
+
+    if not isinstance(data, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('text'), str) and isinstance(item.get('username'), str)
+        for item in data
+    ):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires an array of objects with string text and username.'
+        }), 400
+
+    if len(data) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': f'Too many messages. At most {MAX_BATCH_SIZE} per request.'
+        }), 413
+
+    verdicts = moderator.moderate_messages([(item['text'], item['username']) for item in data])
+
+    results = [{
+        'success': is_allowed is True,
+        'message': reason,
+        'allow_post': is_allowed,
+        'sentiment_score': sentiment_score,
+        'moderation_mode': mode
+    } for is_allowed, reason, sentiment_score, mode in verdicts]
+
+    return jsonify({
+        'success': True,
+        'results': results
+    }), 200
+
 @app.route('/reset-warnings', methods=['POST'])
 def reset_user_warnings():
     data = request.json
@@ -317,21 +591,113 @@ def get_user_warnings():
             'message': 'Invalid input. Requires username.'
         }), 400
 
-    warnings = moderator.config.get('user_sentiment_warnings', {}).get(username, 0)
+    warnings = moderator.get_user_warnings(username)
 
     return jsonify({
         'success': True,
         'username': username,
-        'warning_count': warnings
+        'warning_count': warnings,
+        'window_seconds': moderator.warning_store.window_seconds
+    }), 200
+
+@app.route('/translation-cache-stats', methods=['GET'])
+def translation_cache_stats():
+    return jsonify({
+        'success': True,
+        'stats': moderator.translation_cache.stats()
+    }), 200
+
+@app.route('/verdict-cache-stats', methods=['GET'])
+def verdict_cache_stats():
+    return jsonify({
+        'success': True,
+        'stats': moderator.verdict_cache.stats()
     }), 200
 
+# Streaming sessions live in this process's memory: run the service as one process (app.run, or
+# gunicorn --workers 1 --threads N), or send every request of a session to the same worker (sticky sessions)
+@app.route('/moderation-sessions', methods=['POST'])
+def open_moderation_session():
+    data = request.json
+    if not data or 'username' not in data:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires username.'
+        }), 400
+
+    try:
+        session = stream.open_session(data['username'])
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return jsonify({
+        'success': True,
+        'session_id': session.session_id,
+        'events_url': f'/moderation-sessions/{session.session_id}/events',
+        'messages_url': f'/moderation-sessions/{session.session_id}/messages'
+    }), 201
+
+@app.route('/moderation-sessions/<session_id>/events', methods=['GET'])
+def moderation_session_events(session_id):
+    try:
+        stream.get_session(session_id)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return Response(stream_with_context(stream.events(session_id)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/moderation-sessions/<session_id>/messages', methods=['POST'])
+def moderation_session_messages(session_id):
+    data = request.json
+    texts = None
+    if isinstance(data, dict):
+        texts = [data['text']] if 'text' in data else data.get('messages')
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires text or an array of messages.'
+        }), 400
+
+    if len(texts) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': f'Too many messages. At most {MAX_BATCH_SIZE} per request.'
+        }), 413
+
+    try:
+        message_ids = stream.submit(session_id, texts)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return jsonify({
+        'success': True,
+        'message_ids': message_ids
+    }), 202
+
+@app.route('/moderation-sessions/<session_id>', methods=['DELETE'])
+def close_moderation_session(session_id):
+    try:
+        stream.get_session(session_id)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    stream.close_session(session_id)
+    return jsonify({
+        'success': True,
+        'message': f'Session {session_id} closed'
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(moderator.render_metrics(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    if not os.path.exists('config'):
-        os.makedirs('config')
-    
-    config_path = 'config/moderation_config.json'
+    config_path = os.path.join(CONFIG_DIR, 'moderation_config.json')
     if not os.path.exists(config_path):
         with open(config_path, 'w') as f:
-            json.dump({'offensive_terms': [], 'user_sentiment_warnings': {}}, f)
+            json.dump({'offensive_terms': []}, f)
     
     app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
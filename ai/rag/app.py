@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv
 from utils import DocumentProcessor
-import tempfile
+from collection_index import validate_name
+from ingestion_jobs import IngestionQueue, JobStore
+import threading
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
@@ -15,14 +17,45 @@ load_dotenv()
 # Get API key from environment variable
 api_key = os.getenv('GEMINI_API_KEY')
 
-# Initialize document processor
-try:
-    processor = DocumentProcessor(api_key)
-except ImportError as e:
-    print(f"Error initializing DocumentProcessor: {str(e)}")
-    print("Please install required dependencies with: pip install -r requirements.txt")
-    import sys
-    sys.exit(1)
+def answer_upload(vector_store, params):
+    """Answer an upload's context question (or summarize it) from its most relevant chunks."""
+    context = params.get('context')
+    question = context if context else 'please summarize the key points'
+    prompt = processor.build_grounded_prompt(vector_store, question, f"Based on the uploaded document, {question}")
+    return processor.ask_gemini(prompt)
+
+# Spawned PDF extraction workers import this module as __mp_main__; only the server starts the services
+if __name__ != '__mp_main__':
+    # Initialize document processor
+    try:
+        processor = DocumentProcessor(
+            api_key,
+            context_token_budget=int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', '2000')),
+            collection_memory_bytes=int(os.getenv('RAG_COLLECTION_MEMORY_MB', '1024')) * 1024 * 1024,
+            vector_index_mode=os.getenv('RAG_VECTOR_INDEX_MODE', 'ivf_sq8'),
+            quantize_above=int(os.getenv('RAG_QUANTIZE_ABOVE', '100000'))
+        )
+    except ImportError as e:
+        print(f"Error initializing DocumentProcessor: {str(e)}")
+        print("Please install required dependencies with: pip install -r requirements.txt")
+        import sys
+        sys.exit(1)
+
+    # Uploads are processed by background workers; clients poll the job for the answer
+    ingestion = IngestionQueue(
+        processor,
+        JobStore(os.getenv('RAG_JOB_DB', 'ingestion_jobs.db')),
+        spool_dir=os.getenv('RAG_UPLOAD_SPOOL', 'upload_spool'),
+        respond=answer_upload
+    )
+    ingestion.start()
+
+    # Load the recently busy collections (or RAG_PREWARM_COLLECTIONS, comma-separated) before their first query
+    prewarm_names = [name.strip() for name in os.getenv('RAG_PREWARM_COLLECTIONS', '').split(',') if name.strip()]
+    threading.Thread(
+        target=processor.collections.prewarm, args=(prewarm_names or None,),
+        name='collection-prewarm', daemon=True
+    ).start()
 
 @app.route('/api/chatbot/askdoubt', methods=['POST'])
 def ask_doubt():
@@ -30,6 +63,8 @@ def ask_doubt():
         data = request.json
         question = data.get('question')
         bot_type = data.get('botType')
+        document_id = data.get('documentId')
+        collection_name = data.get('collection')
 
         if not question:
             return jsonify({'success': False, 'message': 'No question provided'}), 400
@@ -44,6 +79,24 @@ def ask_doubt():
         else:
             prompt = f"Please answer this question: {question}"
 
+        # Follow-up questions about an uploaded document are answered from its stored index
+        if document_id:
+            try:
+                vector_store = processor.load_document_index(document_id)
+            except ValueError:
+                vector_store = None
+            if vector_store is None:
+                return jsonify({'success': False, 'message': 'Unknown document'}), 404
+            prompt = processor.build_grounded_prompt(vector_store, question, prompt)
+        elif collection_name:
+            try:
+                grounded = processor.build_collection_prompt(collection_name, question, prompt)
+            except ValueError:
+                grounded = None
+            if grounded is None:
+                return jsonify({'success': False, 'message': 'Unknown or empty collection'}), 404
+            prompt = grounded
+
         # Get response using ask_gemini method
         response = processor.ask_gemini(prompt)
         
@@ -70,38 +123,86 @@ def process_file():
         context = request.form.get('context', '')
         bot_type = request.form.get('botType', 'normal')
 
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            file.save(temp.name)
+        # Process file based on bot type
+        if bot_type == "math" and file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            response = "I've analyzed the math problem in your image. This appears to be a calculus problem involving differentiation."
+            return jsonify({
+                'success': True,
+                'data': {
+                    'response': response,
+                    'documentId': None
+                }
+            })
+
+        # Use RAG for regular document processing; extraction, embedding and the answer run in the background
+        job_id = ingestion.submit(file, {'context': context, 'botType': bot_type})
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'jobId': job_id,
+                'status': 'queued'
+            }
+        }), 202
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
 
-            # Process file based on bot type
-            if bot_type == "math" and file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                response = "I've analyzed the math problem in your image. This appears to be a calculus problem involving differentiation."
-            else:
-                # Use RAG for regular document processing
-                document_text = processor.read_file(temp.name)
-                chunks = processor.text_splitter.split_text(document_text)
-                vector_store = processor.embeddings.embed_documents(chunks)
+@app.route('/api/chatbot/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = ingestion.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'data': job})
 
-                # Create a question based on the context provided
-                prompt = f"Based on the uploaded document, {context if context else 'please summarize the key points'}"
+@app.route('/api/chatbot/collections/<collection_name>/documents/<document_id>', methods=['PUT'])
+def put_collection_document(collection_name, document_id):
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'message': 'No file provided'}), 400
 
-                # Get response using ask_gemini method
-                response = processor.ask_gemini(prompt)
-                
-                if response is None:
-                    return jsonify({'success': False, 'message': 'Failed to get response from AI model'}), 500
+        validate_name(collection_name)
+        validate_name(document_id)
+        # Extracted and embedded in the background like uploads; only chunks the collection does not hold yet are embedded
+        job_id = ingestion.submit(request.files['file'], {'collection': collection_name, 'documentId': document_id})
 
         return jsonify({
             'success': True,
             'data': {
-                'response': response
+                'jobId': job_id,
+                'status': 'queued'
             }
-        })
+        }), 202
 
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/chatbot/collections/<collection_name>/documents/<document_id>', methods=['DELETE'])
+def delete_collection_document(collection_name, document_id):
+    try:
+        removed = processor.remove_from_collection(collection_name, document_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not removed:
+        return jsonify({'success': False, 'message': 'Unknown document'}), 404
+    return jsonify({'success': True, 'data': {'removed': removed}})
+
+@app.route('/api/chatbot/collections', methods=['GET'])
+def get_collection_residency():
+    return jsonify({'success': True, 'data': processor.collections.stats()})
+
+@app.route('/api/chatbot/collections/<collection_name>', methods=['GET'])
+def get_collection(collection_name):
+    try:
+        collection = processor.collections.get(collection_name)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if collection is None:
+        return jsonify({'success': False, 'message': 'Unknown collection'}), 404
+    return jsonify({'success': True, 'data': dict(collection.stats(), documentIds=sorted(collection.documents))})
+
 @app.route('/api/chatbot/history', methods=['GET'])
 def get_history():
     # Mock history for now - would be replaced with database calls in production
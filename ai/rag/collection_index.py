@@ -0,0 +1,753 @@
+import argparse
+import base64
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from embedding_cache import chunk_hash
+from vector_index import (
+    INDEX_MODES, compare_indexes, finish_index, index_mode, new_index, sample_positions, set_nprobe, train_index,
+    vector_bytes
+)
+
+# An IVF index is retrained once the collection has grown to this many times the vectors it was trained on
+RETRAIN_GROWTH = 4
+
+# Vectors read back per batch while an index is rebuilt
+REBUILD_BATCH_SIZE = 4096
+
+# The change log is folded into a new snapshot once it reaches this fraction of the snapshot's size,
+# and never before it reaches LOG_MIN_BYTES
+LOG_SNAPSHOT_RATIO = 0.5
+LOG_MIN_BYTES = 4 * 1024 * 1024
+
+# Largest k the index report measures recall at
+MAX_REPORT_K = 100
+
+# Python objects kept per chunk (Document, docstore entry, ids); used to estimate index memory
+CHUNK_OVERHEAD_BYTES = 600
+
+# Collection names and document ids arrive in URLs; they also name directories
+NAME_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]{0,127}')
+
+
+def validate_name(name: str) -> str:
+    if not NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid name: {name!r}")
+    return name
+
+
+def chunk_ids(document_id: str, chunks: List[str]) -> List[str]:
+    """
+    Stable ids for a document's chunks: document id, chunk text hash and
+    occurrence number (for repeated chunks). An unchanged chunk keeps its
+    id when the document is updated, so its vector is kept.
+    """
+    seen: Dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        digest = chunk_hash(chunk).hex()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{document_id}/{digest}/{occurrence}")
+    return ids
+
+
+class CollectionIndex:
+    """
+    Long-lived FAISS index over a collection of documents (e.g. a
+    course's material), updated in place.
+    Adding a document appends only chunks the collection does not hold
+    yet. Removed chunks are tombstoned: they stay in the FAISS index but
+    are filtered out of searches, and are physically deleted once they
+    make up compact_ratio of the index.
+
+    On disk a collection is a snapshot (the FAISS index and a
+    manifest.json of documents, chunk ids and tombstones) plus
+    changes.jsonl, a log with one line per change since the snapshot
+    (the added chunks with their vectors, the tombstoned chunk ids). A
+    change only appends to the log; a new snapshot is written when the
+    log reaches LOG_SNAPSHOT_RATIO of the snapshot's size, and after a
+    compaction or rebuild.
+
+    vector_index (mode, quantize_above, nprobe, train_sample, pq_m)
+    switches large collections to a compact IVF index: once a collection
+    holds quantize_above live chunks its index is rebuilt in that mode,
+    trained on a sample of train_sample vectors, and retrained as it
+    keeps growing. It goes back to an exact flat index if it shrinks
+    below half the threshold. A quantized index cannot give back the
+    vectors it was built from, so their full-precision copies are kept in
+    the snapshot's vectors.npy (memory-mapped, not loaded) for rebuilds.
+    """
+
+    def __init__(self, directory: str, embeddings, settings: Dict[str, Any], compact_ratio: float = 0.2,
+                 write_lock: Optional[threading.RLock] = None, vector_index: Optional[Dict[str, Any]] = None):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.settings = settings
+        self.compact_ratio = compact_ratio
+        self.vector_index = vector_index or {'mode': 'flat'}
+        # Held by searches and by the brief in-memory updates: FAISS indexes are not safe to read while written
+        self.lock = threading.RLock()
+        # Serializes changes, which embed and save without holding lock
+        self._write_lock = write_lock or threading.RLock()
+        self.vector_store: Optional[FAISS] = None
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.tombstones: set = set()
+        # Mode of the current index and how many vectors it held when last (re)built
+        self.index_info: Dict[str, Any] = {'mode': 'flat', 'trained_on': 0}
+        # Bytes in the snapshot's index files and in the change log since
+        self._snapshot_bytes = 0
+        self._log_bytes = 0
+        # Full-precision vectors of a quantized index by position: the first _stored_count
+        # in _stored_vectors (vectors.npy), then those added since the snapshot
+        self._stored_vectors: Optional[np.ndarray] = None
+        self._stored_count = 0
+        self._added_vectors: List[np.ndarray] = []
+        # Directory of the vectors.npy written by the last rebuild, until a snapshot takes it over
+        self._rebuild_dir: Optional[str] = None
+        self._load()
+
+    def _backup_dir(self) -> str:
+        # Names never start with a dot, so this cannot be another collection
+        return os.path.join(os.path.dirname(self.directory), '.old-' + os.path.basename(self.directory))
+
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, 'changes.jsonl')
+
+    def _load(self) -> None:
+        backup = self._backup_dir()
+        if not os.path.exists(self.directory) and os.path.exists(backup):
+            # A save was interrupted between its two renames
+            os.rename(backup, self.directory)
+        manifest_path = os.path.join(self.directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest['settings'] != self.settings:
+            raise ValueError(f"Collection {os.path.basename(self.directory)} was built with different index settings")
+        self.documents = manifest['documents']
+        self.tombstones = set(manifest['tombstones'])
+        self.index_info = manifest.get('index', self.index_info)
+        if os.path.exists(os.path.join(self.directory, 'index.faiss')):
+            # Written by this service only, so the pickled docstore is trusted
+            self.vector_store = FAISS.load_local(self.directory, self.embeddings, allow_dangerous_deserialization=True)
+            set_nprobe(self.vector_store.index, self.vector_index.get('nprobe', 16))
+            self._open_vectors()
+        self._snapshot_bytes = self._index_file_bytes()
+        self._replay_log()
+
+    def _open_vectors(self, path: Optional[str] = None) -> None:
+        """Map the full-precision vectors at path (the snapshot's by default) as those of the current index."""
+        path = path or os.path.join(self.directory, 'vectors.npy')
+        self._added_vectors = []
+        if self.vector_store is None or self.index_info['mode'] == 'flat':
+            self._stored_vectors = None
+            self._stored_count = 0
+        elif os.path.exists(path):
+            self._stored_vectors = np.load(path, mmap_mode='r')
+            self._stored_count = len(self._stored_vectors)
+        else:
+            # Saved before the vectors were kept; _exact_vectors re-embeds these until the next snapshot
+            self._stored_vectors = None
+            self._stored_count = self.vector_store.index.ntotal
+
+    def _write_vectors(self, path: str, positions: Sequence[int]) -> None:
+        vectors = np.lib.format.open_memmap(
+            path, mode='w+', dtype='float32', shape=(len(positions), self.vector_store.index.d)
+        )
+        for start in range(0, len(positions), REBUILD_BATCH_SIZE):
+            vectors[start:start + REBUILD_BATCH_SIZE] = self._exact_vectors(positions[start:start + REBUILD_BATCH_SIZE])
+        vectors.flush()
+        del vectors
+
+    def _index_file_bytes(self) -> int:
+        return sum(
+            os.path.getsize(path) for path in
+            (os.path.join(self.directory, 'index.faiss'), os.path.join(self.directory, 'index.pkl'))
+            if os.path.exists(path)
+        )
+
+    def _replay_log(self) -> None:
+        """Apply the changes logged since the snapshot, in order."""
+        try:
+            with open(self._log_path(), 'r+b') as file:
+                data = file.read()
+                complete = data.rfind(b'\n') + 1
+                if complete < len(data):
+                    # Cut short by a crash while it was appended; drop it so the next change starts a fresh line
+                    file.truncate(complete)
+        except FileNotFoundError:
+            return
+        for line in data[:complete].split(b'\n')[:-1]:
+            change = json.loads(line)
+            if change['op'] == 'upsert':
+                additions = [
+                    (chunk_id, text, np.frombuffer(base64.b64decode(vector), dtype='float32'))
+                    for chunk_id, text, vector in change['added']
+                ]
+                self._apply_upsert(change['document_id'], change['document'], additions,
+                                   set(change['revived']), set(change['removed']))
+            else:
+                self._apply_delete(change['document_id'])
+            self._log_bytes += len(line) + 1
+
+    def _save(self) -> None:
+        parent = os.path.dirname(self.directory)
+        os.makedirs(parent, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=parent, prefix='.saving-')
+        try:
+            if self.vector_store is not None:
+                self.vector_store.save_local(temp_dir)
+                if self.index_info['mode'] != 'flat':
+                    self._write_vectors(os.path.join(temp_dir, 'vectors.npy'), np.arange(self.vector_store.index.ntotal))
+            manifest = {
+                'settings': self.settings,
+                'index': self.index_info,
+                'documents': self.documents,
+                'tombstones': sorted(self.tombstones)
+            }
+            with open(os.path.join(temp_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+                json.dump(manifest, file)
+            backup = self._backup_dir()
+            if os.path.exists(self.directory):
+                os.rename(self.directory, backup)
+            os.rename(temp_dir, self.directory)
+            shutil.rmtree(backup, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        # The snapshot holds every change so far; the log went with the old directory
+        self._snapshot_bytes = self._index_file_bytes()
+        self._log_bytes = 0
+        self._open_vectors()
+        if self._rebuild_dir is not None:
+            shutil.rmtree(self._rebuild_dir, ignore_errors=True)
+            self._rebuild_dir = None
+
+    def _persist(self, change: Dict[str, Any], restructured: bool) -> None:
+        """Append a change to the log, or write a snapshot when the index was rebuilt or the log is due for folding."""
+        if restructured or not os.path.exists(os.path.join(self.directory, 'manifest.json')):
+            self._save()
+            return
+        line = (json.dumps(change) + '\n').encode('utf-8')
+        with open(self._log_path(), 'ab') as file:
+            file.write(line)
+        self._log_bytes += len(line)
+        if self._log_bytes >= max(LOG_MIN_BYTES, LOG_SNAPSHOT_RATIO * self._snapshot_bytes):
+            self._save()
+
+    def _apply_upsert(self, document_id: str, document: Dict[str, Any],
+                      additions: List[Tuple[str, str, Sequence[float]]], revived: set, removed: set) -> None:
+        with self.lock:
+            if additions:
+                ids = [chunk_id for chunk_id, _, _ in additions]
+                text_embeddings = [(text, vector) for _, text, vector in additions]
+                metadatas = [{'document_id': document_id, 'chunk_id': chunk_id} for chunk_id in ids]
+                if self.vector_store is None:
+                    self.vector_store = FAISS.from_embeddings(
+                        text_embeddings, self.embeddings, metadatas=metadatas, ids=ids
+                    )
+                else:
+                    self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                if self.index_info['mode'] != 'flat':
+                    self._added_vectors.extend(np.asarray(vector, dtype='float32') for _, _, vector in additions)
+            self.tombstones.difference_update(revived)
+            self.tombstones.update(removed)
+            self.documents[document_id] = document
+
+    def _apply_delete(self, document_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            document = self.documents.pop(document_id, None)
+            if document is not None:
+                self.tombstones.update(document['chunk_ids'])
+            return document
+
+    def upsert(self, document_id: str, chunks: List[str], embed: Callable[[List[str]], List[List[float]]],
+               content_hash: Optional[str] = None) -> Dict[str, int]:
+        """
+        Add a document, or replace its previous version. Only chunks whose
+        ids are new are embedded (with embed); chunks the new version no
+        longer has are tombstoned. Returns the added/kept/removed counts.
+        """
+        validate_name(document_id)
+        new_ids = chunk_ids(document_id, chunks)
+        with self._write_lock:
+            old_ids = set(self.documents.get(document_id, {}).get('chunk_ids', []))
+            revived = set()
+            additions = []
+            for chunk_id, chunk in zip(new_ids, chunks):
+                if chunk_id in old_ids or chunk_id in revived:
+                    continue
+                if chunk_id in self.tombstones:
+                    # Tombstoned but not compacted yet: the vector is still in the index
+                    revived.add(chunk_id)
+                    continue
+                additions.append((chunk_id, chunk))
+            removed = old_ids - set(new_ids)
+
+            texts = [chunk for _, chunk in additions]
+            vectors = np.asarray(embed(texts), dtype='float32') if texts else []
+            additions = [(chunk_id, chunk, vector) for (chunk_id, chunk), vector in zip(additions, vectors)]
+            document = {
+                'chunk_ids': new_ids,
+                'content_hash': content_hash,
+                'text_bytes': sum(len(chunk.encode('utf-8')) for chunk in chunks),
+                'updated_at': time.time()
+            }
+            self._apply_upsert(document_id, document, additions, revived, removed)
+            self._persist({
+                'op': 'upsert',
+                'document_id': document_id,
+                'document': document,
+                'added': [
+                    [chunk_id, chunk, base64.b64encode(vector.tobytes()).decode('ascii')]
+                    for chunk_id, chunk, vector in additions
+                ],
+                'revived': sorted(revived),
+                'removed': sorted(removed)
+            }, self._maintain())
+        return {'added': len(additions), 'kept': len(new_ids) - len(additions), 'removed': len(removed)}
+
+    def delete(self, document_id: str) -> int:
+        """Remove a document; returns how many chunks were tombstoned (0 if it was not in the collection)."""
+        with self._write_lock:
+            document = self._apply_delete(document_id)
+            if document is None:
+                return 0
+            self._persist({'op': 'delete', 'document_id': document_id}, self._maintain())
+            return len(document['chunk_ids'])
+
+    def _target_mode(self, live: int) -> str:
+        mode = self.vector_index.get('mode', 'flat')
+        if mode == 'flat':
+            return 'flat'
+        threshold = self.vector_index['quantize_above']
+        if self.index_info['mode'] != 'flat':
+            # Hysteresis, so a collection near the threshold is not rebuilt back and forth
+            threshold //= 2
+        return mode if live >= threshold else 'flat'
+
+    def _maintain(self) -> bool:
+        """
+        After a change: switch index mode, retrain, or compact tombstones,
+        as needed. Returns whether the index was replaced or renumbered.
+        Caller holds the write lock.
+        """
+        if self.vector_store is None:
+            return False
+        total = self.vector_store.index.ntotal
+        live = total - len(self.tombstones)
+        if live <= 0:
+            with self.lock:
+                self.vector_store = None
+                self.tombstones = set()
+                self.index_info = {'mode': 'flat', 'trained_on': 0}
+            self._open_vectors()
+            return True
+        target = self._target_mode(live)
+        current = self.index_info['mode']
+        if target != current or (target != 'flat' and live >= RETRAIN_GROWTH * self.index_info['trained_on']):
+            self.rebuild(target)
+            return True
+        if self.tombstones and len(self.tombstones) >= self.compact_ratio * total:
+            self.compact()
+            return True
+        return False
+
+    def compact(self) -> None:
+        """Physically delete tombstoned vectors from the index."""
+        with self._write_lock:
+            if self.vector_store is None or not self.tombstones:
+                return
+            if self.index_info['mode'] != 'flat':
+                # IVF indexes do not renumber vectors on removal; rebuild them instead
+                self.rebuild(self.index_info['mode'])
+                return
+            with self.lock:
+                if len(self.tombstones) >= self.vector_store.index.ntotal:
+                    self.vector_store = None
+                else:
+                    self.vector_store.delete(list(self.tombstones))
+                self.tombstones = set()
+
+    def _exact_vectors(self, positions: Sequence[int]) -> np.ndarray:
+        """
+        Full-precision vectors at the given index positions: read back from
+        a flat index, or from the copies kept for a quantized one.
+        """
+        store = self.vector_store
+        positions = np.asarray(positions, dtype='int64')
+        if self.index_info['mode'] == 'flat':
+            return store.index.reconstruct_batch(positions)
+        vectors = np.empty((len(positions), store.index.d), dtype='float32')
+        stored = positions < self._stored_count
+        if self._stored_vectors is not None:
+            vectors[stored] = self._stored_vectors[positions[stored]]
+        elif stored.any():
+            texts = [
+                store.docstore.search(store.index_to_docstore_id[int(position)]).page_content
+                for position in positions[stored]
+            ]
+            vectors[stored] = self.embeddings.embed_documents(texts)
+        for row, position in zip(np.flatnonzero(~stored), positions[~stored]):
+            vectors[row] = self._added_vectors[position - self._stored_count]
+        return vectors
+
+    def rebuild(self, mode: str) -> None:
+        """
+        Rebuild the index in mode from the live chunks, dropping tombstoned
+        ones. The new index is built while searches go on against the
+        current one, then swapped in.
+        """
+        with self._write_lock:
+            store = self.vector_store
+            if store is None:
+                return
+            live = [
+                (position, chunk_id) for position, chunk_id in sorted(store.index_to_docstore_id.items())
+                if chunk_id not in self.tombstones
+            ]
+            if not live:
+                self._maintain()
+                return
+            positions = [position for position, _ in live]
+            settings = self.vector_index
+            sample = self._exact_vectors(
+                [positions[i] for i in sample_positions(len(positions), settings.get('train_sample', 50_000))]
+            )
+            index = new_index(mode, store.index.d, len(positions), sample, settings.get('pq_m', 48))
+            rebuild_dir = None
+            if mode != 'flat':
+                # The new index's full-precision vectors, in its order, until the next snapshot copies them
+                parent = os.path.dirname(self.directory)
+                os.makedirs(parent, exist_ok=True)
+                rebuild_dir = tempfile.mkdtemp(dir=parent, prefix='.rebuilding-')
+                kept = np.lib.format.open_memmap(
+                    os.path.join(rebuild_dir, 'vectors.npy'), mode='w+', dtype='float32',
+                    shape=(len(positions), store.index.d)
+                )
+            for start in range(0, len(positions), REBUILD_BATCH_SIZE):
+                batch = self._exact_vectors(positions[start:start + REBUILD_BATCH_SIZE])
+                index.add(batch)
+                if rebuild_dir is not None:
+                    kept[start:start + len(batch)] = batch
+            if rebuild_dir is not None:
+                kept.flush()
+                del kept
+            finish_index(index, settings.get('nprobe', 16))
+
+            rebuilt = FAISS(
+                store.embedding_function, index, store.docstore,
+                {new_position: chunk_id for new_position, (_, chunk_id) in enumerate(live)}
+            )
+            with self.lock:
+                dead = [chunk_id for chunk_id in store.index_to_docstore_id.values() if chunk_id in self.tombstones]
+                if dead:
+                    store.docstore.delete(dead)
+                self.vector_store = rebuilt
+                self.tombstones = set()
+                self.index_info = {'mode': index_mode(index), 'trained_on': len(positions)}
+            if self._rebuild_dir is not None:
+                shutil.rmtree(self._rebuild_dir, ignore_errors=True)
+            self._rebuild_dir = rebuild_dir
+            self._open_vectors(os.path.join(rebuild_dir, 'vectors.npy') if rebuild_dir else None)
+
+    def index_report(self, k: int = 10, queries: int = 200, nprobes: Sequence[int] = (4, 8, 16, 32, 64),
+                     max_vectors: int = 200_000) -> Dict[str, Any]:
+        """
+        Recall@k and latency of the configured compact index mode against
+        exact search, measured on (a sample of at most max_vectors of)
+        this collection's live vectors, for each nprobe in nprobes.
+        Trains a candidate index, so it is slow; run it offline (main).
+        """
+        if not 1 <= k <= MAX_REPORT_K:
+            raise ValueError(f"k must be between 1 and {MAX_REPORT_K}")
+        # Reading the kept vectors is quick; the write lock only keeps a rebuild from renumbering them meanwhile
+        with self._write_lock:
+            store = self.vector_store
+            if store is None:
+                raise ValueError("The collection is empty")
+            positions = [
+                position for position, chunk_id in sorted(store.index_to_docstore_id.items())
+                if chunk_id not in self.tombstones
+            ]
+            positions = [positions[i] for i in sample_positions(len(positions), max_vectors)]
+            vectors = np.concatenate([
+                self._exact_vectors(positions[start:start + REBUILD_BATCH_SIZE])
+                for start in range(0, len(positions), REBUILD_BATCH_SIZE)
+            ])
+            current_index = dict(self.index_info, vectors=store.index.ntotal)
+        settings = self.vector_index
+        mode = settings.get('mode', 'flat')
+        candidate = train_index(
+            vectors, mode, sample_size=settings.get('train_sample', 50_000),
+            pq_m=settings.get('pq_m', 48), nprobe=settings.get('nprobe', 16)
+        )
+        report = compare_indexes(vectors, candidate, k=k, queries=queries, nprobes=nprobes)
+        report['current_index'] = current_index
+        report['quantize_above'] = settings.get('quantize_above')
+        return report
+
+    def search_filter(self) -> Optional[Callable[[Dict[str, Any]], bool]]:
+        """Metadata filter that hides tombstoned chunks from searches, or None when there are none."""
+        if not self.tombstones:
+            return None
+        tombstones = frozenset(self.tombstones)
+        return lambda metadata: metadata.get('chunk_id') not in tombstones
+
+    def content_hash(self, document_id: str) -> Optional[str]:
+        document = self.documents.get(document_id)
+        return document.get('content_hash') if document else None
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the loaded index: vectors, chunk text and per-chunk bookkeeping."""
+        with self.lock:
+            if self.vector_store is None:
+                return 0
+            index = self.vector_store.index
+            text_bytes = sum(document.get('text_bytes', 0) for document in self.documents.values())
+            return index.ntotal * (vector_bytes(index) + CHUNK_OVERHEAD_BYTES) + text_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the document and chunk counts of the collection."""
+        with self.lock:
+            return {
+                'documents': len(self.documents),
+                'chunks': sum(len(document['chunk_ids']) for document in self.documents.values()),
+                'vectors': self.vector_store.index.ntotal if self.vector_store is not None else 0,
+                'tombstones': len(self.tombstones),
+                'index_mode': self.index_info['mode']
+            }
+
+
+class CollectionStore:
+    """
+    Namespaced collections on disk (one directory per classroom, user or
+    course) with a memory-bounded set resident in memory.
+    A collection is loaded on first use and the least recently used ones
+    are dropped from memory once the estimated size of those loaded
+    exceeds max_memory_bytes; collections being written are never
+    dropped. Last-use times are saved to usage.json so that prewarm()
+    can load the recently busy collections at startup.
+    """
+
+    def __init__(self, root_dir: str, embeddings, settings: Dict[str, Any],
+                 max_memory_bytes: int = 1024 * 1024 * 1024, usage_interval: float = 60.0,
+                 vector_index: Optional[Dict[str, Any]] = None):
+        self.root_dir = root_dir
+        self.embeddings = embeddings
+        self.settings = settings
+        self.vector_index = vector_index
+        self.max_memory_bytes = max_memory_bytes
+        self.usage_interval = usage_interval
+        os.makedirs(root_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, Tuple[CollectionIndex, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        # One lock per collection, kept across evictions: loads, writes and saves of a collection never overlap
+        self._write_locks: Dict[str, threading.RLock] = {}
+        self._usage_path = os.path.join(root_dir, 'usage.json')
+        self._usage: Dict[str, float] = self._load_usage()
+        self._usage_saved_at = time.monotonic()
+
+    def _load_usage(self) -> Dict[str, float]:
+        try:
+            with open(self._usage_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_usage(self) -> None:
+        """Write the collections' last-use times (read by prewarm on the next start)."""
+        with self._lock:
+            usage = dict(self._usage)
+            self._usage_saved_at = time.monotonic()
+        temp_path = self._usage_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(usage, file)
+        os.replace(temp_path, self._usage_path)
+
+    def _touch(self, name: str) -> None:
+        with self._lock:
+            self._usage[name] = time.time()
+            due = time.monotonic() - self._usage_saved_at >= self.usage_interval
+        if due:
+            self.save_usage()
+
+    def _write_lock(self, name: str) -> threading.RLock:
+        with self._lock:
+            return self._write_locks.setdefault(name, threading.RLock())
+
+    def exists(self, name: str) -> bool:
+        validate_name(name)
+        return (os.path.exists(os.path.join(self.root_dir, name))
+                or os.path.exists(os.path.join(self.root_dir, '.old-' + name)))
+
+    def get(self, name: str, create: bool = False, touch: bool = True) -> Optional[CollectionIndex]:
+        """
+        Return the named collection, loading it if needed, or None if it
+        does not exist and create is False. touch records the use.
+        """
+        validate_name(name)
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is not None:
+                self._resident.move_to_end(name)
+        if entry is not None:
+            if touch:
+                self._touch(name)
+            return entry[0]
+
+        write_lock = self._write_lock(name)
+        with write_lock:
+            with self._lock:
+                entry = self._resident.get(name)
+            if entry is not None:
+                collection = entry[0]
+            elif not create and not self.exists(name):
+                return None
+            else:
+                collection = CollectionIndex(
+                    os.path.join(self.root_dir, name), self.embeddings, self.settings,
+                    write_lock=write_lock, vector_index=self.vector_index
+                )
+                self._remember(name, collection)
+        if touch:
+            self._touch(name)
+        return collection
+
+    @contextmanager
+    def writing(self, name: str) -> Iterator[CollectionIndex]:
+        """Hold the named collection (created if needed) for a change; its size is re-counted afterwards."""
+        validate_name(name)
+        with self._write_lock(name):
+            collection = self.get(name, create=True)
+            try:
+                yield collection
+            finally:
+                self._remember(name, collection)
+
+    def _remember(self, name: str, collection: CollectionIndex) -> None:
+        size = collection.memory_bytes()
+        with self._lock:
+            if name in self._resident:
+                self._memory_bytes -= self._resident.pop(name)[1]
+            self._resident[name] = (collection, size)
+            self._memory_bytes += size
+            # Least recently used first; the newest entry stays even if it alone exceeds the budget
+            for candidate in list(self._resident)[:-1]:
+                if self._memory_bytes <= self.max_memory_bytes:
+                    break
+                candidate_lock = self._write_locks.get(candidate)
+                if candidate_lock is not None and not candidate_lock.acquire(blocking=False):
+                    continue
+                try:
+                    self._memory_bytes -= self._resident.pop(candidate)[1]
+                finally:
+                    if candidate_lock is not None:
+                        candidate_lock.release()
+
+    def _disk_bytes(self, name: str) -> int:
+        directory = os.path.join(self.root_dir, name)
+        try:
+            # vectors.npy is memory-mapped for rebuilds, not loaded
+            return sum(
+                entry.stat().st_size for entry in os.scandir(directory)
+                if entry.is_file() and entry.name != 'vectors.npy'
+            )
+        except FileNotFoundError:
+            return 0
+
+    def prewarm(self, names: Optional[List[str]] = None, limit: int = 100) -> List[str]:
+        """
+        Load collections before their first query: names, or else the
+        most recently used ones, up to limit collections and while their
+        size on disk (a close estimate of their size in memory) fits the
+        memory budget. Returns the names loaded.
+        """
+        if names is None:
+            with self._lock:
+                names = sorted(self._usage, key=self._usage.get, reverse=True)
+        loaded = []
+        for name in names[:limit]:
+            with self._lock:
+                if self._memory_bytes + self._disk_bytes(name) > self.max_memory_bytes:
+                    break
+            try:
+                if self.get(name, touch=False) is not None:
+                    loaded.append(name)
+            except Exception as e:
+                print(f"Could not prewarm collection {name}: {str(e)}")
+        with self._lock:
+            # Busiest last, so they are the last to be evicted
+            for name in reversed(loaded):
+                if name in self._resident:
+                    self._resident.move_to_end(name)
+        return loaded
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of resident collections and their estimated size."""
+        with self._lock:
+            return {
+                'resident_collections': len(self._resident),
+                'resident_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes
+            }
+
+
+def main(argv=None):
+    """Index report for a collection on disk: python collection_index.py collections/<name> --mode ivf_sq8"""
+    parser = argparse.ArgumentParser(
+        description='Recall@k and latency of a compact index mode against exact search on a stored collection'
+    )
+    parser.add_argument('directory', help='the collection directory, e.g. collections/physics')
+    parser.add_argument('--mode', default='ivf_sq8', choices=INDEX_MODES)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32, 64])
+    parser.add_argument('--pq-m', type=int, default=48, help='product quantizer bytes per vector')
+    parser.add_argument('--train-sample', type=int, default=50_000)
+    parser.add_argument('--max-vectors', type=int, default=200_000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--output', default='collection_index_report.json')
+    args = parser.parse_args(argv)
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    with open(os.path.join(args.directory, 'manifest.json'), 'r', encoding='utf-8') as file:
+        settings = json.load(file)['settings']
+    # Only needed to re-embed collections saved before their full-precision vectors were kept
+    embeddings = HuggingFaceEmbeddings(model_name=settings['embedding_model'])
+    collection = CollectionIndex(
+        args.directory.rstrip(os.sep), embeddings, settings,
+        vector_index={'mode': args.mode, 'train_sample': args.train_sample, 'pq_m': args.pq_m}
+    )
+    try:
+        report = collection.index_report(k=args.k, queries=args.queries, nprobes=args.nprobe,
+                                         max_vectors=args.max_vectors)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"{args.mode} on {report['vectors']} vectors: {report['index_bytes'] / 1e6:.1f} MB "
+          f"(exact {report['exact']['bytes'] / 1e6:.1f} MB), exact p50 {report['exact']['p50_ms']} ms")
+    for run in report['runs']:
+        print(f"  nprobe {run['nprobe']}: recall@{args.k} {run['recall_at_k']}, "
+              f"p50 {run['p50_ms']} ms, p95 {run['p95_ms']} ms")
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import csv
+import os
+import random
+import sys
+from typing import Iterator, List, Optional
+
+# Rows longer than the default 128KB field limit are real in exported marks sheets
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def format_record(headers: List[str], row: List[str]) -> str:
+    """One row as a "header: value" record; empty cells are left out."""
+    fields = []
+    for index, value in enumerate(row):
+        value = value.strip()
+        if not value:
+            continue
+        name = headers[index] if index < len(headers) and headers[index] else f"column {index + 1}"
+        fields.append(f"{name}: {value}")
+    return " | ".join(fields) + "\n"
+
+
+def _sample_rows(reader: Iterator[List[str]], sample_rows: int, seed: int) -> Iterator[List[str]]:
+    """
+    Uniform sample of sample_rows rows in one pass (reservoir sampling),
+    returned in file order. Memory is bounded by the sample size. The
+    seed is fixed so the same file always gives the same sample.
+    """
+    rng = random.Random(seed)
+    reservoir: List[tuple] = []
+    total = 0
+    for row in reader:
+        if len(reservoir) < sample_rows:
+            reservoir.append((total, row))
+        else:
+            slot = rng.randrange(total + 1)
+            if slot < sample_rows:
+                reservoir[slot] = (total, row)
+        total += 1
+    reservoir.sort(key=lambda item: item[0])
+    print(f"Sampled {len(reservoir)} of {total} CSV rows")
+    return (row for _, row in reservoir)
+
+
+def iter_csv_records(file_path: str, max_rows: Optional[int] = None, sample_above_bytes: Optional[int] = None,
+                     sample_rows: int = 20000, seed: int = 0) -> Iterator[str]:
+    """
+    Yield a CSV file's data rows as header-prefixed records, one per line.
+    The file is read row by row with the csv module. Files larger than
+    sample_above_bytes are reduced to a uniform sample of sample_rows
+    rows; otherwise reading stops after max_rows rows.
+    """
+    # utf-8-sig drops the byte order mark Excel puts at the start of its CSV exports
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace', newline='') as file:
+        reader = csv.reader(file)
+        headers = [header.strip() for header in next(reader, [])]
+
+        if sample_above_bytes is not None and os.path.getsize(file_path) > sample_above_bytes:
+            rows = _sample_rows(reader, sample_rows, seed)
+        else:
+            rows = reader
+
+        for count, row in enumerate(rows):
+            if max_rows is not None and count >= max_rows:
+                print(f"Stopped reading {file_path} at the {max_rows} row limit")
+                return
+            if any(value.strip() for value in row):
+                yield format_record(headers, row)
@@ -0,0 +1,106 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def chunk_hash(text: str) -> bytes:
+    """Binary SHA-256 of a chunk's text (32 bytes, used as the cache key)."""
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent chunk embedding cache in SQLite, keyed by (model name,
+    chunk text hash). Vectors are stored as raw little-endian float32
+    bytes, 1.5 KB for a 384-dimension MiniLM vector.
+    """
+
+    def __init__(self, db_path: str = "embedding_cache.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunk_embeddings ('
+            'model TEXT NOT NULL, '
+            'chunk_hash BLOB NOT NULL, '
+            'vector BLOB NOT NULL, '
+            'PRIMARY KEY (model, chunk_hash)) WITHOUT ROWID'
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors among hashes, keyed by hash."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT chunk_hash, vector FROM chunk_embeddings WHERE model = ? AND chunk_hash IN ({placeholders})',
+                    [model, *batch]
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype='<f4')
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[bytes, List[float]]]) -> None:
+        """Store (hash, vector) pairs for model."""
+        rows = [(model, key, np.asarray(vector, dtype='<f4').tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO chunk_embeddings (model, chunk_hash, vector) VALUES (?, ?, ?)', rows
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document chunks from an EmbeddingCache.
+    A batch is looked up in one pass and only the misses (deduplicated)
+    are sent to the underlying model. Queries are always embedded live.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [chunk_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, list(dict.fromkeys(hashes)))
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(self.model_name, zip(missing.keys(), computed))
+            for key, vector in zip(missing.keys(), computed):
+                vectors[key] = np.asarray(vector, dtype='<f4')
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [vectors[key].tolist() for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        """Return chunk cache hits and misses since startup."""
+        return {'hits': self.hits, 'misses': self.misses}
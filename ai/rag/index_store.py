@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_key(content_hash: str, settings: Dict[str, Any]) -> str:
+    """
+    Content address of a document index: the hash of the document bytes
+    plus every setting that shapes its chunks and vectors (splitter and
+    embedding model), so changing a setting never serves a stale index.
+    """
+    canonical = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{canonical}".encode('utf-8')).hexdigest()
+
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+class DocumentIndexStore:
+    """
+    Content-addressed store of per-document FAISS indexes.
+    Each entry is a directory holding the saved FAISS index and a
+    metadata.json with the chunk details. Entries are loaded lazily and
+    kept in an in-memory LRU bounded by max_memory_bytes (estimated from
+    vector and chunk text sizes).
+    """
+
+    def __init__(self, root_dir: str, embeddings, max_memory_bytes: int = 512 * 1024 * 1024):
+        self.root_dir = root_dir
+        self.embeddings = embeddings
+        self.max_memory_bytes = max_memory_bytes
+        os.makedirs(root_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[FAISS, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        # One lock per key being built, so concurrent uploads of a document embed it once
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def _entry_dir(self, key: str) -> str:
+        # Keys arrive from clients as document ids; never let one name another path
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid index key: {key!r}")
+        return os.path.join(self.root_dir, key)
+
+    @staticmethod
+    def _estimate_bytes(vector_store: FAISS, metadata: Dict[str, Any]) -> int:
+        index = vector_store.index
+        return index.ntotal * index.d * 4 + metadata.get('text_bytes', 0)
+
+    def _remember(self, key: str, vector_store: FAISS, metadata: Dict[str, Any]) -> None:
+        size = self._estimate_bytes(vector_store, metadata)
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (vector_store, size)
+            self._memory_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+    def contains(self, key: str) -> bool:
+        """Whether an index is stored for key (in memory or on disk)."""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(os.path.join(self._entry_dir(key), 'metadata.json'))
+
+    def metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored metadata for key, or None."""
+        try:
+            with open(os.path.join(self._entry_dir(key), 'metadata.json'), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def get(self, key: str) -> Optional[FAISS]:
+        """Return the index stored for key, loading it from disk if needed, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[0]
+
+        metadata = self.metadata(key)
+        if metadata is None:
+            return None
+        # Entries are written by this service only, so their pickled docstore is trusted
+        vector_store = FAISS.load_local(self._entry_dir(key), self.embeddings, allow_dangerous_deserialization=True)
+        self._remember(key, vector_store, metadata)
+        return vector_store
+
+    def put(self, key: str, vector_store: FAISS, metadata: Dict[str, Any]) -> None:
+        """Save an index under key. The entry directory appears atomically."""
+        metadata = dict(metadata, created_at=time.time())
+        temp_dir = tempfile.mkdtemp(dir=self.root_dir, prefix='.building-')
+        try:
+            vector_store.save_local(temp_dir)
+            with open(os.path.join(temp_dir, 'metadata.json'), 'w', encoding='utf-8') as file:
+                json.dump(metadata, file, indent=2)
+            try:
+                os.rename(temp_dir, self._entry_dir(key))
+            except OSError:
+                # Another worker stored the same content first; its entry is identical
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        self._remember(key, vector_store, metadata)
+
+    def get_or_build(self, key: str, build: Callable[[], Tuple[FAISS, Dict[str, Any]]]) -> Tuple[FAISS, bool]:
+        """
+        Return (index, built) for key, calling build() only when no index
+        is stored yet. build returns (vector_store, metadata).
+        """
+        vector_store = self.get(key)
+        if vector_store is not None:
+            return vector_store, False
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            vector_store = self.get(key)
+            if vector_store is not None:
+                return vector_store, False
+            try:
+                vector_store, metadata = build()
+                self.put(key, vector_store, metadata)
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+        return vector_store, True
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of resident indexes and their estimated size."""
+        with self._lock:
+            return {'resident_indexes': len(self._memory), 'resident_bytes': self._memory_bytes}
@@ -0,0 +1,377 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.vectorstores import FAISS
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+
+class JobStore:
+    """
+    SQLite-backed queue of ingestion jobs.
+    A job is claimed by setting it to running with a lease, which its
+    worker renews while it holds the job. A job whose lease runs out
+    (its worker process died) is claimed again, up to max_attempts times.
+    Each claim is identified by the job's attempt number: updates from
+    an earlier claim of a job that was claimed again are ignored.
+    """
+
+    def __init__(self, db_path: str = "ingestion_jobs.db", lease_seconds: float = 600, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS ingestion_jobs ('
+            'id TEXT PRIMARY KEY, '
+            'status TEXT NOT NULL, '
+            'stage TEXT NOT NULL, '
+            'progress REAL NOT NULL DEFAULT 0, '
+            'file_path TEXT NOT NULL, '
+            'filename TEXT, '
+            'params TEXT NOT NULL, '
+            'result TEXT, '
+            'error TEXT, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'lease_until REAL, '
+            'created_at REAL NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ingestion_jobs_status ON ingestion_jobs (status, created_at)')
+        self._conn.commit()
+
+    def create(self, file_path: str, filename: str, params: Dict[str, Any]) -> str:
+        """Queue a job for the uploaded file at file_path and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO ingestion_jobs (id, status, stage, file_path, filename, params, created_at, updated_at) '
+                "VALUES (?, 'queued', 'queued', ?, ?, ?, ?, ?)",
+                (job_id, file_path, filename, json.dumps(params), now, now)
+            )
+            self._conn.commit()
+        return job_id
+
+    def fail_abandoned(self) -> List[Dict[str, Any]]:
+        """Fail jobs whose lease ran out max_attempts times; returns them (id, file_path) so their files can be removed."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = self._conn.execute(
+                "SELECT id, file_path FROM ingestion_jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE ingestion_jobs SET status = 'failed', stage = 'done', error = 'Processing was interrupted', "
+                "lease_until = NULL, updated_at = ? WHERE id = ?",
+                [(now, job_id) for job_id, _ in rows]
+            )
+            self._conn.commit()
+        return [{'id': job_id, 'file_path': file_path} for job_id, file_path in rows]
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Claim the oldest queued (or abandoned) job, or return None."""
+        now = time.time()
+        with self._lock:
+            # Take the write lock up front, so no other process claims the same row
+            self._conn.execute('BEGIN IMMEDIATE')
+            row = self._conn.execute(
+                "SELECT id, file_path, filename, params, attempts FROM ingestion_jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_until < ? AND attempts < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', stage = 'extracting', attempts = attempts + 1, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                (now + self.lease_seconds, now, row[0])
+            )
+            self._conn.commit()
+        job_id, file_path, filename, params, attempts = row
+        return {'id': job_id, 'attempt': attempts + 1, 'file_path': file_path, 'filename': filename,
+                'params': json.loads(params)}
+
+    def _update_claimed(self, job_id: str, attempt: int, assignments: str, params: tuple) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ? AND status = 'running' AND attempts = ?",
+                params + (job_id, attempt)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def renew(self, job_id: str, attempt: int) -> bool:
+        """Extend the lease of a claimed job; False if the claim was lost."""
+        now = time.time()
+        return self._update_claimed(job_id, attempt, 'lease_until = ?, updated_at = ?', (now + self.lease_seconds, now))
+
+    def update(self, job_id: str, attempt: int, stage: str, progress: float = 0.0) -> bool:
+        """Record a claimed job's stage and progress (0 to 1 within the stage) and renew its lease."""
+        now = time.time()
+        return self._update_claimed(
+            job_id, attempt, 'stage = ?, progress = ?, lease_until = ?, updated_at = ?',
+            (stage, progress, now + self.lease_seconds, now)
+        )
+
+    def finish(self, job_id: str, attempt: int, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> bool:
+        """Mark a claimed job succeeded with result, or failed with error; False if the claim was lost."""
+        status = 'failed' if error is not None else 'succeeded'
+        return self._update_claimed(
+            job_id, attempt,
+            "status = ?, stage = 'done', progress = 1, result = ?, error = ?, lease_until = NULL, updated_at = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time())
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's public state, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, status, stage, progress, filename, result, error, created_at, updated_at '
+                'FROM ingestion_jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, status, stage, progress, filename, result, error, created_at, updated_at = row
+        return {
+            'jobId': job_id,
+            'status': status,
+            'stage': stage,
+            'progress': round(progress, 3),
+            'filename': filename,
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'createdAt': created_at,
+            'updatedAt': updated_at
+        }
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs last updated more than older_than_seconds ago."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM ingestion_jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - older_than_seconds,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs in each status."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status').fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+
+class IngestionQueue:
+    """
+    Background ingestion of uploaded documents.
+    Jobs pass through three stages, each with its own threads and a
+    bounded hand-off queue, so one document is extracted while the
+    previous one is embedded and an earlier one is indexed and answered:
+
+      extract  claim a job, hash the file, read and split it (skipped
+               when the document's index is already stored)
+      embed    embed the chunks in batches, one document at a time
+      finish   build and store the FAISS index, then call respond()
+
+    Jobs whose params name a collection (collection, documentId) add the
+    file to that collection instead; they run whole in the extract stage,
+    which holds the collection's write lock while it embeds the new chunks.
+
+    A heartbeat thread renews the lease of every job the queue holds, so
+    long extractions and waits between stages do not let it expire.
+    respond(vector_store, params) returns the job's answer text.
+    """
+
+    def __init__(self, processor, store: JobStore, spool_dir: str,
+                 respond: Callable[[FAISS, Dict[str, Any]], Optional[str]],
+                 extract_workers: int = 2, finish_workers: int = 2, max_buffered: int = 2,
+                 poll_interval: float = 1.0, job_ttl: float = 24 * 3600):
+        self.processor = processor
+        self.store = store
+        self.spool_dir = spool_dir
+        self.respond = respond
+        self.extract_workers = extract_workers
+        self.finish_workers = finish_workers
+        self.poll_interval = poll_interval
+        self.job_ttl = job_ttl
+        os.makedirs(spool_dir, exist_ok=True)
+
+        # Bounded so extraction cannot run far ahead of embedding and pile chunks up in memory
+        self._embed_queue: "queue.Queue" = queue.Queue(maxsize=max_buffered)
+        self._finish_queue: "queue.Queue" = queue.Queue(maxsize=max_buffered)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._last_purge = 0.0
+        # Claimed jobs (id -> attempt) whose leases the heartbeat renews
+        self._held: Dict[str, int] = {}
+        self._held_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        targets = (
+            [self._extract_loop] * self.extract_workers
+            + [self._embed_loop]
+            + [self._finish_loop] * self.finish_workers
+            + [self._heartbeat_loop]
+        )
+        for number, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f'ingestion-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+
+    def submit(self, upload, params: Dict[str, Any]) -> str:
+        """Spool an uploaded file (a werkzeug FileStorage) and queue it; returns the job id."""
+        # Keep the extension; it decides the reader when libmagic cannot tell the type
+        extension = os.path.splitext(upload.filename or '')[1].lower()
+        if not extension[1:].isalnum():
+            extension = ''
+        spool_path = os.path.join(self.spool_dir, uuid.uuid4().hex + extension)
+        upload.save(spool_path)
+        job_id = self.store.create(spool_path, upload.filename, params)
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _hold(self, job: Dict[str, Any]) -> None:
+        with self._held_lock:
+            self._held[job['id']] = job['attempt']
+
+    def _finish(self, job: Dict[str, Any], result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+        with self._held_lock:
+            self._held.pop(job['id'], None)
+        if self.store.finish(job['id'], job['attempt'], result=result, error=error):
+            self._discard(job)
+        else:
+            # The lease ran out and the job was claimed again; its file now belongs to that run
+            print(f"Ingestion job {job['id']} was claimed again; dropping attempt {job['attempt']}")
+
+    def _fail(self, job: Dict[str, Any], error: Exception) -> None:
+        print(f"Ingestion job {job['id']} failed: {str(error)}")
+        self._finish(job, error=str(error))
+
+    def _update(self, job: Dict[str, Any], stage: str, progress: float = 0.0) -> None:
+        self.store.update(job['id'], job['attempt'], stage, progress)
+
+    @staticmethod
+    def _discard(job: Dict[str, Any]) -> None:
+        try:
+            os.unlink(job['file_path'])
+        except FileNotFoundError:
+            pass
+
+    def _extract_loop(self) -> None:
+        while not self._stopped.is_set():
+            for abandoned in self.store.fail_abandoned():
+                self._discard(abandoned)
+            job = self.store.claim()
+            if job is None:
+                self._purge_old_jobs()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._hold(job)
+            if job['params'].get('collection'):
+                self._add_to_collection(job)
+                continue
+            try:
+                job['document_id'] = self.processor.document_id(job['file_path'])
+                vector_store = self.processor.load_document_index(job['document_id'])
+                if vector_store is not None:
+                    # Uploaded before: straight to the answer
+                    self._finish_queue.put((job, vector_store, None, None))
+                    continue
+                chunks = self.processor.extract_chunks(job['file_path'])
+                self._update(job, 'waiting to embed')
+                self._embed_queue.put((job, chunks))
+            except Exception as e:
+                self._fail(job, e)
+
+    def _add_to_collection(self, job: Dict[str, Any]) -> None:
+        collection_name = job['params']['collection']
+        document_id = job['params']['documentId']
+        try:
+            self._update(job, 'updating collection')
+            counts = self.processor.add_to_collection(collection_name, document_id, job['file_path'])
+            self._finish(job, result=dict(counts, collection=collection_name, documentId=document_id))
+        except Exception as e:
+            self._fail(job, e)
+
+    def _embed_loop(self) -> None:
+        while not self._stopped.is_set():
+            job, chunks = self._embed_queue.get()
+            try:
+                self._update(job, 'embedding')
+                vectors = self.processor.embed_chunks(
+                    chunks, on_progress=lambda done, total: self._update(job, 'embedding', done / total)
+                )
+                self._finish_queue.put((job, None, chunks, vectors))
+            except Exception as e:
+                self._fail(job, e)
+
+    def _finish_loop(self) -> None:
+        while not self._stopped.is_set():
+            job, vector_store, chunks, vectors = self._finish_queue.get()
+            try:
+                if vector_store is None:
+                    self._update(job, 'indexing')
+                    vector_store, metadata = self.processor.index_from_vectors(chunks, vectors)
+                    self.processor.index_store.put(job['document_id'], vector_store, metadata)
+                self._update(job, 'answering')
+                response = self.respond(vector_store, job['params'])
+                if response is None:
+                    raise RuntimeError('Failed to get response from AI model')
+                self._finish(job, result={'response': response, 'documentId': job['document_id']})
+            except Exception as e:
+                self._fail(job, e)
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(1.0, self.store.lease_seconds / 4)
+        while not self._stopped.wait(interval):
+            self._renew_held()
+
+    def _renew_held(self) -> None:
+        """Renew the lease of every held job, and stop holding those claimed again elsewhere."""
+        with self._held_lock:
+            held = list(self._held.items())
+        for job_id, attempt in held:
+            if not self.store.renew(job_id, attempt):
+                with self._held_lock:
+                    if self._held.get(job_id) == attempt:
+                        del self._held[job_id]
+
+    def _purge_old_jobs(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < 600:
+            return
+        self._last_purge = now
+        self.store.purge(self.job_ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status and the number of documents waiting between stages."""
+        return dict(self.store.counts(), awaiting_embedding=self._embed_queue.qsize(),
+                    awaiting_indexing=self._finish_queue.qsize())
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+import PyPDF2
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) in a worker process (each worker opens the PDF itself)."""
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [(reader.pages[index].extract_text() or "") for index in range(start, stop)]
+
+
+def _serial_pages(file_path: str, page_count: int) -> Iterator[str]:
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for index in range(page_count):
+            yield reader.pages[index].extract_text() or ""
+
+
+def _parallel_pages(file_path: str, page_count: int, executor: Executor, workers: int,
+                    pages_per_task: int) -> Iterator[str]:
+    """Yield page texts in order while workers extract later page ranges."""
+    ranges = iter(range(0, page_count, pages_per_task))
+    pending = deque()
+
+    def submit_next() -> None:
+        start = next(ranges, None)
+        if start is not None:
+            pending.append(executor.submit(_extract_page_range, file_path, start, min(start + pages_per_task, page_count)))
+
+    # At most two ranges per worker are in flight, so memory does not grow with the page count
+    for _ in range(2 * workers):
+        submit_next()
+    try:
+        while pending:
+            pages = pending.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        # The consumer stopped early (page or size cap); drop work not yet started
+        for future in pending:
+            future.cancel()
+
+
+def new_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for page-parallel extraction, meant to live as long as
+    the service. Workers are spawned rather than forked: the service is
+    multithreaded (request, ingestion and embedding threads), and a
+    forked child can deadlock on a lock another thread held.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def iter_pdf_pages(file_path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                   executor: Optional[Executor] = None, workers: int = 1, parallel_threshold: int = 64,
+                   pages_per_task: int = 16) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in page order.
+    PDFs with at least parallel_threshold pages are extracted by the
+    workers of executor (see new_pdf_pool), if one is given. Extraction
+    stops after max_pages pages, or once max_chars characters have been
+    yielded (the last page is cut).
+    """
+    with open(file_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+    if max_pages is not None and page_count > max_pages:
+        print(f"Reading the first {max_pages} of {page_count} pages of {file_path}")
+        page_count = max_pages
+
+    if executor is not None and page_count >= parallel_threshold:
+        pages = _parallel_pages(file_path, page_count, executor, workers, pages_per_task)
+    else:
+        pages = _serial_pages(file_path, page_count)
+
+    remaining = max_chars
+    try:
+        for text in pages:
+            if remaining is not None:
+                if len(text) >= remaining:
+                    print(f"Stopped reading {file_path} at the {max_chars} character limit")
+                    yield text[:remaining]
+                    return
+                remaining -= len(text)
+            yield text
+    finally:
+        pages.close()
+
+
+def default_pdf_workers() -> int:
+    """Worker processes for large PDFs: one per core, at most four."""
+    return max(1, min(4, os.cpu_count() or 1))
@@ -0,0 +1,84 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import tiktoken
+from langchain_community.vectorstores import FAISS
+
+# Excerpts shorter than this are not worth truncating a chunk for
+MIN_EXCERPT_TOKENS = 50
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens with tiktoken's cl100k_base encoding, a close
+    enough proxy for Gemini's tokenizer to budget a prompt. Falls back to
+    about four characters per token when the encoding is unavailable
+    (tiktoken downloads it on first use).
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        try:
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"Token encoding unavailable, estimating token counts: {str(e)}")
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def retrieve_chunks(vector_store: FAISS, question: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5,
+                    filter: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[str]:
+    """
+    Return the text of the k chunks most relevant to question, most
+    relevant first. Candidates are the fetch_k nearest chunks, re-ranked
+    with maximal marginal relevance so near-duplicate chunks do not crowd
+    out the rest (lambda_mult 1.0 is pure relevance, 0.0 pure diversity).
+    filter, if given, takes a chunk's metadata and returns whether it may be used.
+    """
+    documents = vector_store.max_marginal_relevance_search(
+        question, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+    )
+    return [document.page_content for document in documents]
+
+
+def pack_context(chunks: List[str], token_budget: int, counter: TokenCounter) -> List[str]:
+    """Keep chunks in rank order while they fit in token_budget, truncating the first one that does not."""
+    excerpts = []
+    remaining = token_budget
+    for chunk in chunks:
+        tokens = counter.count(chunk)
+        if tokens <= remaining:
+            excerpts.append(chunk)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_EXCERPT_TOKENS:
+            excerpts.append(counter.truncate(chunk, remaining))
+        break
+    return excerpts
+
+
+def format_grounded_prompt(instruction: str, excerpts: List[str]) -> str:
+    """Prompt asking the model to follow instruction using only the given document excerpts."""
+    if not excerpts:
+        return instruction
+    context = "\n\n".join(f"[Excerpt {number}]\n{excerpt}" for number, excerpt in enumerate(excerpts, 1))
+    return (
+        "Use the following excerpts from the uploaded document to respond. "
+        "If they do not contain the answer, say so instead of guessing.\n\n"
+        f"{context}\n\n{instruction}"
+    )
+
+
+def build_grounded_prompt(vector_store: FAISS, question: str, instruction: str, token_budget: int,
+                          counter: Optional[TokenCounter] = None, **search_options) -> str:
+    """Retrieve the chunks relevant to question and pack them into a prompt for instruction."""
+    counter = counter or TokenCounter()
+    chunks = retrieve_chunks(vector_store, question, **search_options)
+    return format_grounded_prompt(instruction, pack_context(chunks, token_budget, counter))
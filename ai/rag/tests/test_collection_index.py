@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import collection_index
+from collection_index import CollectionIndex
+
+SETTINGS = {'model': 'test', 'chunk_size': 100}
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic unit vectors per text; counts the texts it embeds."""
+
+    dimension = 8
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def _vector(self, text):
+        vector = np.random.default_rng(sum(text.encode('utf-8'))).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).astype('float32').tolist()
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings()
+
+
+def open_collection(tmp_path, embeddings, **kwargs):
+    return CollectionIndex(str(tmp_path / 'physics'), embeddings, SETTINGS, **kwargs)
+
+
+def chunk_texts(collection):
+    store = collection.vector_store
+    return sorted(
+        store.docstore.search(chunk_id).page_content for chunk_id in store.index_to_docstore_id.values()
+        if chunk_id not in collection.tombstones
+    )
+
+
+def test_changes_are_appended_to_the_log(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings, compact_ratio=1.0)
+    collection.upsert('optics', ['lenses', 'mirrors'], embeddings.embed_documents)
+    index_file = tmp_path / 'physics' / 'index.faiss'
+    snapshot = index_file.stat().st_mtime_ns, index_file.stat().st_size
+
+    counts = collection.upsert('waves', ['sound', 'light'], embeddings.embed_documents)
+    collection.upsert('optics', ['lenses', 'prisms'], embeddings.embed_documents)
+
+    assert counts == {'added': 2, 'kept': 0, 'removed': 0}
+    assert (index_file.stat().st_mtime_ns, index_file.stat().st_size) == snapshot
+    assert len((tmp_path / 'physics' / 'changes.jsonl').read_text().splitlines()) == 2
+
+
+def test_reload_replays_the_log(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings, compact_ratio=1.0)
+    collection.upsert('optics', ['lenses', 'mirrors'], embeddings.embed_documents)
+    collection.upsert('waves', ['sound', 'light'], embeddings.embed_documents)
+    collection.upsert('optics', ['lenses', 'prisms'], embeddings.embed_documents)
+    collection.delete('waves')
+
+    reloaded = open_collection(tmp_path, embeddings, compact_ratio=1.0)
+    assert reloaded.documents == collection.documents
+    assert reloaded.tombstones == collection.tombstones
+    assert chunk_texts(reloaded) == ['lenses', 'prisms']
+    assert np.array_equal(
+        reloaded.vector_store.index.reconstruct_n(0, reloaded.vector_store.index.ntotal),
+        collection.vector_store.index.reconstruct_n(0, collection.vector_store.index.ntotal)
+    )
+
+
+def test_a_torn_last_line_is_ignored(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings)
+    collection.upsert('optics', ['lenses'], embeddings.embed_documents)
+    collection.upsert('waves', ['sound'], embeddings.embed_documents)
+    with open(tmp_path / 'physics' / 'changes.jsonl', 'a', encoding='utf-8') as file:
+        file.write('{"op": "upsert", "document_id": "heat", "added": [["he')
+
+    reloaded = open_collection(tmp_path, embeddings)
+    assert sorted(reloaded.documents) == ['optics', 'waves']
+    assert chunk_texts(reloaded) == ['lenses', 'sound']
+
+    reloaded.upsert('heat', ['entropy'], embeddings.embed_documents)
+    reloaded = open_collection(tmp_path, embeddings)
+    assert sorted(reloaded.documents) == ['heat', 'optics', 'waves']
+    assert chunk_texts(reloaded) == ['entropy', 'lenses', 'sound']
+
+
+def test_compaction_writes_a_snapshot(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings, compact_ratio=0.5)
+    collection.upsert('optics', ['lenses', 'mirrors'], embeddings.embed_documents)
+    collection.upsert('waves', ['sound'], embeddings.embed_documents)
+    collection.delete('optics')
+
+    assert not (tmp_path / 'physics' / 'changes.jsonl').exists()
+    reloaded = open_collection(tmp_path, embeddings, compact_ratio=0.5)
+    assert reloaded.tombstones == set()
+    assert reloaded.vector_store.index.ntotal == 1
+    assert chunk_texts(reloaded) == ['sound']
+
+
+def test_a_long_log_is_folded_into_a_snapshot(tmp_path, embeddings, monkeypatch):
+    monkeypatch.setattr(collection_index, 'LOG_MIN_BYTES', 0)
+    collection = open_collection(tmp_path, embeddings)
+    collection.upsert('optics', ['lenses'], embeddings.embed_documents)
+    collection.upsert('waves', ['sound'], embeddings.embed_documents)
+
+    assert not (tmp_path / 'physics' / 'changes.jsonl').exists()
+    assert sorted(open_collection(tmp_path, embeddings).documents) == ['optics', 'waves']
+
+
+def test_unchanged_chunks_are_not_embedded_again(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings)
+    collection.upsert('optics', ['lenses', 'mirrors'], embeddings.embed_documents)
+    embeddings.embedded = 0
+    counts = collection.upsert('optics', ['lenses', 'mirrors', 'prisms'], embeddings.embed_documents)
+    assert counts == {'added': 1, 'kept': 2, 'removed': 0}
+    assert embeddings.embedded == 1
+    assert os.path.exists(tmp_path / 'physics' / 'changes.jsonl')
+
+
+def quantized(tmp_path, embeddings, **kwargs):
+    vector_index = {'mode': 'ivf_flat', 'quantize_above': 50, 'nprobe': 1, 'train_sample': 1000}
+    return open_collection(tmp_path, embeddings, vector_index=vector_index, **kwargs)
+
+
+def texts(prefix, count):
+    return [f"{prefix} {number}" for number in range(count)]
+
+
+def test_quantized_rebuilds_reuse_the_kept_vectors(tmp_path, embeddings):
+    collection = quantized(tmp_path, embeddings)
+    collection.upsert('optics', texts('lens', 60), embeddings.embed_documents)
+    assert collection.index_info == {'mode': 'ivf_flat', 'trained_on': 60}
+    assert (tmp_path / 'physics' / 'vectors.npy').exists()
+    assert not list(tmp_path.glob('.rebuilding-*'))
+
+    embeddings.embedded = 0
+    collection.upsert('waves', texts('wave', 30), embeddings.embed_documents)
+    reloaded = quantized(tmp_path, embeddings)
+    # Dropping most of optics compacts the quantized index, which rebuilds it
+    reloaded.upsert('optics', texts('lens', 10), embeddings.embed_documents)
+    assert reloaded.tombstones == set()
+    assert reloaded.vector_store.index.ntotal == 40
+    assert embeddings.embedded == 30
+
+    positions = sorted(reloaded.vector_store.index_to_docstore_id)
+    expected = [
+        embeddings.embed_query(reloaded.vector_store.docstore.search(reloaded.vector_store.index_to_docstore_id[p]).page_content)
+        for p in positions
+    ]
+    assert np.allclose(reloaded._exact_vectors(positions), expected)
+    assert np.allclose(np.load(tmp_path / 'physics' / 'vectors.npy'), expected)
+
+
+def test_index_report_on_the_kept_vectors(tmp_path, embeddings):
+    collection = quantized(tmp_path, embeddings)
+    collection.upsert('optics', texts('lens', 60), embeddings.embed_documents)
+    embeddings.embedded = 0
+    report = collection.index_report(k=5, queries=20, nprobes=(1,))
+    assert embeddings.embedded == 0
+    assert (report['mode'], report['vectors'], report['k']) == ('ivf_flat', 60, 5)
+    assert report['current_index'] == {'mode': 'ivf_flat', 'trained_on': 60, 'vectors': 60}
+
+
+def test_index_report_rejects_bad_requests(tmp_path, embeddings):
+    collection = open_collection(tmp_path, embeddings, vector_index={'mode': 'ivf_pq', 'pq_m': 2, 'quantize_above': 10 ** 6})
+    with pytest.raises(ValueError, match='empty'):
+        collection.index_report()
+    collection.upsert('optics', texts('lens', 60), embeddings.embed_documents)
+    with pytest.raises(ValueError, match='k must be between 1 and 100'):
+        collection.index_report(k=10 ** 6)
+    # A product quantizer needs at least 256 training vectors
+    with pytest.raises(ValueError, match='Cannot train a ivf_pq index on 60 vectors'):
+        collection.index_report()
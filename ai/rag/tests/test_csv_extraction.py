@@ -0,0 +1,46 @@
+from csv_extraction import format_record, iter_csv_records
+
+
+def write_csv(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_rows_become_header_prefixed_records(tmp_path):
+    path = write_csv(tmp_path / 'marks.csv', 'name,subject,marks\nAsha,Physics,91\nRavi,,78\n,,\n')
+    assert list(iter_csv_records(path)) == [
+        "name: Asha | subject: Physics | marks: 91\n",
+        "name: Ravi | marks: 78\n",
+    ]
+
+
+def test_cells_past_the_header_are_numbered():
+    assert format_record(['name'], ['Asha', 'extra']) == "name: Asha | column 2: extra\n"
+
+
+def test_row_cap(tmp_path):
+    rows = "".join(f"{index},{index * 2}\n" for index in range(100))
+    path = write_csv(tmp_path / 'numbers.csv', 'a,b\n' + rows)
+    assert len(list(iter_csv_records(path, max_rows=10))) == 10
+
+
+def test_large_files_are_sampled_reproducibly(tmp_path):
+    rows = "".join(f"{index},{index * 2}\n" for index in range(1000))
+    path = write_csv(tmp_path / 'numbers.csv', 'a,b\n' + rows)
+    sample = list(iter_csv_records(path, sample_above_bytes=100, sample_rows=50))
+    assert len(sample) == 50
+    assert sample == list(iter_csv_records(path, sample_above_bytes=100, sample_rows=50))
+    # Kept in file order
+    positions = [int(record.split(' | ')[0].split(': ')[1]) for record in sample]
+    assert positions == sorted(positions)
+
+
+def test_quoted_fields_with_newlines(tmp_path):
+    path = write_csv(tmp_path / 'notes.csv', 'topic,note\nOptics,"line one\nline two"\n')
+    assert list(iter_csv_records(path)) == ["topic: Optics | note: line one\nline two\n"]
+
+
+def test_excel_byte_order_mark_is_not_part_of_the_first_header(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_bytes('\ufeffName,Marks\nAsha,91\n'.encode('utf-8'))
+    assert list(iter_csv_records(str(path))) == ["Name: Asha | Marks: 91\n"]
@@ -0,0 +1,116 @@
+from ingestion_jobs import IngestionQueue, JobStore
+
+
+def new_store(tmp_path, **kwargs):
+    return JobStore(str(tmp_path / 'jobs.db'), **kwargs)
+
+
+def spooled(tmp_path, name='upload.txt'):
+    path = tmp_path / name
+    path.write_text('notes', encoding='utf-8')
+    return str(path)
+
+
+def test_claim_returns_the_attempt(tmp_path):
+    store = new_store(tmp_path)
+    job_id = store.create('upload.txt', 'upload.txt', {'context': ''})
+    job = store.claim()
+    assert (job['id'], job['attempt'], job['params']) == (job_id, 1, {'context': ''})
+    assert store.claim() is None
+    assert store.update(job_id, 1, 'embedding', 0.5)
+    assert store.get(job_id)['stage'] == 'embedding'
+
+
+def test_a_stale_claim_cannot_finish_the_job(tmp_path):
+    store = new_store(tmp_path, lease_seconds=0)
+    job_id = store.create('upload.txt', 'upload.txt', {})
+    first = store.claim()
+    second = store.claim()
+    assert (first['attempt'], second['attempt']) == (1, 2)
+
+    assert store.finish(job_id, second['attempt'], result={'response': 'ok'})
+    assert not store.finish(job_id, first['attempt'], error='boom')
+    assert not store.update(job_id, first['attempt'], 'embedding')
+    assert not store.renew(job_id, first['attempt'])
+    job = store.get(job_id)
+    assert (job['status'], job['result'], job['error']) == ('succeeded', {'response': 'ok'}, None)
+
+
+def test_renew_keeps_the_job_from_being_claimed_again(tmp_path):
+    store = new_store(tmp_path, lease_seconds=60)
+    store.create('upload.txt', 'upload.txt', {})
+    job = store.claim()
+    assert store.renew(job['id'], job['attempt'])
+    assert store.claim() is None
+
+
+def test_abandoned_jobs_are_failed_and_returned(tmp_path):
+    store = new_store(tmp_path, lease_seconds=0, max_attempts=2)
+    job_id = store.create('upload.txt', 'upload.txt', {})
+    assert store.claim()['attempt'] == 1
+    assert store.fail_abandoned() == []
+    assert store.claim()['attempt'] == 2
+    # Out of attempts: not claimed a third time
+    assert store.claim() is None
+    assert store.fail_abandoned() == [{'id': job_id, 'file_path': 'upload.txt'}]
+    assert store.get(job_id)['status'] == 'failed'
+
+
+def test_queue_keeps_the_file_when_its_claim_was_lost(tmp_path):
+    store = new_store(tmp_path, lease_seconds=0)
+    path = spooled(tmp_path)
+    job_id = store.create(path, 'upload.txt', {})
+    queue = IngestionQueue(None, store, str(tmp_path / 'spool'), respond=lambda vector_store, params: None)
+    first = store.claim()
+    second = store.claim()
+
+    queue._fail(first, RuntimeError('slow worker'))
+    assert (tmp_path / 'upload.txt').exists()
+    assert store.get(job_id)['status'] == 'running'
+
+    queue._finish(second, result={'response': 'ok'})
+    assert not (tmp_path / 'upload.txt').exists()
+    assert store.get(job_id)['status'] == 'succeeded'
+
+
+def test_heartbeat_renews_held_jobs_and_drops_lost_ones(tmp_path):
+    store = new_store(tmp_path, lease_seconds=0)
+    queue = IngestionQueue(None, store, str(tmp_path / 'spool'), respond=lambda vector_store, params: None)
+    first_id = store.create('first.txt', 'first.txt', {})
+    queue._hold(store.claim())
+    # Its lease ran out and another worker claimed it
+    store.lease_seconds = 60
+    assert store.claim()['attempt'] == 2
+    second_id = store.create('second.txt', 'second.txt', {})
+    queue._hold(store.claim())
+
+    queue._renew_held()
+    assert queue._held == {second_id: 1}
+    assert store.get(first_id)['status'] == 'running'
+    assert store.claim() is None
+
+
+class CollectionProcessor:
+    def __init__(self):
+        self.added = []
+
+    def add_to_collection(self, collection_name, document_id, file_path):
+        self.added.append((collection_name, document_id, open(file_path, encoding='utf-8').read()))
+        return {'added': 1, 'kept': 0, 'removed': 0}
+
+
+def test_collection_jobs_add_the_file_to_the_collection(tmp_path):
+    store = new_store(tmp_path)
+    processor = CollectionProcessor()
+    queue = IngestionQueue(processor, store, str(tmp_path / 'spool'), respond=lambda vector_store, params: None)
+    job_id = store.create(spooled(tmp_path), 'upload.txt', {'collection': 'physics', 'documentId': 'optics'})
+    job = store.claim()
+    queue._hold(job)
+
+    queue._add_to_collection(job)
+    assert processor.added == [('physics', 'optics', 'notes')]
+    finished = store.get(job_id)
+    assert finished['status'] == 'succeeded'
+    assert finished['result'] == {'added': 1, 'kept': 0, 'removed': 0, 'collection': 'physics', 'documentId': 'optics'}
+    assert not (tmp_path / 'upload.txt').exists()
+    assert queue._held == {}
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+from pdf_extraction import iter_pdf_pages, new_pdf_pool
+
+
+def write_pdf(path, pages):
+    """Minimal PDF with one line of Helvetica text per page."""
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for index, text in enumerate(pages):
+        page_id, content_id = 4 + 2 * index, 5 + 2 * index
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        kids.append(f"{page_id} 0 R")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(data)
+        data += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode()
+    xref = len(data)
+    size = max(objects) + 1
+    data += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        data += f"{offsets[number]:010d} 00000 n \n".encode()
+    data += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = new_pdf_pool(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_spawns_its_workers(pool):
+    assert pool._mp_context.get_start_method() == 'spawn'
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path, pool):
+    path = write_pdf(tmp_path / 'notes.pdf', [f"page {index}" for index in range(40)])
+    serial = list(iter_pdf_pages(path))
+    assert [text.strip() for text in serial] == [f"page {index}" for index in range(40)]
+    # The pool is reused across documents
+    for _ in range(2):
+        parallel = list(iter_pdf_pages(path, executor=pool, workers=2, parallel_threshold=8, pages_per_task=3))
+        assert parallel == serial
+
+
+def test_page_and_character_caps(tmp_path, pool):
+    path = write_pdf(tmp_path / 'notes.pdf', [f"page {index}" for index in range(40)])
+    assert len(list(iter_pdf_pages(path, max_pages=5, executor=pool, workers=2, parallel_threshold=2))) == 5
+    assert "".join(iter_pdf_pages(path, max_chars=10)) == "".join(iter_pdf_pages(path))[:10]
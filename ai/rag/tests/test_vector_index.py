@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from vector_index import (
+    compare_indexes, index_mode, sample_positions, set_nprobe, synthetic_vectors, train_index, vector_bytes
+)
+
+
+@pytest.fixture(scope='module')
+def vectors():
+    return synthetic_vectors(4000, 32, clusters=16)
+
+
+# Product quantizers train 256 centroids per byte, which is slow; pq_m stays small
+@pytest.mark.parametrize('mode', ['flat', 'ivf_flat', 'ivf_sq8', 'ivf_pq'])
+def test_trained_indexes_keep_vector_order(vectors, mode):
+    index = train_index(vectors, mode, sample_size=2000, pq_m=2, nprobe=64)
+    assert index_mode(index) == mode
+    assert index.ntotal == len(vectors)
+    _, ids = index.search(vectors[:20], 1)
+    # Two bytes per vector are too coarse to find the exact vector
+    if mode != 'ivf_pq':
+        assert np.mean(ids[:, 0] == np.arange(20)) >= 0.9
+    # Code bytes per vector, plus an id and a direct map entry for IVF indexes
+    assert vector_bytes(index) == {'flat': 32 * 4, 'ivf_flat': 32 * 4 + 16, 'ivf_sq8': 32 + 16, 'ivf_pq': 2 + 16}[mode]
+
+
+def test_report_measures_each_nprobe(vectors):
+    index = train_index(vectors, 'ivf_flat', sample_size=2000, nprobe=4)
+    report = compare_indexes(vectors, index, k=5, queries=50, nprobes=(1, 64))
+    assert [run['nprobe'] for run in report['runs']] == [1, 64]
+    assert report['runs'][1]['recall_at_k'] >= report['runs'][0]['recall_at_k']
+    assert report['runs'][1]['recall_at_k'] == pytest.approx(1.0)
+    # The index's own nprobe is restored
+    set_nprobe(index, 4)
+    assert compare_indexes(vectors, index, k=5, queries=10)['runs'][0]['nprobe'] == 4
+
+
+def test_too_few_training_points_is_a_value_error(vectors):
+    with pytest.raises(ValueError, match='Cannot train a ivf_pq index on 200 vectors'):
+        train_index(vectors[:200], 'ivf_pq', pq_m=2)
+
+
+def test_sample_positions_are_sorted_and_unique():
+    positions = sample_positions(1000, 100, seed=3)
+    assert len(positions) == 100
+    assert list(positions) == sorted(set(positions))
+    assert list(sample_positions(10, 100)) == list(range(10))
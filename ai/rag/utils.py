@@ -1,12 +1,11 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, Callable
 import google.generativeai as genai
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings  # updated import
 from langchain_community.vectorstores import FAISS
 import PyPDF2
 from docx import Document
-import pandas as pd
 import magic
 import tiktoken
 import json
@@ -18,9 +17,69 @@ import openpyxl
 import pptx
 import html
 import re
+from io import StringIO
+from itertools import islice
+from collection_index import CollectionStore
+from csv_extraction import iter_csv_records
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from index_store import DocumentIndexStore, file_sha256, index_key
+from pdf_extraction import default_pdf_workers, iter_pdf_pages, new_pdf_pool
+from retrieval import TokenCounter, build_grounded_prompt
+from vector_index import INDEX_MODES
+
+# Readers that stream hand the splitter blocks of about this many characters
+BLOCK_CHARS = 1 << 16
+
+
+def join_blocks(lines: Iterable[str], block_chars: int = BLOCK_CHARS) -> Iterator[str]:
+    """Group lines into text blocks of roughly block_chars characters."""
+    buffer = StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= block_chars:
+            yield buffer.getvalue()
+            buffer = StringIO()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class SheetLines:
+    """
+    Iterator over the text lines of one sheet: a "Sheet: name" header,
+    then one tab-separated line per row, cut to row_max_cells cells.
+    Stops once cells_left cells have been read; the remaining budget is
+    left in cells_left.
+    """
+
+    def __init__(self, sheet_name: str, rows: Iterable[Iterable[Any]], row_max_cells: int, cells_left: int):
+        self.sheet_name = sheet_name
+        self.rows = iter(rows)
+        self.row_max_cells = row_max_cells
+        self.cells_left = cells_left
+        self.header_sent = False
+
+    def __iter__(self) -> "SheetLines":
+        return self
+
+    def __next__(self) -> str:
+        if not self.header_sent:
+            self.header_sent = True
+            return f"Sheet: {self.sheet_name}\n"
+        if self.cells_left <= 0:
+            raise StopIteration
+        row = next(self.rows)
+        values = [str(value) for value in islice(row, self.row_max_cells)]
+        self.cells_left -= len(values)
+        return "\t".join(values) + "\n"
+
 
 class DocumentProcessor:
-    def __init__(self, api_key: str):
+    EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+    def __init__(self, api_key: str, index_dir: str = "index_store", context_token_budget: int = 2000,
+                 embedding_cache_path: str = "embedding_cache.db", collection_dir: str = "collections",
+                 collection_memory_bytes: int = 1024 * 1024 * 1024, vector_index_mode: str = "ivf_sq8",
+                 quantize_above: int = 100_000):
         self.api_key = api_key
         genai.configure(api_key=api_key)
         # Use the correct Gemini 2.0 Flash model
@@ -30,57 +89,139 @@ class DocumentProcessor:
         except Exception as e:
             print(f"Failed to initialize Gemini model: {str(e)}")
             raise
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+        # Chunks seen before (shared syllabi, boilerplate) are read from disk instead of re-embedded
+        self.embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(model_name=self.EMBEDDING_MODEL),
+            EmbeddingCache(embedding_cache_path),
+            self.EMBEDDING_MODEL
+        )
+        self.splitter_settings = {
+            "chunk_size": 1000,
+            "chunk_overlap": 200,
+            "separators": ["\n\n", "\n", " ", ""]
+        }
+        self.text_splitter = RecursiveCharacterTextSplitter(length_function=len, **self.splitter_settings)
+        # Caps on what is extracted from one document; they bound memory and are part of every index key
+        self.extraction_limits = {
+            "pdf_max_pages": 2000,
+            "pdf_max_chars": 20_000_000,
+            "sheet_max_rows": 100_000,
+            "row_max_cells": 256,
+            "workbook_max_cells": 5_000_000,
+            "pptx_max_slides": 1000,
+            "csv_max_rows": 1_000_000,
+            # CSVs above this size are indexed from a uniform sample of csv_sample_rows rows
+            "csv_sample_above_bytes": 100 * 1024 * 1024,
+            "csv_sample_rows": 50_000
+        }
+        # Large PDFs are extracted page-parallel by one pool shared by all uploads
+        self.pdf_workers = default_pdf_workers()
+        self.pdf_pool = new_pdf_pool(self.pdf_workers) if self.pdf_workers > 1 else None
+        # Per-document indexes, content-addressed so re-uploads skip extraction and embedding
+        self.index_store = DocumentIndexStore(index_dir, self.embeddings)
+        # Collections with at least quantize_above chunks switch to a compact IVF index (see vector_index.py);
+        # nprobe trades recall for latency
+        if vector_index_mode not in INDEX_MODES:
+            raise ValueError(f"Unknown vector index mode: {vector_index_mode!r}")
+        self.vector_index_settings = {
+            "mode": vector_index_mode,
+            "quantize_above": quantize_above,
+            "nprobe": 16,
+            "train_sample": 50_000,
+            "pq_m": 48
+        }
+        # Long-lived per-collection indexes (one per classroom, user or course), updated document by document;
+        # at most collection_memory_bytes of them stay loaded
+        self.collections = CollectionStore(
+            collection_dir, self.embeddings, self.index_settings(), max_memory_bytes=collection_memory_bytes,
+            vector_index=self.vector_index_settings
         )
+        # Retrieval: top-k chunks re-ranked with MMR, packed into at most context_token_budget tokens
+        self.retrieval_settings = {
+            "k": 4,
+            "fetch_k": 20,
+            "lambda_mult": 0.5
+        }
+        self.context_token_budget = context_token_budget
+        self.token_counter = TokenCounter()
         
     def read_file(self, file_path: str) -> str:
         """Read different file types and return their content as text."""
+        return "".join(self.iter_text(file_path))
+
+    def iter_text(self, file_path: str) -> Iterator[str]:
+        """Read different file types and yield their content as text blocks, in order."""
         mime = magic.Magic(mime=True)
         file_type = mime.from_file(file_path)
         file_extension = os.path.splitext(file_path)[1].lower()
         
         # Handle different file types
         if file_type == 'application/pdf':
-            return self._read_pdf(file_path)
+            return self._iter_pdf(file_path)
         elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            return self._read_docx(file_path)
+            return iter([self._read_docx(file_path)])
+        elif file_type in ['text/csv', 'application/csv'] or file_extension == '.csv':
+            # Before text/plain: libmagic reports many CSV exports as plain text
+            return self._iter_csv(file_path)
         elif file_type == 'text/plain':
-            return self._read_txt(file_path)
-        elif file_type == 'text/csv':
-            return self._read_csv(file_path)
+            return iter([self._read_txt(file_path)])
         elif file_type == 'application/json':
-            return self._read_json(file_path)
+            return iter([self._read_json(file_path)])
         elif file_type == 'text/xml' or file_extension == '.xml':
-            return self._read_xml(file_path)
+            return iter([self._read_xml(file_path)])
         elif file_type == 'text/yaml' or file_extension in ['.yml', '.yaml']:
-            return self._read_yaml(file_path)
+            return iter([self._read_yaml(file_path)])
         elif file_type == 'application/vnd.ms-excel' or file_extension == '.xls':
-            return self._read_xls(file_path)
+            return self._iter_xls(file_path)
         elif file_type == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or file_extension == '.xlsx':
-            return self._read_xlsx(file_path)
+            return self._iter_xlsx(file_path)
         elif file_type == 'application/vnd.openxmlformats-officedocument.presentationml.presentation' or file_extension == '.pptx':
-            return self._read_pptx(file_path)
+            return self._iter_pptx(file_path)
         elif file_type == 'text/html' or file_extension == '.html':
-            return self._read_html(file_path)
+            return iter([self._read_html(file_path)])
         else:
             # Try to read as text if file type is unknown
             try:
-                return self._read_txt(file_path)
+                return iter([self._read_txt(file_path)])
             except:
                 raise ValueError(f"Unsupported file type: {file_type}")
+
+    def split_stream(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Split text blocks into chunks as they arrive. Blocks are buffered
+        until a few chunks' worth of text is available; every chunk but
+        the last is emitted and the last one starts the next buffer, as
+        it may continue in the next block. Chunk boundaries can differ
+        slightly from splitting the whole text at once.
+        """
+        threshold = self.splitter_settings["chunk_size"] * 16
+        buffer: List[str] = []
+        size = 0
+        for block in blocks:
+            buffer.append(block)
+            size += len(block)
+            if size < threshold:
+                continue
+            chunks = self.text_splitter.split_text("".join(buffer))
+            yield from chunks[:-1]
+            buffer = chunks[-1:]
+            size = sum(len(chunk) for chunk in buffer)
+        if buffer:
+            yield from self.text_splitter.split_text("".join(buffer))
     
     def _read_pdf(self, file_path: str) -> str:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        return "".join(self._iter_pdf(file_path))
+
+    def _iter_pdf(self, file_path: str) -> Iterator[str]:
+        """Yield the text of each page; large PDFs are extracted page-parallel across processes."""
+        for page_text in iter_pdf_pages(
+            file_path,
+            max_pages=self.extraction_limits["pdf_max_pages"],
+            max_chars=self.extraction_limits["pdf_max_chars"],
+            executor=self.pdf_pool,
+            workers=self.pdf_workers
+        ):
+            yield page_text + "\n"
     
     def _read_docx(self, file_path: str) -> str:
         doc = Document(file_path)
@@ -91,8 +232,16 @@ class DocumentProcessor:
             return file.read()
     
     def _read_csv(self, file_path: str) -> str:
-        df = pd.read_csv(file_path)
-        return df.to_string()
+        return "".join(self._iter_csv(file_path))
+
+    def _iter_csv(self, file_path: str) -> Iterator[str]:
+        """Yield CSV rows as header-prefixed records, in blocks; very large files are sampled."""
+        return join_blocks(iter_csv_records(
+            file_path,
+            max_rows=self.extraction_limits["csv_max_rows"],
+            sample_above_bytes=self.extraction_limits["csv_sample_above_bytes"],
+            sample_rows=self.extraction_limits["csv_sample_rows"]
+        ))
     
     def _read_json(self, file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
@@ -110,33 +259,69 @@ class DocumentProcessor:
             return yaml.dump(data, default_flow_style=False)
     
     def _read_xls(self, file_path: str) -> str:
-        workbook = xlrd.open_workbook(file_path)
-        text = ""
-        for sheet in workbook.sheets():
-            text += f"Sheet: {sheet.name}\n"
-            for row in range(sheet.nrows):
-                text += "\t".join(str(sheet.cell_value(row, col)) for col in range(sheet.ncols)) + "\n"
-        return text
+        return "".join(self._iter_xls(file_path))
+
+    def _iter_xls(self, file_path: str) -> Iterator[str]:
+        # on_demand loads one sheet at a time instead of the whole workbook
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            cells_left = self.extraction_limits["workbook_max_cells"]
+            for index in range(workbook.nsheets):
+                sheet = workbook.sheet_by_index(index)
+                rows = (
+                    sheet.row_values(row, 0, min(sheet.ncols, self.extraction_limits["row_max_cells"]))
+                    for row in range(sheet.nrows)
+                )
+                lines = self._sheet_lines(sheet.name, rows, cells_left)
+                for block in join_blocks(lines):
+                    yield block
+                cells_left = lines.cells_left
+                workbook.unload_sheet(index)
+                if cells_left <= 0:
+                    print(f"Stopped reading {file_path} at the {self.extraction_limits['workbook_max_cells']} cell limit")
+                    break
+        finally:
+            workbook.release_resources()
     
     def _read_xlsx(self, file_path: str) -> str:
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        text = ""
-        for sheet in workbook.sheetnames:
-            text += f"Sheet: {sheet}\n"
-            ws = workbook[sheet]
-            for row in ws.rows:
-                text += "\t".join(str(cell.value) for cell in row) + "\n"
-        return text
+        return "".join(self._iter_xlsx(file_path))
+
+    def _iter_xlsx(self, file_path: str) -> Iterator[str]:
+        # read_only streams rows from the file instead of building every cell object up front
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            cells_left = self.extraction_limits["workbook_max_cells"]
+            for ws in workbook.worksheets:
+                rows = ws.iter_rows(values_only=True)
+                lines = self._sheet_lines(ws.title, rows, cells_left)
+                for block in join_blocks(lines):
+                    yield block
+                cells_left = lines.cells_left
+                if cells_left <= 0:
+                    print(f"Stopped reading {file_path} at the {self.extraction_limits['workbook_max_cells']} cell limit")
+                    break
+        finally:
+            workbook.close()
+
+    def _sheet_lines(self, sheet_name: str, rows: Iterable[Iterable[Any]], cells_left: int) -> "SheetLines":
+        limits = self.extraction_limits
+        return SheetLines(sheet_name, islice(rows, limits["sheet_max_rows"]), limits["row_max_cells"], cells_left)
     
     def _read_pptx(self, file_path: str) -> str:
+        return "".join(self._iter_pptx(file_path))
+
+    def _iter_pptx(self, file_path: str) -> Iterator[str]:
         prs = pptx.Presentation(file_path)
-        text = ""
-        for slide in prs.slides:
-            text += f"Slide {slide.slide_number}\n"
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text
+
+        def lines() -> Iterator[str]:
+            slides = islice(prs.slides, self.extraction_limits["pptx_max_slides"])
+            for number, slide in enumerate(slides, 1):
+                yield f"Slide {number}\n"
+                for shape in slide.shapes:
+                    if hasattr(shape, "text"):
+                        yield shape.text + "\n"
+
+        return join_blocks(lines())
     
     def _read_html(self, file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
@@ -149,23 +334,116 @@ class DocumentProcessor:
     
     def process_documents(self, file_paths: List[str]) -> FAISS:
         """Process multiple documents and create a FAISS vector store."""
-        all_texts = []
+        # Split texts into chunks as they are read
+        chunks = []
         for file_path in file_paths:
             try:
-                text = self.read_file(file_path)
-                all_texts.append(text)
+                file_chunks = list(self.split_stream(self.iter_text(file_path)))
             except Exception as e:
                 print(f"Error processing {file_path}: {str(e)}")
-        
-        # Split texts into chunks
-        chunks = []
-        for text in all_texts:
-            chunks.extend(self.text_splitter.split_text(text))
+                continue
+            chunks.extend(file_chunks)
         
         # Create vector store
         vector_store = FAISS.from_texts(chunks, self.embeddings)
         return vector_store
 
+    def index_settings(self) -> Dict[str, Any]:
+        """Settings that determine a document's chunks and vectors; part of every index key."""
+        return dict(self.splitter_settings, embedding_model=self.EMBEDDING_MODEL, extraction_limits=self.extraction_limits)
+
+    def document_id(self, file_path: str) -> str:
+        """Content address of a document's index: its bytes plus the index settings."""
+        return index_key(file_sha256(file_path), self.index_settings())
+
+    def extract_chunks(self, file_path: str) -> List[str]:
+        """Extract a document's text and split it into chunks."""
+        chunks = list(self.split_stream(self.iter_text(file_path)))
+        if not chunks:
+            raise ValueError("No text could be extracted from the document")
+        return chunks
+
+    def embed_chunks(self, chunks: List[str], batch_size: int = 64,
+                     on_progress: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """Embed chunks in batches, calling on_progress(done, total) after each batch."""
+        vectors = []
+        for start in range(0, len(chunks), batch_size):
+            vectors.extend(self.embeddings.embed_documents(chunks[start:start + batch_size]))
+            if on_progress is not None:
+                on_progress(len(vectors), len(chunks))
+        return vectors
+
+    def index_from_vectors(self, chunks: List[str], vectors: List[List[float]]) -> Tuple[FAISS, Dict[str, Any]]:
+        """Return (vector_store, metadata) for embedded chunks."""
+        vector_store = FAISS.from_embeddings(
+            list(zip(chunks, vectors)), self.embeddings, metadatas=[{"chunk": i} for i in range(len(chunks))]
+        )
+        metadata = {
+            "settings": self.index_settings(),
+            "chunks": len(chunks),
+            "text_bytes": sum(len(chunk.encode("utf-8")) for chunk in chunks)
+        }
+        return vector_store, metadata
+
+    def build_document_index(self, file_path: str) -> Tuple[str, FAISS, bool]:
+        """
+        Return (document_id, vector_store, built) for a document.
+        The document id is the content address of its index, so the same
+        bytes uploaded again load the stored index instead of being
+        extracted and embedded again.
+        """
+        document_id = self.document_id(file_path)
+
+        def build() -> Tuple[FAISS, Dict[str, Any]]:
+            chunks = self.extract_chunks(file_path)
+            return self.index_from_vectors(chunks, self.embed_chunks(chunks))
+
+        vector_store, built = self.index_store.get_or_build(document_id, build)
+        return document_id, vector_store, built
+
+    def load_document_index(self, document_id: str) -> Optional[FAISS]:
+        """Return the stored index of a previously uploaded document, or None."""
+        return self.index_store.get(document_id)
+
+    def build_grounded_prompt(self, vector_store: FAISS, question: str, instruction: str,
+                              filter: Optional[Callable[[Dict[str, Any]], bool]] = None) -> str:
+        """Prompt for instruction grounded in the document chunks most relevant to question."""
+        return build_grounded_prompt(
+            vector_store, question, instruction, self.context_token_budget,
+            counter=self.token_counter, filter=filter, **self.retrieval_settings
+        )
+
+    def add_to_collection(self, collection_name: str, document_id: str, file_path: str) -> Dict[str, int]:
+        """
+        Add a document to a collection under a stable document id, or
+        update it if the id is already there. Only chunks the collection
+        does not hold yet are embedded; an unchanged file is skipped.
+        """
+        content_hash = file_sha256(file_path)
+        with self.collections.writing(collection_name) as collection:
+            if collection.content_hash(document_id) == content_hash:
+                kept = len(collection.documents[document_id]["chunk_ids"])
+                return {"added": 0, "kept": kept, "removed": 0}
+            chunks = self.extract_chunks(file_path)
+            return collection.upsert(document_id, chunks, self.embed_chunks, content_hash=content_hash)
+
+    def remove_from_collection(self, collection_name: str, document_id: str) -> int:
+        """Remove a document from a collection; returns the number of chunks removed."""
+        if not self.collections.exists(collection_name):
+            return 0
+        with self.collections.writing(collection_name) as collection:
+            return collection.delete(document_id)
+
+    def build_collection_prompt(self, collection_name: str, question: str, instruction: str) -> Optional[str]:
+        """Prompt grounded in a collection's most relevant chunks, or None if the collection has none."""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return None
+        with collection.lock:
+            if collection.vector_store is None:
+                return None
+            return self.build_grounded_prompt(collection.vector_store, question, instruction, collection.search_filter())
+
     def ask_gemini(self, prompt: str, generation_config=None) -> str:
         """
         Get a response from Gemini using the Google Generative AI library
@@ -0,0 +1,238 @@
+"""
+Compact FAISS index modes for large collections, and a recall/latency
+report against the exact (flat) index.
+
+    flat      exact search, 4 bytes per dimension (1.5 KB per MiniLM vector)
+    ivf_flat  inverted file: searches nprobe of nlist clusters, full vectors
+    ivf_sq8   inverted file with 8-bit scalar quantization (1 byte per dimension)
+    ivf_pq    inverted file with product quantization (pq_m bytes per vector)
+
+IVF modes are trained (cluster centroids, quantizer ranges or codebooks)
+on a random sample of the vectors. nprobe trades recall for latency and
+can be changed without retraining. Run this module to compare the modes
+on synthetic vectors:
+
+    python vector_index.py --vectors 200000 --nprobe 8 16 32 --output index_report.json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+INDEX_MODES = ('flat', 'ivf_flat', 'ivf_sq8', 'ivf_pq')
+
+# faiss needs about this many training points per cluster for stable centroids
+POINTS_PER_CENTROID = 39
+
+ADD_BATCH_SIZE = 65536
+
+
+def choose_nlist(count: int, sample_size: int) -> int:
+    """Number of IVF clusters: about 4·sqrt(count), limited by what the training sample supports."""
+    nlist = int(4 * np.sqrt(count))
+    nlist = min(nlist, max(1, min(count, sample_size) // POINTS_PER_CENTROID))
+    return max(1, min(nlist, 65536))
+
+
+def factory_string(mode: str, nlist: int, pq_m: int) -> str:
+    if mode == 'ivf_flat':
+        return f"IVF{nlist},Flat"
+    if mode == 'ivf_sq8':
+        return f"IVF{nlist},SQ8"
+    if mode == 'ivf_pq':
+        return f"IVF{nlist},PQ{pq_m}"
+    raise ValueError(f"Unknown index mode: {mode!r} (expected one of {', '.join(INDEX_MODES)})")
+
+
+def index_mode(index: faiss.Index) -> str:
+    """The mode of a built index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return 'flat'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return 'ivf_sq8'
+    if isinstance(index, faiss.IndexIVFFlat):
+        return 'ivf_flat'
+    return type(index).__name__
+
+
+def set_nprobe(index: faiss.Index, nprobe: int) -> None:
+    """Set how many clusters an IVF index searches (no-op for flat indexes)."""
+    if index_mode(index) != 'flat':
+        faiss.extract_index_ivf(index).nprobe = nprobe
+
+
+def new_index(mode: str, dimension: int, count: int, sample: np.ndarray, pq_m: int = 48) -> faiss.Index:
+    """
+    Empty L2 index of the given mode for about count vectors. IVF modes
+    are trained on sample (cluster centroids, quantizer ranges or
+    codebooks); add the vectors afterwards, then call finish_index.
+    """
+    if mode == 'flat':
+        return faiss.IndexFlatL2(dimension)
+    if mode == 'ivf_pq' and dimension % pq_m:
+        raise ValueError(f"pq_m ({pq_m}) must divide the vector dimension ({dimension})")
+    nlist = choose_nlist(count, len(sample))
+    index = faiss.index_factory(dimension, factory_string(mode, nlist, pq_m), faiss.METRIC_L2)
+    try:
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+    except RuntimeError as e:
+        # e.g. fewer training points than a product quantizer's 256 centroids
+        raise ValueError(f"Cannot train a {mode} index on {len(sample)} vectors: {e}") from e
+    return index
+
+
+def finish_index(index: faiss.Index, nprobe: int = 16) -> faiss.Index:
+    """Prepare a filled index for search: IVF indexes get nprobe and a direct map (MMR reads vectors back)."""
+    if index_mode(index) != 'flat':
+        faiss.extract_index_ivf(index).make_direct_map()
+        set_nprobe(index, nprobe)
+    return index
+
+
+def sample_positions(count: int, sample_size: int, seed: int = 0) -> np.ndarray:
+    """Sorted random positions of at most sample_size of count vectors."""
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(count, min(count, sample_size), replace=False))
+
+
+def train_index(vectors: np.ndarray, mode: str, sample_size: int = 50_000, pq_m: int = 48,
+                nprobe: int = 16, seed: int = 0) -> faiss.Index:
+    """
+    Build an index of the given mode holding vectors in order (position i
+    is vector i, as LangChain's FAISS wrapper expects), training IVF
+    modes on a random sample of at most sample_size vectors.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    count, dimension = vectors.shape
+    index = new_index(mode, dimension, count, vectors[sample_positions(count, sample_size, seed)], pq_m)
+    for start in range(0, count, ADD_BATCH_SIZE):
+        index.add(vectors[start:start + ADD_BATCH_SIZE])
+    return finish_index(index, nprobe)
+
+
+def vector_bytes(index: faiss.Index) -> int:
+    """Estimated memory per stored vector: its code, plus its id and direct map entry for IVF indexes."""
+    if index_mode(index) == 'flat':
+        return index.d * 4
+    return faiss.extract_index_ivf(index).code_size + 16
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Serialized size of an index, close to its size in memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {'p50_ms': round(float(np.percentile(values, 50)), 3), 'p95_ms': round(float(np.percentile(values, 95)), 3)}
+
+
+def _timed_search(index: faiss.Index, queries: np.ndarray, k: int):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return results, latencies
+
+
+def compare_indexes(vectors: np.ndarray, index: faiss.Index, k: int = 10, queries: int = 200,
+                    nprobes: Sequence[int] = (), seed: int = 0,
+                    query_vectors: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Recall@k and single-query latency of index against exact search over
+    the same vectors. Queries are query_vectors, or a random sample of the
+    stored vectors with a little noise. For IVF indexes every nprobe
+    value in nprobes is measured (the index's own setting is restored).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    rng = np.random.default_rng(seed)
+    if query_vectors is None:
+        picked = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+        noise = rng.normal(0, picked.std() * 0.1, picked.shape).astype('float32')
+        query_vectors = picked + noise
+    query_vectors = np.ascontiguousarray(query_vectors, dtype='float32')
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    truth, exact_latencies = _timed_search(exact, query_vectors, k)
+
+    mode = index_mode(index)
+    report = {
+        'mode': mode,
+        'vectors': int(len(vectors)),
+        'dimension': int(vectors.shape[1]),
+        'k': k,
+        'queries': int(len(query_vectors)),
+        'exact': dict(_percentiles(exact_latencies), bytes=index_bytes(exact)),
+        'index_bytes': index_bytes(index),
+        'runs': []
+    }
+    default_nprobe = faiss.extract_index_ivf(index).nprobe if mode != 'flat' else None
+    settings = list(nprobes) if (nprobes and mode != 'flat') else [default_nprobe]
+    try:
+        for nprobe in settings:
+            if nprobe is not None:
+                set_nprobe(index, nprobe)
+            found, latencies = _timed_search(index, query_vectors, k)
+            recall = np.mean([len(set(a[a >= 0]) & set(b)) / k for a, b in zip(found, truth)])
+            report['runs'].append(dict(_percentiles(latencies), nprobe=nprobe, recall_at_k=round(float(recall), 4)))
+    finally:
+        if default_nprobe is not None:
+            set_nprobe(index, default_nprobe)
+    return report
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype('float32')
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.6, size=(count, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=100_000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--modes', nargs='+', default=['ivf_flat', 'ivf_sq8', 'ivf_pq'], choices=INDEX_MODES)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32, 64])
+    parser.add_argument('--pq-m', type=int, default=48, help='product quantizer bytes per vector')
+    parser.add_argument('--train-sample', type=int, default=50_000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='index_report.json')
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_vectors(args.vectors, args.dimension, seed=args.seed)
+    reports = []
+    for mode in args.modes:
+        start = time.perf_counter()
+        index = train_index(vectors, mode, sample_size=args.train_sample, pq_m=args.pq_m, seed=args.seed)
+        build_seconds = time.perf_counter() - start
+        report = compare_indexes(vectors, index, k=args.k, queries=args.queries, nprobes=args.nprobe, seed=args.seed)
+        report['build_seconds'] = round(build_seconds, 2)
+        reports.append(report)
+        print(f"{mode}: {report['index_bytes'] / 1e6:.1f} MB (exact {report['exact']['bytes'] / 1e6:.1f} MB), "
+              f"built in {build_seconds:.1f}s, exact p50 {report['exact']['p50_ms']} ms")
+        for run in report['runs']:
+            print(f"  nprobe {run['nprobe']}: recall@{args.k} {run['recall_at_k']}, "
+                  f"p50 {run['p50_ms']} ms, p95 {run['p95_ms']} ms")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(reports, file, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
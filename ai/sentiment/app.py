@@ -1,20 +1,55 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from deep_translator import GoogleTranslator
-from langdetect import detect, LangDetectException
+from deep_translator.exceptions import (
+    InvalidSourceOrTargetLanguage, LanguageNotSupportedException, NotValidLength, NotValidPayload
+)
+from flood_detector import FloodDetector
+from language_detection import LanguageDetector, translator_code
+from moderation_config import ConfigWatcher, build_snapshot
+from moderation_metrics import ModerationMetrics
+from moderation_stream import ModerationStream, SessionError
+from translation_cache import TranslationCache
+from translator_pool import TranslatorPool
+from vader_lexicon import load_shared_analyzer
+from verdict_cache import VerdictCache
+from warning_store import WarningStore
 import json
 import os
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Upper bound on messages accepted by /moderate-messages in one request
+MAX_BATCH_SIZE = 500
+
 class MessageModerator:
-    def __init__(self, config_path='moderation_config.json'):
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+    def __init__(self, config_path='moderation_config.json', warnings_db_path='moderation_warnings.db',
+                 translation_cache_path='translation_cache.db', vader_lexicon_path='vader_lexicon.bin',
+                 config_reload_interval=2.0, translator_factory=None):
+        # VADER lexicon is memory-mapped from a prebuilt artifact shared by all workers
+        self.sentiment_analyzer = load_shared_analyzer(vader_lexicon_path)
         self.config_path = config_path
+        self.warning_store = WarningStore(warnings_db_path)
+        self.translation_cache = TranslationCache(translation_cache_path)
+        # translator_factory(source_lang) builds a translator; the benchmark passes a local stub
+        if translator_factory is None:
+            translator_factory = lambda source_lang: GoogleTranslator(source=translator_code(source_lang), target='en')
+        # Rejected languages and texts are not translator outages, so they stay out of the circuit breaker
+        self.translator_pool = TranslatorPool(translator_factory, input_errors=(
+            LanguageNotSupportedException, InvalidSourceOrTargetLanguage, NotValidPayload, NotValidLength
+        ))
+        self.language_detector = LanguageDetector()
+        self.metrics = ModerationMetrics()
+        self.flood_detector = FloodDetector()
+        self.verdict_cache = VerdictCache()
         self.load_config()
 
+        # Edits to the config file are picked up without a restart
+        self.config_watcher = None
+        if config_reload_interval:
+            self.config_watcher = ConfigWatcher(config_path, self.reload_config, config_reload_interval).start()
+
     def load_config(self):
         """Load moderation configuration from JSON file."""
         try:
@@ -27,44 +62,131 @@ class MessageModerator:
                     "moron", "boob", "ass", "dick", "nigga", "whore", 
                     "slut", "trash", "sucks", "make love", 
                     "हरामी", "गंवार", "बेवकूफ", "चोर"
-                ],
-                'user_sentiment_warnings': {}
+                ]
             }
             self.save_config()
 
+        # Counters from older configs move into the warning store
+        legacy_warnings = self.config.pop('user_sentiment_warnings', None)
+        if legacy_warnings is not None:
+            self.warning_store.import_counts(legacy_warnings)
+            self.save_config()
+
+        self.compile_offensive_terms()
+
+    def reload_config(self, data):
+        """
+        Swap in the config parsed from data (raw file contents) if it
+        differs from the active one. Called by the config watcher.
+        """
+        config = json.loads(data)
+        snapshot = build_snapshot(config)
+        if snapshot.digest == self.snapshot.digest:
+            return False
+        self.config = config
+        self.apply_snapshot(snapshot)
+        print(f"Moderation config reloaded ({len(snapshot.offensive_terms)} offensive terms)")
+        return True
+
     def save_config(self):
         """Save moderation configuration to JSON file."""
         with open(self.config_path, 'w') as f:
             json.dump(self.config, f, indent=4)
 
     def detect_language(self, text):
-        """Detect the language of the input text."""
-        try:
-            return detect(text)
-        except LangDetectException:
+        """
+        Detect the language of the input text.
+        Returns "en" whenever the text is English or the detection is
+        not confident enough to be worth a translation call.
+        """
+        with self.metrics.time('language_detection'):
+            language, confidence = self.language_detector.detect(text)
+        if not self.language_detector.should_translate(language, confidence):
             return "en"
+        return language
 
     def translate_to_english(self, text, source_lang=None):
-        """Translate text to English."""
+        """
+        Translate text to English, using the translation cache when possible.
+        Returns (text, mode): mode is "full" when the text is English or was
+        translated, and "degraded" when the translator was unavailable and
+        the original text is returned.
+        """
         if source_lang is None:
             source_lang = self.detect_language(text)
         
         if source_lang == "en":
-            return text
+            return text, "full"
 
-        try:
-            return GoogleTranslator(source=source_lang, target='en').translate(text)
-        except Exception as e:
-            print(f"Translation error: {e}")
-            return text
+        with self.metrics.time('translation'):
+            cached = self.translation_cache.get(source_lang, text)
+            if cached is not None:
+                return cached, "full"
+
+            translated = self.translator_pool.translate(source_lang, text)
+            if not translated:
+                return text, "degraded"
 
-    def check_offensive_content(self, text):
-        """Check if text contains offensive terms."""
-        lower_text = text.lower()
-        offensive_terms = self.config.get('offensive_terms', [])
-        return any(term in lower_text for term in offensive_terms)
+            self.translation_cache.set(source_lang, text, translated)
+        return translated, "full"
 
-    def analyze_sentiment(self, text):
+    def translate_batch_to_english(self, texts, source_langs=None):
+        """
+        Translate a batch of texts to English.
+        Texts are grouped by source language and the groups are sent to
+        the translator pool under one deadline for the whole batch.
+        Returns (translated texts, modes), both aligned with texts.
+        """
+        if source_langs is None:
+            source_langs = [self.detect_language(text) for text in texts]
+
+        translated = list(texts)
+        modes = ["full"] * len(texts)
+        groups = {}
+        with self.metrics.time('translation'):
+            deadline = self.translator_pool.deadline()
+            for index, source_lang in enumerate(source_langs):
+                if source_lang == "en":
+                    continue
+                cached = self.translation_cache.get(source_lang, texts[index])
+                if cached is not None:
+                    translated[index] = cached
+                else:
+                    groups.setdefault(source_lang, []).append(index)
+
+            for source_lang, indices in groups.items():
+                results = self.translator_pool.translate_batch(
+                    source_lang, [texts[index] for index in indices], deadline
+                )
+                for index, result in zip(indices, results):
+                    if result:
+                        translated[index] = result
+                        self.translation_cache.set(source_lang, texts[index], result)
+                    else:
+                        modes[index] = "degraded"
+        return translated, modes
+
+    def compile_offensive_terms(self):
+        """Compile self.config into a new snapshot. Must be called again whenever self.config is modified."""
+        self.apply_snapshot(build_snapshot(self.config))
+
+    def apply_snapshot(self, snapshot):
+        """
+        Make snapshot the active config. The swap is a single assignment:
+        requests already running finish on the snapshot they started with.
+        """
+        self.snapshot = snapshot
+        # Cached analyses embed lexicon results and thresholds, so they must not outlive the config
+        self.verdict_cache.clear()
+        self.flood_detector.forget_analyses()
+
+    def check_offensive_content(self, text, snapshot=None):
+        """Check if text contains offensive terms (whole words, case-insensitive)."""
+        matcher = (snapshot or self.snapshot).offensive_matcher
+        with self.metrics.time('lexicon'):
+            return matcher.contains(text)
+
+    def analyze_sentiment(self, text, snapshot=None):
         """
         Analyze sentiment of the text.
         Returns:
@@ -73,47 +195,55 @@ class MessageModerator:
           (True, False, or 'warning')
         - severity: numeric representation of sentiment severity
         """
-        sentiment_scores = self.sentiment_analyzer.polarity_scores(text)
+        with self.metrics.time('sentiment'):
+            sentiment_scores = self.sentiment_analyzer.polarity_scores(text)
         compound_score = sentiment_scores['compound']
+        snapshot = snapshot or self.snapshot
 
-        if compound_score <= -0.6:
+        if compound_score <= snapshot.very_negative_threshold:
             return "Very Negative", False, compound_score
-        elif -0.6 < compound_score <= -0.3:
+        elif compound_score <= snapshot.negative_threshold:
             return "Negative", False, compound_score
-        elif -0.3 < compound_score < 0.0:
+        elif compound_score < 0.0:
             return "Slightly Negative", "warning", compound_score
         elif compound_score == 0.0:
             return "Neutral", True, compound_score
         else:
             return "Positive", True, compound_score
 
-    def increment_user_warning(self, username):
+    def analyze_sentiments(self, texts, snapshot=None):
+        """Analyze sentiment of a batch of texts with the shared analyzer."""
+        return [self.analyze_sentiment(text, snapshot) for text in texts]
+
+    def increment_user_warning(self, username, snapshot=None):
         """
         Increment warning count for a user and check if they should be blocked.
-        Returns True if user should be blocked, False otherwise.
+        Returns True if user should be blocked (block_after_warnings
+        warnings within the sliding window, 3 by default), False otherwise.
         """
-        # Ensure user exists in config
-        if 'user_sentiment_warnings' not in self.config:
-            self.config['user_sentiment_warnings'] = {}
-        
-        # Get current warning count or default to 0
-        current_warnings = self.config['user_sentiment_warnings'].get(username, 0)
-        
-        # Increment warnings
-        current_warnings += 1
-        self.config['user_sentiment_warnings'][username] = current_warnings
-        
-        # Save updated config
-        self.save_config()
-        
-        # Block if warnings exceed 3
-        return current_warnings >= 3
+        with self.metrics.time('warnings'):
+            current_warnings = self.warning_store.increment(username)
+
+        # Block if warnings within the window reach the limit
+        return current_warnings >= (snapshot or self.snapshot).block_after_warnings
+
+    def increment_user_warnings(self, usernames, snapshot=None):
+        """
+        Increment warning counts for a batch of users in one transaction.
+        Returns, per username in order, whether that strike blocks the user.
+        """
+        with self.metrics.time('warnings'):
+            counts = self.warning_store.increment_many(usernames)
+        limit = (snapshot or self.snapshot).block_after_warnings
+        return [count >= limit for count in counts]
+
+    def get_user_warnings(self, username):
+        """Get the warning count for a specific user within the sliding window."""
+        return self.warning_store.get(username)
 
     def reset_user_warnings(self, username):
         """Reset warning count for a specific user."""
-        if 'user_sentiment_warnings' in self.config:
-            self.config['user_sentiment_warnings'][username] = 0
-            self.save_config()
+        self.warning_store.reset(username)
 
     def moderate_message(self, text, username):
         """
@@ -122,37 +252,200 @@ class MessageModerator:
         - is_allowed: whether message can be posted
         - reason: explanation if message is not allowed
         - sentiment_info: details about sentiment
+        - mode: "full", or "degraded" when only the lexicon check could run
+        """
+        with self.metrics.time('total'):
+            verdict = self._moderate_message(text, username)
+        self.metrics.record_verdict(verdict[0], verdict[3])
+        return verdict
+
+    def _moderate_message(self, text, username):
+        # One config snapshot serves the whole request, even if a reload lands meanwhile
+        snapshot = self.snapshot
+
+        verdict, analysis, signature = self.precheck_message(text, username, snapshot)
+        if verdict is not None:
+            return verdict
+
+        if analysis is None:
+            analysis = self.analyze_text(text, snapshot)
+            self.remember_analysis(text, signature, analysis, snapshot)
+
+        return self.apply_analysis(analysis, username, snapshot)
+
+    def precheck_message(self, text, username, snapshot):
+        """
+        Cheap part of moderation, run before any translation: the verdict
+        cache, the lexicon check on the original text and the flood detector.
+        Returns (verdict, analysis, signature). verdict is set when the
+        message is rejected outright (username is flooding); otherwise
+        analysis is None when analyze_text still has to run.
+        """
+        # Identical messages reuse their cached analysis; warnings are still applied by the caller
+        analysis = self.verdict_cache.get(text, snapshot.digest)
+
+        # Check the original text first so native-script terms match
+        # and blocked messages never pay for detection or translation
+        if analysis is None and self.check_offensive_content(text, snapshot):
+            analysis = (True, None, False, None, "full")
+            self.verdict_cache.set(text, analysis, snapshot.digest)
+        if analysis is not None and analysis[0]:
+            return None, analysis, None
+
+        # Near-identical copies of a recent message reuse its analysis
+        signature, similar_analysis, flooding = self.flood_detector.check(text, username)
+        if flooding:
+            return (False, "Flooding detected: too many near-identical messages", None, "full"), None, signature
+
+        return None, analysis or similar_analysis, signature
+
+    def remember_analysis(self, text, signature, analysis, snapshot):
+        """Share a fresh analysis with later copies of the message (verdict cache and flood detector)."""
+        # Degraded analyses are not shared; the translator may be back for the next copy
+        if analysis[4] == "full":
+            self.flood_detector.remember(signature, analysis)
+            self.verdict_cache.set(text, analysis, snapshot.digest)
+
+    def analyze_text(self, text, snapshot=None):
+        """
+        Text-dependent part of moderation: translation, lexicon check on
+        the translation and sentiment. Has no per-user side effects.
+        Returns (offensive, sentiment, allow_post, sentiment_score, mode).
         """
         # Translate to English for consistent analysis
-        translated_text = self.translate_to_english(text)
+        translated_text, mode = self.translate_to_english(text)
+
+        # Without a translation, sentiment scores are meaningless; rely on the lexicon check
+        if mode == "degraded":
+            return False, None, True, None, mode
 
-        # Check for offensive content first
-        if self.check_offensive_content(translated_text):
-            return False, "Offensive content detected", None
+        # Check the translation too, unless nothing was translated
+        if translated_text != text and self.check_offensive_content(translated_text, snapshot):
+            return True, None, False, None, mode
 
         # Analyze sentiment
-        sentiment, allow_post, sentiment_score = self.analyze_sentiment(translated_text)
+        sentiment, allow_post, sentiment_score = self.analyze_sentiment(translated_text, snapshot)
+        return False, sentiment, allow_post, sentiment_score, mode
+
+    def apply_analysis(self, analysis, username, snapshot=None):
+        """Turn a text analysis into a verdict for username, applying warning side effects."""
+        should_block = False
+        if self.needs_warning(analysis):
+            should_block = self.increment_user_warning(username, snapshot)
+        return self.verdict_from_analysis(analysis, should_block)
+
+    def needs_warning(self, analysis):
+        """Whether a message with this analysis earns its sender a warning."""
+        offensive, _, allow_post, _, mode = analysis
+        return not offensive and mode == "full" and not allow_post
+
+    def verdict_from_analysis(self, analysis, should_block=False):
+        """Build the (is_allowed, reason, sentiment_score, mode) verdict for an analysis."""
+        offensive, sentiment, allow_post, sentiment_score, mode = analysis
+
+        if offensive:
+            return False, "Offensive content detected", None, mode
+
+        if mode == "degraded":
+            return True, "Message allowed (lexicon check only)", None, mode
 
         # If message is negative or offensive
         if not allow_post:
-            # Increment user warnings
-            should_block = self.increment_user_warning(username)
-            
             if should_block:
-                return False, f"Blocked due to repeatedly sending {sentiment} messages", sentiment_score
+                return False, f"Blocked due to repeatedly sending {sentiment} messages", sentiment_score, mode
             
-            return False, f"{sentiment} message not allowed", sentiment_score
+            return False, f"{sentiment} message not allowed", sentiment_score, mode
 
         # If slightly negative with warning
         if allow_post == "warning":
-            return "warning", "Slightly negative message", sentiment_score
+            return "warning", "Slightly negative message", sentiment_score, mode
 
         # Positive or neutral message
-        return True, "Message allowed", sentiment_score
+        return True, "Message allowed", sentiment_score, mode
+
+    def moderate_messages(self, messages):
+        """
+        Batch message moderation.
+        Expects a list of (text, username) pairs and returns one
+        (is_allowed, reason, sentiment_score, mode) verdict per message, in order.
+        """
+        snapshot = self.snapshot
+        analyses = [None] * len(messages)
+
+        # Each message gets the same precheck as a single one (verdict cache, native-script
+        # lexicon pass, flood detector); only clean messages are translated
+        rejected = {}
+        signatures = {}
+        clean = []
+        for index, (text, username) in enumerate(messages):
+            verdict, analysis, signature = self.precheck_message(text, username, snapshot)
+            if verdict is not None:
+                rejected[index] = verdict
+            elif analysis is None:
+                clean.append(index)
+                signatures[index] = signature
+            else:
+                analyses[index] = analysis
+
+        originals = [messages[index][0] for index in clean]
+        translated, modes = self.translate_batch_to_english(originals)
+
+        pending = []
+        for index, original, translated_text, mode in zip(clean, originals, translated, modes):
+            if mode == "degraded":
+                analyses[index] = (False, None, True, None, mode)
+            elif translated_text != original and self.check_offensive_content(translated_text, snapshot):
+                analyses[index] = (True, None, False, None, mode)
+            else:
+                pending.append((index, translated_text))
+
+        sentiments = self.analyze_sentiments([translated_text for _, translated_text in pending], snapshot)
+        for (index, _), (sentiment, allow_post, sentiment_score) in zip(pending, sentiments):
+            analyses[index] = (False, sentiment, allow_post, sentiment_score, "full")
+
+        for index in clean:
+            self.remember_analysis(messages[index][0], signatures[index], analyses[index], snapshot)
+
+        # Warnings are applied in message order, all in a single transaction
+        negative = [index for index, analysis in enumerate(analyses) if analysis and self.needs_warning(analysis)]
+        should_block = dict(zip(negative, self.increment_user_warnings([messages[index][1] for index in negative], snapshot)))
+
+        verdicts = [
+            rejected[index] if index in rejected else self.verdict_from_analysis(analysis, should_block.get(index, False))
+            for index, analysis in enumerate(analyses)
+        ]
+        for is_allowed, _, _, mode in verdicts:
+            self.metrics.record_verdict(is_allowed, mode)
+        return verdicts
+
+    def render_metrics(self):
+        """Render moderation metrics, cache counters and translator state as Prometheus text."""
+        cache_stats = self.translation_cache.stats()
+        verdict_stats = self.verdict_cache.stats()
+        return self.metrics.render([
+            ('translation_cache_lookups_total', 'Translation cache lookups by result.', 'counter', {
+                (('result', 'memory_hit'),): cache_stats['memory_hits'],
+                (('result', 'disk_hit'),): cache_stats['disk_hits'],
+                (('result', 'miss'),): cache_stats['misses'],
+            }),
+            ('verdict_cache_lookups_total', 'Verdict cache lookups by result.', 'counter', {
+                (('result', 'hit'),): verdict_stats['hits'],
+                (('result', 'miss'),): verdict_stats['misses'],
+            }),
+            ('verdict_cache_entries', 'Analyses currently held in the verdict cache.', 'gauge', {
+                (): verdict_stats['entries'],
+            }),
+            ('translator_circuit_open', 'Whether the translator circuit breaker is open.', 'gauge', {
+                (): int(self.translator_pool.breaker.state == 'open'),
+            }),
+        ])
 
 # Initialize message moderator
 moderator = MessageModerator()
 
+# Streaming sessions for live chat clients share the moderator
+stream = ModerationStream(moderator)
+
 @app.route('/moderate-message', methods=['POST'])
 def moderate_message():
     """
@@ -174,14 +467,15 @@ def moderate_message():
     username = data['username']
 
     # Moderate the message
-    is_allowed, reason, sentiment_score = moderator.moderate_message(text, username)
+    is_allowed, reason, sentiment_score, mode = moderator.moderate_message(text, username)
 
     # Prepare response
     response = {
         'success': is_allowed is True,
         'message': reason,
         'allow_post': is_allowed,
-        'sentiment_score': sentiment_score
+        'sentiment_score': sentiment_score,
+        'moderation_mode': mode
     }
 
     # Determine appropriate HTTP status
@@ -189,6 +483,50 @@ def moderate_message():
 
     return jsonify(response), status_code
 
+@app.route('/moderate-messages', methods=['POST'])
+def moderate_messages():
+    """
+    Endpoint for batch message moderation.
+    Expects a JSON array of objects with 'text' and 'username' fields
+    (or an object with that array under 'messages').
+    Returns one moderation result per message, in order.
+    """
+    data = request.json
+    if isinstance(data, dict):
+        data = data.get('messages')
+
+    # Validate input
+    if not isinstance(data, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('text'), str) and isinstance(item.get('username'), str)
+        for item in data
+    ):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires an array of objects with string text and username.'
+        }), 400
+
+    if len(data) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': f'Too many messages. At most {MAX_BATCH_SIZE} per request.'
+        }), 413
+
+    # Moderate the batch
+    verdicts = moderator.moderate_messages([(item['text'], item['username']) for item in data])
+
+    results = [{
+        'success': is_allowed is True,
+        'message': reason,
+        'allow_post': is_allowed,
+        'sentiment_score': sentiment_score,
+        'moderation_mode': mode
+    } for is_allowed, reason, sentiment_score, mode in verdicts]
+
+    return jsonify({
+        'success': True,
+        'results': results
+    }), 200
+
 @app.route('/reset-warnings', methods=['POST'])
 def reset_user_warnings():
     """
@@ -217,7 +555,7 @@ def reset_user_warnings():
 @app.route('/get-user-warnings', methods=['GET'])
 def get_user_warnings():
     """
-    Endpoint to get a user's current warning count.
+    Endpoint to get a user's warning count within the sliding window.
     Expects username as a query parameter.
     """
     username = request.args.get('username')
@@ -230,19 +568,134 @@ def get_user_warnings():
         }), 400
 
     # Get current warnings
-    warnings = moderator.config.get('user_sentiment_warnings', {}).get(username, 0)
+    warnings = moderator.get_user_warnings(username)
 
     return jsonify({
         'success': True,
         'username': username,
-        'warning_count': warnings
+        'warning_count': warnings,
+        'window_seconds': moderator.warning_store.window_seconds
+    }), 200
+
+@app.route('/translation-cache-stats', methods=['GET'])
+def translation_cache_stats():
+    """Endpoint exposing translation cache hit/miss counters for monitoring."""
+    return jsonify({
+        'success': True,
+        'stats': moderator.translation_cache.stats()
+    }), 200
+
+@app.route('/verdict-cache-stats', methods=['GET'])
+def verdict_cache_stats():
+    """Endpoint exposing verdict cache hit/miss counters for monitoring."""
+    return jsonify({
+        'success': True,
+        'stats': moderator.verdict_cache.stats()
+    }), 200
+
+# Streaming sessions live in this process's memory: run the service as one process (app.run, or
+# gunicorn --workers 1 --threads N), or send every request of a session to the same worker (sticky sessions)
+@app.route('/moderation-sessions', methods=['POST'])
+def open_moderation_session():
+    """
+    Endpoint to open a streaming moderation session.
+    Expects JSON with 'username' field. Messages posted to the session
+    are moderated in order and their verdicts are delivered as
+    server-sent events on the session's event stream.
+    """
+    data = request.json
+
+    # Validate input
+    if not data or 'username' not in data:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires username.'
+        }), 400
+
+    try:
+        session = stream.open_session(data['username'])
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return jsonify({
+        'success': True,
+        'session_id': session.session_id,
+        'events_url': f'/moderation-sessions/{session.session_id}/events',
+        'messages_url': f'/moderation-sessions/{session.session_id}/messages'
+    }), 201
+
+@app.route('/moderation-sessions/<session_id>/events', methods=['GET'])
+def moderation_session_events(session_id):
+    """Server-sent event stream of verdicts for a streaming session."""
+    try:
+        stream.get_session(session_id)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return Response(stream_with_context(stream.events(session_id)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/moderation-sessions/<session_id>/messages', methods=['POST'])
+def moderation_session_messages(session_id):
+    """
+    Endpoint to queue messages on a streaming session.
+    Expects JSON with a 'text' field or a 'messages' array of strings.
+    Returns the ids the verdicts will carry on the event stream.
+    """
+    data = request.json
+    texts = None
+    if isinstance(data, dict):
+        texts = [data['text']] if 'text' in data else data.get('messages')
+
+    # Validate input
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid input. Requires text or an array of messages.'
+        }), 400
+
+    if len(texts) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': f'Too many messages. At most {MAX_BATCH_SIZE} per request.'
+        }), 413
+
+    try:
+        message_ids = stream.submit(session_id, texts)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    return jsonify({
+        'success': True,
+        'message_ids': message_ids
+    }), 202
+
+@app.route('/moderation-sessions/<session_id>', methods=['DELETE'])
+def close_moderation_session(session_id):
+    """Endpoint to close a streaming session and end its event stream."""
+    try:
+        stream.get_session(session_id)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+
+    stream.close_session(session_id)
+    return jsonify({
+        'success': True,
+        'message': f'Session {session_id} closed'
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint for moderation latency and verdict metrics."""
+    return Response(moderator.render_metrics(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     # Ensure config file exists
     if not os.path.exists('moderation_config.json'):
         with open('moderation_config.json', 'w') as f:
-            f.write('{"offensive_terms": [], "user_sentiment_warnings": {}}')
+            f.write('{"offensive_terms": []}')
     
     # Run the Flask app
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from lexicon_matcher import normalize_text
+
+
+# Marks a signature bin no shingle fell into
+EMPTY_BIN = 1 << 64
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def shingles(text, size=4):
+    """Character shingles of the text reduced to its lowercase words (punctuation and spacing ignored)."""
+    words = " ".join(WORD_PATTERN.findall(normalize_text(text)))
+    return {words[index:index + size] for index in range(max(1, len(words) - size + 1))}
+
+
+def minhash_signature(features, num_bins):
+    """
+    One-permutation MinHash: each feature is hashed once, the hash picks
+    a bin and each bin keeps its minimum. Costs one hash per feature
+    instead of one per feature and permutation.
+    """
+    signature = [EMPTY_BIN] * num_bins
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = value % num_bins
+        value //= num_bins
+        if value < signature[index]:
+            signature[index] = value
+    return tuple(signature)
+
+
+def signature_similarity(first, second):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    compared = agreeing = 0
+    for a, b in zip(first, second):
+        if a == EMPTY_BIN and b == EMPTY_BIN:
+            continue
+        compared += 1
+        if a == b:
+            agreeing += 1
+    return agreeing / compared if compared else 0.0
+
+
+class FloodEntry:
+    """A cluster of near-identical messages: the analysis to reuse and when (and from whom) copies were seen."""
+
+    __slots__ = ('signature', 'analysis', 'analyzed_at', 'seen')
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.analysis = None
+        self.analyzed_at = 0.0
+        self.seen = deque()
+
+
+class FloodDetector:
+    """
+    MinHash index over recently moderated messages.
+    Messages whose shingle sets are at least min_similarity alike
+    (estimated Jaccard) are treated as copies of each other: a copy
+    reuses the analysis of the first one (until reuse_ttl expires).
+    A flood is either
+      - flood_threshold copies within flood_window seconds that come from
+        few senders: the copies needed grow by copies_per_sender for
+        every distinct sender, so a question the whole class asks over a
+        minute is not a flood, while one user (or a handful) pasting it
+        is. A sender's first exempt_copies copies are not rejected by
+        this rule, so everyone can still add their "+1";
+      - or a burst of burst_threshold copies within burst_window seconds,
+        however many senders they come from (a raid by many accounts).
+    Signatures are split into LSH bands so a lookup only compares
+    against messages sharing a band, and the index is an LRU bounded by
+    max_entries.
+    Messages with fewer than min_words words are not tracked; short
+    greetings repeat legitimately and their signatures are unreliable.
+    """
+
+    def __init__(self, max_entries=5000, num_bins=16, num_bands=4, min_similarity=0.7, reuse_ttl=600,
+                 flood_window=60, flood_threshold=8, copies_per_sender=3, exempt_copies=1,
+                 burst_window=10, burst_threshold=30, min_words=4, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.num_bins = num_bins
+        self.num_bands = num_bands
+        self.rows_per_band = num_bins // num_bands
+        self.min_similarity = min_similarity
+        self.reuse_ttl = reuse_ttl
+        self.flood_window = flood_window
+        self.flood_threshold = flood_threshold
+        self.copies_per_sender = copies_per_sender
+        self.exempt_copies = exempt_copies
+        self.burst_window = burst_window
+        self.burst_threshold = burst_threshold
+        self.min_words = min_words
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bands = {}
+
+    def signature(self, text):
+        """MinHash signature of the message, or None for short messages."""
+        if len(normalize_text(text).split()) < self.min_words:
+            return None
+        return minhash_signature(shingles(text), self.num_bins)
+
+    def _band_keys(self, signature):
+        rows = self.rows_per_band
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.num_bands)]
+
+    def _find(self, signature):
+        best, best_similarity = None, self.min_similarity
+        seen = set()
+        for key in self._band_keys(signature):
+            for candidate in self._bands.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = signature_similarity(candidate, signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        return self._entries[best] if best is not None else None
+
+    def _add(self, signature):
+        entry = FloodEntry(signature)
+        self._entries[signature] = entry
+        for key in self._band_keys(signature):
+            self._bands.setdefault(key, set()).add(signature)
+        while len(self._entries) > self.max_entries:
+            old_signature, _ = self._entries.popitem(last=False)
+            for key in self._band_keys(old_signature):
+                members = self._bands[key]
+                members.discard(old_signature)
+                if not members:
+                    del self._bands[key]
+        return entry
+
+    def check(self, text, sender):
+        """
+        Record one occurrence of text sent by sender.
+        Returns (signature, analysis to reuse or None, flooding).
+        signature is None when the message is too short to track.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None, None, False
+
+        now = self.clock()
+        with self._lock:
+            entry = self._find(signature)
+            if entry is None:
+                entry = self._add(signature)
+            else:
+                self._entries.move_to_end(entry.signature)
+
+            entry.seen.append((now, sender))
+            while entry.seen and now - entry.seen[0][0] > self.flood_window:
+                entry.seen.popleft()
+            flooding = self._is_flood(entry.seen, sender, now)
+
+            analysis = entry.analysis
+            if analysis is not None and now - entry.analyzed_at > self.reuse_ttl:
+                analysis = entry.analysis = None
+            return entry.signature, analysis, flooding
+
+    def _is_flood(self, seen, sender, now):
+        copies = len(seen)
+        if copies >= self.burst_threshold:
+            burst = 0
+            for seen_at, _ in reversed(seen):
+                if now - seen_at > self.burst_window:
+                    break
+                burst += 1
+            if burst >= self.burst_threshold:
+                return True
+        if copies < self.flood_threshold:
+            return False
+        per_sender = Counter(copy_sender for _, copy_sender in seen)
+        if per_sender[sender] <= self.exempt_copies:
+            return False
+        return copies >= self.copies_per_sender * len(per_sender)
+
+    def remember(self, signature, analysis):
+        """Store the analysis of the message behind signature for its copies to reuse."""
+        if signature is None:
+            return
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None:
+                entry.analysis = analysis
+                entry.analyzed_at = self.clock()
+
+    def forget_analyses(self):
+        """Drop every stored analysis (e.g. after the lexicon changed) while keeping flood counts."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.analysis = None
@@ -0,0 +1,120 @@
+from bisect import bisect_right
+from functools import lru_cache
+
+from langdetect import DetectorFactory, detect_langs, LangDetectException
+
+# langdetect is random unless seeded; seed it so the same text always gets the same answer
+DetectorFactory.seed = 0
+
+# (first code point, last code point, script, language the script implies or None if shared)
+SCRIPT_RANGES = [
+    (0x0041, 0x005A, 'Latin', 'en'),
+    (0x0061, 0x007A, 'Latin', 'en'),
+    (0x00C0, 0x024F, 'Latin-Extended', None),
+    (0x0370, 0x03FF, 'Greek', 'el'),
+    (0x0400, 0x052F, 'Cyrillic', None),
+    (0x0590, 0x05FF, 'Hebrew', 'he'),
+    (0x0600, 0x06FF, 'Arabic', None),
+    (0x0900, 0x097F, 'Devanagari', 'hi'),
+    (0x0980, 0x09FF, 'Bengali', 'bn'),
+    (0x0A00, 0x0A7F, 'Gurmukhi', 'pa'),
+    (0x0A80, 0x0AFF, 'Gujarati', 'gu'),
+    (0x0B00, 0x0B7F, 'Oriya', 'or'),
+    (0x0B80, 0x0BFF, 'Tamil', 'ta'),
+    (0x0C00, 0x0C7F, 'Telugu', 'te'),
+    (0x0C80, 0x0CFF, 'Kannada', 'kn'),
+    (0x0D00, 0x0D7F, 'Malayalam', 'ml'),
+    (0x0E00, 0x0E7F, 'Thai', 'th'),
+    (0x10A0, 0x10FF, 'Georgian', 'ka'),
+    (0x1100, 0x11FF, 'Hangul', 'ko'),
+    (0x3040, 0x30FF, 'Kana', 'ja'),
+    (0x4E00, 0x9FFF, 'Han', 'zh-CN'),
+    (0xAC00, 0xD7AF, 'Hangul', 'ko'),
+]
+_RANGE_STARTS = [start for start, _, _, _ in SCRIPT_RANGES]
+
+# Detected languages use ISO 639-1 codes; Google Translate still expects legacy codes for a few
+TRANSLATOR_CODES = {'he': 'iw', 'zh-cn': 'zh-CN', 'zh-tw': 'zh-TW'}
+
+
+def translator_code(language):
+    """Return the code Google Translate expects for a detected language."""
+    return TRANSLATOR_CODES.get(language, language)
+
+
+def script_of(char):
+    """Return (script, implied language) for a letter, or (None, None) for anything else."""
+    code = ord(char)
+    index = bisect_right(_RANGE_STARTS, code) - 1
+    if index >= 0:
+        start, end, script, language = SCRIPT_RANGES[index]
+        if code <= end:
+            return script, language
+    return None, None
+
+
+class LanguageDetector:
+    """
+    Layered language detection.
+    A Unicode script scan settles most messages: plain ASCII letters
+    mean English (emoji and punctuation aside) and text written in a
+    script used by a single language (Devanagari, Tamil, Hangul, ...)
+    is that language. Only ambiguous input (accented Latin, Cyrillic,
+    Arabic, mixed scripts) goes to the seeded n-gram detector, whose
+    results are cached.
+    """
+
+    def __init__(self, min_translate_confidence=0.7, dominant_script_ratio=0.8,
+                 min_ngram_letters=8, cache_size=4096):
+        self.min_translate_confidence = min_translate_confidence
+        self.dominant_script_ratio = dominant_script_ratio
+        self.min_ngram_letters = min_ngram_letters
+        self._detect_ngram = lru_cache(maxsize=cache_size)(self._ngram_detect)
+
+    def detect(self, text):
+        """Return (language code, confidence between 0 and 1) for text."""
+        if text.isascii():
+            return 'en', 1.0
+
+        counts = {}
+        implied = {}
+        letters = 0
+        for char in text:
+            script, language = script_of(char)
+            if script is None:
+                continue
+            letters += 1
+            counts[script] = counts.get(script, 0) + 1
+            implied[script] = language
+
+        if not letters:
+            # Emoji, digits and punctuation only; nothing to translate
+            return 'en', 1.0
+
+        script, count = max(counts.items(), key=lambda item: item[1])
+        ratio = count / letters
+        if 'Kana' in counts and counts.get('Kana', 0) + counts.get('Han', 0) >= self.dominant_script_ratio * letters:
+            # Japanese mixes Kana with Han; Chinese never uses Kana
+            return 'ja', 1.0
+        # Any accented Latin letter means a European language other than English may be in play
+        if implied[script] is not None and ratio >= self.dominant_script_ratio and 'Latin-Extended' not in counts:
+            return implied[script], ratio
+
+        if letters < self.min_ngram_letters:
+            # Too short for the n-gram detector to be trusted
+            return 'en', 0.0
+        return self._detect_ngram(" ".join(text.split()))
+
+    def _ngram_detect(self, text):
+        try:
+            best = detect_langs(text)[0]
+        except (LangDetectException, IndexError):
+            return 'en', 0.0
+        return best.lang, best.prob
+
+    def should_translate(self, language, confidence):
+        """Translation is only worth calling for confidently detected non-English text."""
+        return language != 'en' and confidence >= self.min_translate_confidence
+
+    def cache_info(self):
+        return self._detect_ngram.cache_info()
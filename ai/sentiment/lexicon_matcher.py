@@ -0,0 +1,111 @@
+import unicodedata
+
+
+def is_word_char(char):
+    """Letters, digits, underscore and combining marks (e.g. Devanagari matras) belong to a word."""
+    if char.isalnum() or char == '_':
+        return True
+    return unicodedata.category(char).startswith('M')
+
+
+def normalize_text(text):
+    """Case-fold and collapse whitespace so that terms and messages compare the same way."""
+    return " ".join(text.casefold().split())
+
+
+class OffensiveTermMatcher:
+    """
+    Aho-Corasick automaton over the offensive terms lexicon.
+    Built once per lexicon, then every message is scanned in a single
+    linear pass regardless of how many terms the lexicon holds.
+    Matches must start and end on a word boundary, so "ass" does not
+    match inside "class".
+    """
+
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        # Node 0 is the root. _goto holds the trie edges, _fail the failure
+        # links, _term the lexicon term ending at a node (if any) and
+        # _output the nearest node on the failure chain that ends a term.
+        self._goto = [{}]
+        self._fail = [0]
+        self._term = [None]
+        self._output = [0]
+        for term in self.terms:
+            self._add(term)
+        self._build_links()
+
+    def __len__(self):
+        return sum(1 for term in self._term if term is not None)
+
+    def _add(self, term):
+        pattern = normalize_text(term)
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._term.append(None)
+                self._output.append(0)
+                self._goto[node][char] = next_node
+            node = next_node
+        if self._term[node] is None:
+            self._term[node] = pattern
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                self._fail[child] = fail_target if fail_target != child else 0
+                target = self._fail[child]
+                self._output[child] = target if self._term[target] is not None else self._output[target]
+                queue.append(child)
+
+    def _scan(self, text):
+        """Yield (start, end, term) for every word-bounded match in normalized text."""
+        goto = self._goto
+        fail = self._fail
+        node = 0
+        length = len(text)
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not node:
+                continue
+            end = index + 1
+            if end < length and is_word_char(text[end]):
+                # Whole-word matches need the next character to be a boundary.
+                continue
+            match = node if self._term[node] is not None else self._output[node]
+            while match:
+                term = self._term[match]
+                start = end - len(term)
+                if start == 0 or not is_word_char(text[start - 1]):
+                    yield start, end, term
+                match = self._output[match]
+
+    def find_all(self, text):
+        """Return every lexicon term found in text, in order of occurrence."""
+        return [term for _, _, term in self._scan(normalize_text(text))]
+
+    def search(self, text):
+        """Return the first lexicon term found in text, or None."""
+        for _, _, term in self._scan(normalize_text(text)):
+            return term
+        return None
+
+    def contains(self, text):
+        """Check whether text contains any lexicon term."""
+        return self.search(text) is not None
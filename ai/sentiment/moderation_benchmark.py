@@ -0,0 +1,441 @@
+"""
+Replay benchmark for message moderation.
+
+Replays a corpus of chat messages through MessageModerator.moderate_message
+and through the /moderate-message endpoint, with the translator replaced by
+a local stub that only simulates latency. Reports throughput, per-stage
+latency percentiles and memory allocated per message, and writes the
+results as JSON so runs can be compared:
+
+    python moderation_benchmark.py --messages 5000 --output results.json
+    python moderation_benchmark.py --corpus messages.jsonl --baseline results.json
+
+Messages are replayed at --chat-rate messages per second of simulated
+chat time, which is what the flood detector sees, rather than as fast
+as the loop runs. Throughput is reported next to the share of messages
+rejected as floods and the verdict and translation cache hit rates,
+since repeated messages are served from those. --no-reuse turns the
+caches and the flood detector off so every message takes the full path.
+
+A corpus file holds one message per line, either plain text or a JSON
+object with 'text' (and optionally 'username').
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from flood_detector import FloodDetector
+from moderation_metrics import ModerationMetrics
+from verdict_cache import VerdictCache
+
+# Synthetic chat traffic: short acknowledgements repeat a lot, longer messages less so
+SYNTHETIC_MESSAGES = {
+    'en': [
+        "ok", "thanks sir", "+1", "good morning everyone", "can you share the notes from today's class",
+        "I did not understand the last question", "this assignment is really hard", "great explanation, thank you",
+        "when is the next test", "I hate this topic so much", "the lecture was boring and useless",
+        "you are an idiot", "please upload the solutions", "my answer was marked wrong, why",
+    ],
+    'hi': [
+        "धन्यवाद सर", "आज की कक्षा बहुत अच्छी थी", "मुझे यह सवाल समझ नहीं आया", "कल परीक्षा कब है",
+        "यह बहुत बेकार पढ़ाई है", "तुम बेवकूफ हो", "कृपया नोट्स भेज दीजिए",
+    ],
+    'fr': [
+        "merci beaucoup pour le cours", "je ne comprends pas cet exercice", "quand est le prochain examen",
+        "ce devoir est vraiment nul", "bonjour à tous",
+    ],
+    'es': [
+        "gracias profesor", "no entiendo la pregunta tres", "la clase de hoy fue excelente",
+        "esta tarea es horrible", "cuándo es el examen final",
+    ],
+}
+LANGUAGE_WEIGHTS = {'en': 0.7, 'hi': 0.15, 'fr': 0.08, 'es': 0.07}
+
+
+class SimulatedTranslator:
+    """
+    Stand-in for GoogleTranslator that sleeps for a normally distributed
+    latency and fails at failure_rate, without any network access.
+    The text comes back unchanged.
+    """
+
+    def __init__(self, source, target='en', latency=0.08, jitter=0.02, failure_rate=0.0, seed=None):
+        self.source = source
+        self.target = target
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    def translate(self, text):
+        time.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        if self.random.random() < self.failure_rate:
+            raise RuntimeError("simulated translator failure")
+        return text
+
+
+class ReplayClock:
+    """Simulated chat time for the flood detector, advanced by one message interval per replayed message."""
+
+    def __init__(self, messages_per_sec):
+        self.interval = 1.0 / messages_per_sec
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def tick(self):
+        self.now += self.interval
+
+
+class RecordingMetrics(ModerationMetrics):
+    """ModerationMetrics that also keeps every raw observation, for exact percentiles."""
+
+    def __init__(self, prefix='moderation'):
+        super().__init__(prefix)
+        self.samples = {}
+
+    def observe(self, stage, seconds):
+        super().observe(stage, seconds)
+        self.samples.setdefault(stage, []).append(seconds)
+
+
+def synthetic_corpus(count, seed=0, users=50, unique_rate=0.3):
+    """Return count (text, username) pairs drawn from SYNTHETIC_MESSAGES."""
+    rng = random.Random(seed)
+    languages = list(LANGUAGE_WEIGHTS)
+    weights = [LANGUAGE_WEIGHTS[language] for language in languages]
+    corpus = []
+    for _ in range(count):
+        language = rng.choices(languages, weights)[0]
+        text = rng.choice(SYNTHETIC_MESSAGES[language])
+        # Some messages are one-off variations so not every message is a repeat
+        if rng.random() < unique_rate:
+            text = f"{text} {rng.randint(1, 10000)}"
+        corpus.append((text, f"user{rng.randrange(users)}"))
+    return corpus
+
+
+def load_corpus(path, users=50):
+    """Read (text, username) pairs from a file of plain-text or JSON lines."""
+    corpus = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if line.lstrip().startswith('{'):
+                item = json.loads(line)
+                corpus.append((item['text'], item.get('username', f"user{number % users}")))
+            else:
+                corpus.append((line, f"user{number % users}"))
+    return corpus
+
+
+def percentiles(samples):
+    """p50/p95/p99/max (in milliseconds) and count of latency samples in seconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        'count': len(ordered),
+        'p50_ms': at(0.50),
+        'p95_ms': at(0.95),
+        'p99_ms': at(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def create_moderator(app_module, workdir, args):
+    """
+    A fresh moderator with its own state files in workdir, the simulated
+    translator and a flood detector on replay time (moderator.replay_clock).
+    """
+    seeds = iter(range(1000000))
+    moderator = app_module.MessageModerator(
+        config_path=os.path.join(workdir, 'moderation_config.json'),
+        warnings_db_path=os.path.join(workdir, 'moderation_warnings.db'),
+        translation_cache_path=os.path.join(workdir, 'translation_cache.db'),
+        # Passes share the lexicon artifact built when the app was imported
+        vader_lexicon_path=os.path.join(os.path.dirname(workdir), 'vader_lexicon.bin'),
+        config_reload_interval=0,
+        translator_factory=lambda source_lang: SimulatedTranslator(
+            source_lang, latency=args.translator_latency, jitter=args.translator_jitter,
+            failure_rate=args.translator_failure_rate, seed=next(seeds)
+        ),
+    )
+    moderator.metrics = RecordingMetrics()
+    moderator.replay_clock = ReplayClock(args.chat_rate)
+    if args.no_reuse:
+        # Nothing is ever found: every message is translated and scored
+        moderator.verdict_cache = VerdictCache(max_entries=0)
+        moderator.flood_detector = FloodDetector(max_entries=0, clock=moderator.replay_clock)
+        moderator.translation_cache.max_memory_entries = 0
+        moderator.translation_cache.ttl_seconds = 0
+    else:
+        moderator.flood_detector = FloodDetector(clock=moderator.replay_clock)
+    return moderator
+
+
+def reuse_counters(moderator):
+    verdict_stats = moderator.verdict_cache.stats()
+    translation_stats = moderator.translation_cache.stats()
+    return {
+        'verdict_hits': verdict_stats['hits'],
+        'verdict_lookups': verdict_stats['hits'] + verdict_stats['misses'],
+        'translation_hits': translation_stats['memory_hits'] + translation_stats['disk_hits'],
+        'translation_lookups': (translation_stats['memory_hits'] + translation_stats['disk_hits']
+                                + translation_stats['misses']),
+    }
+
+
+def reuse_rates(moderator, before, messages, flood_rejections):
+    """
+    Share of the measured messages rejected as floods, and the verdict and
+    translation cache hit rates over the lookups they made (counters since before).
+    """
+    after = reuse_counters(moderator)
+    delta = {name: after[name] - before[name] for name in after}
+    return {
+        'flood_rejection_rate': flood_rejections / messages if messages else 0.0,
+        'verdict_cache_hit_rate': delta['verdict_hits'] / delta['verdict_lookups'] if delta['verdict_lookups'] else 0.0,
+        'translation_cache_hit_rate': (delta['translation_hits'] / delta['translation_lookups']
+                                       if delta['translation_lookups'] else 0.0),
+    }
+
+
+def is_flood_rejection(reason):
+    return bool(reason) and reason.startswith("Flooding")
+
+
+def run_direct(moderator, corpus, warmup):
+    """Replay corpus through moderate_message; returns the result section."""
+    for text, username in corpus[:warmup]:
+        moderator.replay_clock.tick()
+        moderator.moderate_message(text, username)
+    moderator.metrics = RecordingMetrics()
+    before = reuse_counters(moderator)
+
+    measured = corpus[warmup:]
+    outcomes = {}
+    flood_rejections = 0
+    start = time.perf_counter()
+    for text, username in measured:
+        moderator.replay_clock.tick()
+        is_allowed, reason, _, mode = moderator.moderate_message(text, username)
+        key = f"{is_allowed}/{mode}"
+        outcomes[key] = outcomes.get(key, 0) + 1
+        flood_rejections += is_flood_rejection(reason)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'messages': len(measured),
+        'seconds': elapsed,
+        'messages_per_sec': len(measured) / elapsed if elapsed else 0.0,
+        'reuse': reuse_rates(moderator, before, len(measured), flood_rejections),
+        'stages': {stage: percentiles(samples) for stage, samples in sorted(moderator.metrics.samples.items())},
+        'outcomes': outcomes,
+        'verdict_cache': moderator.verdict_cache.stats(),
+        'translation_cache': moderator.translation_cache.stats(),
+    }
+
+
+def run_http(app_module, moderator, corpus, warmup):
+    """Replay corpus through the Flask /moderate-message endpoint; returns the result section."""
+    app_module.moderator = moderator
+    client = app_module.app.test_client()
+    for text, username in corpus[:warmup]:
+        moderator.replay_clock.tick()
+        client.post('/moderate-message', json={'text': text, 'username': username})
+    moderator.metrics = RecordingMetrics()
+    before = reuse_counters(moderator)
+
+    measured = corpus[warmup:]
+    request_latencies = []
+    statuses = {}
+    flood_rejections = 0
+    start = time.perf_counter()
+    for text, username in measured:
+        moderator.replay_clock.tick()
+        request_start = time.perf_counter()
+        response = client.post('/moderate-message', json={'text': text, 'username': username})
+        request_latencies.append(time.perf_counter() - request_start)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        flood_rejections += is_flood_rejection(response.get_json().get('message'))
+    elapsed = time.perf_counter() - start
+
+    stages = {stage: percentiles(samples) for stage, samples in sorted(moderator.metrics.samples.items())}
+    stages['http_request'] = percentiles(request_latencies)
+    return {
+        'messages': len(measured),
+        'seconds': elapsed,
+        'messages_per_sec': len(measured) / elapsed if elapsed else 0.0,
+        'reuse': reuse_rates(moderator, before, len(measured), flood_rejections),
+        'stages': stages,
+        'statuses': statuses,
+    }
+
+
+def run_allocations(moderator, corpus):
+    """
+    Replay corpus under tracemalloc. CPython does not expose a cheap count
+    of individual allocations, so this reports bytes: the peak allocated
+    while moderating one message and what stays allocated afterwards.
+    """
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    peaks = []
+    for text, username in corpus:
+        moderator.replay_clock.tick()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        moderator.moderate_message(text, username)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peaks.sort()
+    return {
+        'messages': len(corpus),
+        'peak_bytes_per_message_mean': sum(peaks) / len(peaks) if peaks else 0,
+        'peak_bytes_per_message_p95': peaks[int(0.95 * (len(peaks) - 1))] if peaks else 0,
+        'retained_bytes_per_message': (retained - baseline) / len(corpus) if corpus else 0,
+    }
+
+
+def compare(results, baseline):
+    """Print throughput and p95 changes against a previous results file."""
+    for section in ('direct', 'http'):
+        current, previous = results.get(section), baseline.get(section)
+        if not current or not previous:
+            continue
+        before, after = previous['messages_per_sec'], current['messages_per_sec']
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{section}: {before:.1f} -> {after:.1f} msg/s ({change:+.1f}%)")
+        for name, rate in current.get('reuse', {}).items():
+            old = previous.get('reuse', {}).get(name)
+            if old is not None:
+                print(f"  {name:<28} {old:.1%} -> {rate:.1%}")
+        for stage, stats in current['stages'].items():
+            old = previous['stages'].get(stage, {}).get('p95_ms')
+            new = stats.get('p95_ms')
+            if old and new:
+                print(f"  {stage:<20} p95 {old:.3f} -> {new:.3f} ms ({(new - old) / old * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='corpus file (plain text or JSON lines); synthetic if omitted')
+    parser.add_argument('--messages', type=int, default=2000, help='synthetic corpus size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--unique-rate', type=float, default=0.3,
+                        help='share of synthetic messages made unique with a random suffix')
+    parser.add_argument('--chat-rate', type=float, default=5.0,
+                        help='simulated chat messages per second seen by the flood detector')
+    parser.add_argument('--no-reuse', action='store_true',
+                        help='disable the verdict and translation caches and the flood detector')
+    parser.add_argument('--warmup', type=int, default=100, help='messages replayed before measuring')
+    parser.add_argument('--translator-latency', type=float, default=0.08, help='mean simulated latency (s)')
+    parser.add_argument('--translator-jitter', type=float, default=0.02)
+    parser.add_argument('--translator-failure-rate', type=float, default=0.0)
+    parser.add_argument('--skip-http', action='store_true', help='only benchmark the moderator directly')
+    parser.add_argument('--allocation-messages', type=int, default=500,
+                        help='messages replayed under tracemalloc (0 to skip)')
+    parser.add_argument('--output', default='moderation_benchmark.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.messages, args.seed, unique_rate=args.unique_rate)
+    if len(corpus) <= args.warmup:
+        parser.error('the corpus must be larger than --warmup')
+
+    with tempfile.TemporaryDirectory(prefix='moderation-benchmark-') as workdir:
+        # Importing the app builds its module-level moderator in the working directory
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            import app as app_module
+        finally:
+            os.chdir(previous_cwd)
+        if app_module.moderator.config_watcher is not None:
+            app_module.moderator.config_watcher.stop()
+
+        results = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'settings': {
+                'corpus': args.corpus or 'synthetic',
+                'corpus_messages': len(corpus),
+                'seed': args.seed,
+                'unique_rate': args.unique_rate,
+                'chat_rate': args.chat_rate,
+                'no_reuse': args.no_reuse,
+                'warmup': args.warmup,
+                'translator_latency': args.translator_latency,
+                'translator_jitter': args.translator_jitter,
+                'translator_failure_rate': args.translator_failure_rate,
+            },
+        }
+
+        # Every pass gets a fresh moderator so caches warmed by one pass do not flatter the next
+        for section in ('direct', 'http', 'allocations'):
+            if section == 'http' and args.skip_http:
+                continue
+            if section == 'allocations' and not args.allocation_messages:
+                continue
+            section_dir = os.path.join(workdir, section)
+            os.makedirs(section_dir)
+            moderator = create_moderator(app_module, section_dir, args)
+            try:
+                if section == 'direct':
+                    results[section] = run_direct(moderator, corpus, args.warmup)
+                elif section == 'http':
+                    results[section] = run_http(app_module, moderator, corpus, args.warmup)
+                else:
+                    results[section] = run_allocations(moderator, corpus[:args.allocation_messages])
+            finally:
+                moderator.translator_pool.shutdown()
+                moderator.warning_store.close()
+                moderator.translation_cache.close()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    for section in ('direct', 'http'):
+        if section in results:
+            stats = results[section]
+            reuse = stats['reuse']
+            print(f"{section}: {stats['messages']} messages, {stats['messages_per_sec']:.1f} msg/s "
+                  f"({reuse['flood_rejection_rate']:.1%} rejected as floods, "
+                  f"verdict cache hits {reuse['verdict_cache_hit_rate']:.1%}, "
+                  f"translation cache hits {reuse['translation_cache_hit_rate']:.1%})")
+            for stage, stage_stats in stats['stages'].items():
+                if stage_stats['count']:
+                    print(f"  {stage:<20} p50 {stage_stats['p50_ms']:.3f}  p95 {stage_stats['p95_ms']:.3f}  "
+                          f"p99 {stage_stats['p99_ms']:.3f} ms  (n={stage_stats['count']})")
+    if 'allocations' in results:
+        allocations = results['allocations']
+        print(f"allocations: {allocations['peak_bytes_per_message_mean']:.0f} B peak/message, "
+              f"{allocations['retained_bytes_per_message']:.0f} B retained/message")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
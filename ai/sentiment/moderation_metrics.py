@@ -0,0 +1,131 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency buckets, from a lexicon scan to a slow translation
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (per-bucket counts, cumulated on render)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class StageTimer:
+    """Context manager behind ModerationMetrics.time (a plain class is cheaper than a generator)."""
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class ModerationMetrics:
+    """
+    Per-stage latency histograms and verdict counters for the moderator,
+    rendered in the Prometheus text exposition format.
+    Recording costs one perf_counter pair and a short locked update.
+    """
+
+    def __init__(self, prefix='moderation'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._verdicts = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def time(self, stage):
+        """Time the body of a with block as one observation of stage."""
+        return StageTimer(self, stage)
+
+    def record_verdict(self, is_allowed, mode):
+        if is_allowed is True:
+            outcome = 'allowed'
+        elif is_allowed == 'warning':
+            outcome = 'warning'
+        else:
+            outcome = 'rejected'
+        key = (outcome, mode)
+        with self._lock:
+            self._verdicts[key] = self._verdicts.get(key, 0) + 1
+
+    def render(self, extra=()):
+        """
+        Render all metrics as Prometheus text.
+        extra is an iterable of (name, help, type, {label tuple: value})
+        for values owned by other components (caches, circuit breaker).
+        """
+        with self._lock:
+            stages = {
+                stage: (list(histogram.counts), histogram.total, histogram.count, histogram.buckets)
+                for stage, histogram in self._stages.items()
+            }
+            verdicts = dict(self._verdicts)
+
+        name = f'{self.prefix}_stage_seconds'
+        lines = [
+            f'# HELP {name} Time spent in each moderation stage.',
+            f'# TYPE {name} histogram',
+        ]
+        for stage in sorted(stages):
+            counts, total, count, buckets = stages[stage]
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = format_labels((('stage', stage), ('le', format_value(bound))))
+                lines.append(f'{name}_bucket{labels} {cumulative}')
+            labels = format_labels((('stage', stage),))
+            lines.append(f'{name}_sum{labels} {format_value(total)}')
+            lines.append(f'{name}_count{labels} {count}')
+
+        name = f'{self.prefix}_verdicts_total'
+        lines.append(f'# HELP {name} Moderation verdicts by outcome and mode.')
+        lines.append(f'# TYPE {name} counter')
+        for (outcome, mode), value in sorted(verdicts.items()):
+            lines.append(f'{name}{format_labels((("outcome", outcome), ("mode", mode)))} {value}')
+
+        for metric_name, help_text, metric_type, values in extra:
+            metric_name = f'{self.prefix}_{metric_name}'
+            lines.append(f'# HELP {metric_name} {help_text}')
+            lines.append(f'# TYPE {metric_name} {metric_type}')
+            for labels, value in values.items():
+                lines.append(f'{metric_name}{format_labels(labels)} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SessionError(Exception):
+    """Raised for unknown, closed or overloaded streaming sessions; status_code is the HTTP status to answer with."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ModerationSession:
+    """
+    One chat client's streaming channel.
+    Messages are moderated in the order they were submitted and their
+    verdicts are queued as server-sent events.
+    """
+
+    def __init__(self, session_id, username, max_pending):
+        self.session_id = session_id
+        self.username = username
+        self.max_pending = max_pending
+        self.inbox = asyncio.Queue()
+        # Read by the Flask thread serving the event stream
+        self.events = queue.Queue()
+        self.last_active = time.monotonic()
+        self.closed = False
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+
+    def reserve(self, count):
+        """Claim inbox room for count messages and return their ids."""
+        with self._pending_lock:
+            if self.closed:
+                raise SessionError("Session is closed", 410)
+            if self._pending + count > self.max_pending:
+                raise SessionError("Too many messages awaiting moderation", 429)
+            self._pending += count
+            self.last_active = time.monotonic()
+            return [next(self._message_ids) for _ in range(count)]
+
+    def release(self):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def publish(self, event, data, event_id=None):
+        self.events.put((event, data, event_id))
+
+
+def format_event(event, data, event_id=None):
+    """Encode one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ModerationStream:
+    """
+    Streaming moderation for live chat (server-sent events + POST).
+    Clients open a session, post messages to it and read verdicts from
+    its event stream, so a message costs no new connection or CORS
+    preflight. All sessions are served by one asyncio event loop on a
+    background thread: the cheap prechecks run on the loop, and the
+    analysis (language detection, translation, sentiment) is handed to
+    a thread pool, so a slow translation only delays its own session.
+    Sessions live in this process's memory, so every request of a
+    session must reach the same process. Warnings go to the shared
+    warning store like any other strike, so a session sees warnings
+    from other sessions, resets and the sliding window.
+    """
+
+    def __init__(self, moderator, max_sessions=10000, max_pending=256, session_ttl=600, analysis_workers=8):
+        self.moderator = moderator
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.session_ttl = session_ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=analysis_workers, thread_name_prefix='stream-analysis')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='moderation-stream', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._expire_sessions())
+        self._loop.run_forever()
+
+    def open_session(self, username):
+        """Open a session for username and return it."""
+        session = ModerationSession(uuid.uuid4().hex, username, self.max_pending)
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionError("Too many open sessions", 503)
+            self._sessions[session.session_id] = session
+        asyncio.run_coroutine_threadsafe(self._serve_session(session), self._loop)
+        return session
+
+    def get_session(self, session_id):
+        """Return the open session with session_id or raise SessionError."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionError("Unknown session", 404)
+        return session
+
+    def submit(self, session_id, texts):
+        """Queue texts for moderation in order; returns the message ids their verdicts will carry."""
+        session = self.get_session(session_id)
+        message_ids = session.reserve(len(texts))
+        for message_id, text in zip(message_ids, texts):
+            self._loop.call_soon_threadsafe(session.inbox.put_nowait, (message_id, text))
+        return message_ids
+
+    def close_session(self, session_id):
+        """Close a session; verdicts already queued are dropped and its event stream ends."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.closed = True
+            self._loop.call_soon_threadsafe(session.inbox.put_nowait, None)
+            session.events.put(None)
+
+    def events(self, session_id, keepalive=15.0):
+        """Yield the session's verdicts as server-sent events until it is closed."""
+        session = self.get_session(session_id)
+        yield format_event('session', {'session_id': session.session_id, 'username': session.username})
+        while True:
+            try:
+                item = session.events.get(timeout=keepalive)
+            except queue.Empty:
+                session.last_active = time.monotonic()
+                # Comment line; keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                yield format_event('closed', {'session_id': session.session_id})
+                return
+            session.last_active = time.monotonic()
+            yield format_event(*item)
+
+    async def _serve_session(self, session):
+        while True:
+            item = await session.inbox.get()
+            if item is None:
+                return
+            message_id, text = item
+            try:
+                is_allowed, reason, sentiment_score, mode = await self._moderate(session, text)
+                session.publish('verdict', {
+                    'id': message_id,
+                    'success': is_allowed is True,
+                    'message': reason,
+                    'allow_post': is_allowed,
+                    'sentiment_score': sentiment_score,
+                    'moderation_mode': mode
+                }, message_id)
+            except Exception as e:
+                print(f"Streaming moderation error: {e}")
+                session.publish('error', {'id': message_id, 'message': 'Moderation failed'}, message_id)
+            finally:
+                session.release()
+
+    async def _moderate(self, session, text):
+        """Same steps as MessageModerator.moderate_message, with blocking work kept off the loop."""
+        moderator = self.moderator
+        start = time.perf_counter()
+        snapshot = moderator.snapshot
+
+        verdict, analysis, signature = moderator.precheck_message(text, session.username, snapshot)
+        if verdict is None:
+            if analysis is None:
+                # Detection and translation block (up to the translator deadline); keep them off the loop
+                analysis = await self._loop.run_in_executor(self._executor, moderator.analyze_text, text, snapshot)
+                moderator.remember_analysis(text, signature, analysis, snapshot)
+
+            should_block = False
+            if moderator.needs_warning(analysis):
+                should_block = await self._record_strike(session, snapshot)
+            verdict = moderator.verdict_from_analysis(analysis, should_block)
+
+        moderator.metrics.observe('total', time.perf_counter() - start)
+        moderator.metrics.record_verdict(verdict[0], verdict[3])
+        return verdict
+
+    async def _record_strike(self, session, snapshot):
+        """Add a warning for the session's user; returns whether it blocks them."""
+        try:
+            return await self._loop.run_in_executor(
+                self._executor, self.moderator.increment_user_warning, session.username, snapshot
+            )
+        except Exception as e:
+            # The message is rejected either way; only the block decision is lost
+            print(f"Failed to record warning for {session.username}: {e}")
+            return False
+
+    async def _expire_sessions(self):
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    session_id for session_id, session in self._sessions.items()
+                    if now - session.last_active > self.session_ttl
+                ]
+            for session_id in idle:
+                self.close_session(session_id)
+
+    def stats(self):
+        """Return the number of open sessions."""
+        with self._lock:
+            return {'sessions': len(self._sessions)}
@@ -0,0 +1,120 @@
+from flood_detector import FloodDetector, minhash_signature, shingles, signature_similarity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_detector(**kwargs):
+    clock = FakeClock()
+    return FloodDetector(clock=clock, **kwargs), clock
+
+
+def test_near_identical_copies_share_an_analysis():
+    detector, _ = make_detector()
+    signature, analysis, flooding = detector.check("I did not understand the last question", 'asha')
+    assert analysis is None and not flooding
+    detector.remember(signature, ('analysis',))
+
+    copy_signature, analysis, _ = detector.check("I did not understand the last question!!", 'ravi')
+    assert copy_signature == signature
+    assert analysis == ('analysis',)
+
+
+def test_similarity_of_unrelated_messages_is_low():
+    first = minhash_signature(shingles("can you share the notes from today"), 16)
+    second = minhash_signature(shingles("the exam is postponed to next monday"), 16)
+    assert signature_similarity(first, first) == 1.0
+    assert signature_similarity(first, second) < 0.7
+
+
+def test_short_messages_are_not_tracked():
+    detector, _ = make_detector()
+    assert detector.check("ok thanks", 'asha') == (None, None, False)
+
+
+def test_one_sender_repeating_a_message_floods():
+    detector, _ = make_detector(flood_threshold=8)
+    flags = [detector.check("buy cheap followers at my page", 'spammer')[2] for _ in range(8)]
+    assert flags == [False] * 7 + [True]
+
+
+def test_the_whole_class_asking_the_same_question_is_not_a_flood():
+    detector, clock = make_detector(flood_threshold=8)
+    flags = []
+    for index in range(40):
+        # 40 students over a minute and a half
+        clock.now += 2
+        flags.append(detector.check("can you share the notes please", f"student{index}")[2])
+    assert not any(flags)
+
+
+def test_a_raid_by_many_accounts_posting_once_is_caught():
+    detector, clock = make_detector(burst_window=10, burst_threshold=30)
+    flags = []
+    for index in range(40):
+        clock.now += 0.1
+        flags.append(detector.check("join my channel for free answers", f"raider{index}")[2])
+    assert flags == [False] * 29 + [True] * 11
+
+
+def test_a_raid_by_accounts_posting_twice_is_caught():
+    detector, clock = make_detector(burst_window=10, burst_threshold=30)
+    flags = []
+    for index in range(40):
+        clock.now += 0.1
+        flags.append(detector.check("join my channel for free answers", f"raider{index % 20}")[2])
+    assert flags[-1]
+
+
+def test_exempt_copies_are_configurable():
+    detector, _ = make_detector(flood_threshold=4, copies_per_sender=1, exempt_copies=2)
+    for index in range(4):
+        detector.check("+1 same question here please", f"student{index}")
+    assert not detector.check("+1 same question here please", 'student0')[2]
+    assert detector.check("+1 same question here please", 'student0')[2]
+
+
+def test_a_few_accounts_sharing_a_flood_are_caught():
+    detector, _ = make_detector(flood_threshold=8, copies_per_sender=3)
+    flags = [detector.check("join my channel for free answers", f"bot{index % 3}")[2] for index in range(9)]
+    assert flags[-1]
+
+
+def test_first_copy_from_another_sender_is_not_rejected():
+    detector, _ = make_detector(flood_threshold=8)
+    for _ in range(20):
+        detector.check("buy cheap followers at my page", 'spammer')
+    assert not detector.check("buy cheap followers at my page", 'asha')[2]
+    assert detector.check("buy cheap followers at my page", 'spammer')[2]
+
+
+def test_copies_leave_the_flood_window():
+    detector, clock = make_detector(flood_window=60, flood_threshold=3)
+    for _ in range(2):
+        detector.check("buy cheap followers at my page", 'spammer')
+    clock.now += 61
+    assert not detector.check("buy cheap followers at my page", 'spammer')[2]
+
+
+def test_analyses_expire_and_can_be_forgotten():
+    detector, clock = make_detector(reuse_ttl=10)
+    signature, _, _ = detector.check("please explain the second law again", 'asha')
+    detector.remember(signature, ('analysis',))
+    clock.now += 11
+    assert detector.check("please explain the second law again", 'asha')[1] is None
+
+    detector.remember(signature, ('analysis',))
+    detector.forget_analyses()
+    assert detector.check("please explain the second law again", 'asha')[1] is None
+
+
+def test_index_is_bounded():
+    detector, _ = make_detector(max_entries=10)
+    for index in range(50):
+        detector.check(f"message number {index} about topic {index * 7}", 'asha')
+    assert len(detector._entries) <= 10
@@ -0,0 +1,34 @@
+from lexicon_matcher import OffensiveTermMatcher, normalize_text
+
+
+def test_matches_whole_words_only():
+    matcher = OffensiveTermMatcher(["ass", "idiot"])
+    assert matcher.contains("you are an idiot")
+    assert matcher.contains("what an ass!")
+    assert not matcher.contains("the class starts at nine")
+    assert not matcher.contains("idiotic")
+
+
+def test_matching_is_case_and_whitespace_insensitive():
+    matcher = OffensiveTermMatcher(["make love"])
+    assert matcher.search("MAKE   Love not war") == "make love"
+    assert normalize_text("  Make \n LOVE ") == "make love"
+
+
+def test_finds_overlapping_terms_in_order():
+    matcher = OffensiveTermMatcher(["dog", "dogshit", "shit"])
+    assert matcher.find_all("dogshit and dog") == ["dogshit", "dog"]
+    assert matcher.find_all("that is shit") == ["shit"]
+
+
+def test_native_script_terms_keep_their_matras():
+    matcher = OffensiveTermMatcher(["चोर"])
+    assert matcher.contains("वह चोर है")
+    # A trailing vowel sign makes it a different word
+    assert not matcher.contains("चोरी हो गई")
+
+
+def test_empty_and_duplicate_terms_are_ignored():
+    matcher = OffensiveTermMatcher(["", "  ", "trash", "Trash"])
+    assert len(matcher) == 1
+    assert matcher.search("") is None
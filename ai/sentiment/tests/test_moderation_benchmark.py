@@ -0,0 +1,26 @@
+from flood_detector import FloodDetector
+from moderation_benchmark import ReplayClock, percentiles, synthetic_corpus
+
+
+def test_synthetic_corpus_is_not_mistaken_for_a_flood():
+    clock = ReplayClock(messages_per_sec=5.0)
+    detector = FloodDetector(clock=clock)
+    flagged = 0
+    for text, username in synthetic_corpus(2000):
+        clock.tick()
+        flagged += detector.check(text, username)[2]
+    assert flagged == 0
+
+
+def test_synthetic_corpus_is_reproducible():
+    assert synthetic_corpus(100, seed=3) == synthetic_corpus(100, seed=3)
+    unique = synthetic_corpus(1000, unique_rate=1.0)
+    assert len({text for text, _ in unique}) > 900
+
+
+def test_percentiles_are_in_milliseconds():
+    stats = percentiles([0.001] * 99 + [0.5])
+    assert stats['count'] == 100
+    assert stats['p50_ms'] == 1.0
+    assert stats['max_ms'] == 500.0
+    assert percentiles([]) == {'count': 0}
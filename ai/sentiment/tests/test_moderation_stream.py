@@ -0,0 +1,113 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from moderation_metrics import ModerationMetrics
+from moderation_stream import ModerationStream, SessionError
+from warning_store import WarningStore
+
+
+class StubModerator:
+    """The parts of MessageModerator a stream uses; messages containing 'bad' are negative."""
+
+    def __init__(self, warning_store):
+        self.warning_store = warning_store
+        self.snapshot = SimpleNamespace(block_after_warnings=3)
+        self.metrics = ModerationMetrics()
+
+    def precheck_message(self, text, username, snapshot):
+        return None, None, None
+
+    def analyze_text(self, text, snapshot=None):
+        if 'bad' in text:
+            return False, "Negative", False, -0.6, "full"
+        return False, "Positive", True, 0.5, "full"
+
+    def remember_analysis(self, text, signature, analysis, snapshot):
+        pass
+
+    def needs_warning(self, analysis):
+        return not analysis[2]
+
+    def increment_user_warning(self, username, snapshot=None):
+        return self.warning_store.increment(username) >= snapshot.block_after_warnings
+
+    def verdict_from_analysis(self, analysis, should_block=False):
+        if should_block:
+            return False, "Blocked", analysis[3], analysis[4]
+        return analysis[2], analysis[1], analysis[3], analysis[4]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WarningStore(str(tmp_path / 'warnings.db'))
+    yield store
+    store.close()
+
+
+def verdicts(stream, session, texts):
+    stream.submit(session.session_id, texts)
+    results = []
+    for _ in texts:
+        event, data, _ = session.events.get(timeout=5)
+        assert event == 'verdict'
+        results.append(data['message'])
+    return results
+
+
+def test_strikes_from_elsewhere_count_towards_the_block(store):
+    stream = ModerationStream(StubModerator(store))
+    session = stream.open_session('asha')
+    assert verdicts(stream, session, ["bad one"]) == ["Negative"]
+    # Two strikes arrive through /moderate-message while the session is open
+    store.increment_many(['asha', 'asha'])
+    assert verdicts(stream, session, ["bad two"]) == ["Blocked"]
+    assert store.get('asha') == 4
+
+
+def test_reset_is_seen_by_open_sessions(store):
+    stream = ModerationStream(StubModerator(store))
+    session = stream.open_session('asha')
+    assert verdicts(stream, session, ["bad", "bad", "fine", "bad"]) == ["Negative", "Negative", "Positive", "Blocked"]
+    store.reset('asha')
+    assert verdicts(stream, session, ["bad again"]) == ["Negative"]
+
+
+def test_failed_warning_write_is_logged_and_the_verdict_still_sent(store, capsys):
+    moderator = StubModerator(store)
+
+    def broken_increment(username, snapshot=None):
+        raise RuntimeError("database is locked")
+
+    moderator.increment_user_warning = broken_increment
+    stream = ModerationStream(moderator)
+    session = stream.open_session('asha')
+    assert verdicts(stream, session, ["bad"]) == ["Negative"]
+    assert "Failed to record warning for asha: database is locked" in capsys.readouterr().out
+
+
+def test_closed_sessions_reject_messages(store):
+    stream = ModerationStream(StubModerator(store))
+    session = stream.open_session('asha')
+    stream.close_session(session.session_id)
+    with pytest.raises(SessionError) as error:
+        stream.submit(session.session_id, ["hello"])
+    assert error.value.status_code == 404
+
+
+def test_analysis_runs_once_off_the_event_loop(store):
+    moderator = StubModerator(store)
+    threads = []
+    analyze_text = moderator.analyze_text
+
+    def recording_analyze_text(text, snapshot=None):
+        threads.append(threading.current_thread().name)
+        return analyze_text(text, snapshot)
+
+    moderator.analyze_text = recording_analyze_text
+    stream = ModerationStream(moderator)
+    session = stream.open_session('asha')
+    assert verdicts(stream, session, ["hello", "bad"]) == ["Positive", "Negative"]
+    assert len(threads) == 2
+    assert all(name.startswith('stream-analysis') for name in threads)
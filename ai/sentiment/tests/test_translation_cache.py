@@ -0,0 +1,75 @@
+import threading
+import time
+
+from translation_cache import TranslationCache, translation_key
+from translator_pool import TranslatorPool
+
+
+class StatefulTranslator:
+    """Keeps the text on the instance while the request is in flight, like deep_translator does."""
+
+    def __init__(self, source_lang):
+        self.source_lang = source_lang
+        self._params = {}
+
+    def translate(self, text):
+        self._params['q'] = text
+        time.sleep(0.001)
+        return f"en({self._params['q']})"
+
+
+def test_key_ignores_whitespace_but_not_language():
+    assert translation_key('hi', 'नमस्ते  दोस्त') == translation_key('hi', ' नमस्ते दोस्त ')
+    assert translation_key('hi', 'नमस्ते') != translation_key('mr', 'नमस्ते')
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'translations.db')
+    cache = TranslationCache(path)
+    cache.set('fr', 'bonjour', 'hello')
+    assert cache.get('fr', 'bonjour') == 'hello'
+    cache.close()
+
+    cache = TranslationCache(path)
+    assert cache.get('fr', 'bonjour') == 'hello'
+    assert cache.get('fr', 'salut') is None
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['misses']) == (1, 1)
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = TranslationCache(str(tmp_path / 'translations.db'), ttl_seconds=0)
+    cache.set('fr', 'bonjour', 'hello')
+    assert cache.get('fr', 'bonjour') is None
+
+
+def test_memory_layer_is_bounded(tmp_path):
+    cache = TranslationCache(str(tmp_path / 'translations.db'), max_memory_entries=2)
+    for word in ('un', 'deux', 'trois'):
+        cache.set('fr', word, word.upper())
+    assert cache.stats()['memory_entries'] == 2
+    # The evicted entry is still on disk
+    assert cache.get('fr', 'un') == 'UN'
+
+
+def test_concurrent_callers_get_their_own_translations(tmp_path):
+    cache = TranslationCache(str(tmp_path / 'translations.db'))
+    pool = TranslatorPool(StatefulTranslator, max_workers=4, max_pending=256, timeout=5.0)
+    errors = []
+
+    def worker(number):
+        texts = [f"texte {number}-{index}" for index in range(20)]
+        for text, translated in zip(texts, pool.translate_batch('fr', texts)):
+            if translated != f"en({text})":
+                errors.append((text, translated))
+            cache.set('fr', text, translated)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.shutdown()
+
+    assert errors == []
+    assert cache.get('fr', 'texte 3-7') == 'en(texte 3-7)'
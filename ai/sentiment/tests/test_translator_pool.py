@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from translator_pool import CircuitBreaker, TranslatorPool
+
+
+class UnsupportedLanguage(Exception):
+    pass
+
+
+class EchoTranslator:
+    def __init__(self, source_lang, delay=0.0):
+        self.source_lang = source_lang
+        self.delay = delay
+
+    def translate(self, text):
+        time.sleep(self.delay)
+        return f"en:{text}"
+
+
+class FailingTranslator:
+    def __init__(self, source_lang):
+        pass
+
+    def translate(self, text):
+        raise ConnectionError("translator unreachable")
+
+
+def make_pool(factory, **kwargs):
+    kwargs.setdefault('input_errors', (UnsupportedLanguage,))
+    return TranslatorPool(factory, **kwargs)
+
+
+def test_batches_larger_than_the_pool_are_fully_translated():
+    pool = make_pool(lambda lang: EchoTranslator(lang, delay=0.001), max_workers=4, max_pending=8)
+    texts = [f"message {index}" for index in range(200)]
+    assert pool.translate_batch('fr', texts) == [f"en:{text}" for text in texts]
+    assert pool.breaker.state == CircuitBreaker.CLOSED
+    pool.shutdown()
+
+
+def test_concurrent_batches_share_the_slots():
+    pool = make_pool(EchoTranslator, max_workers=2, max_pending=4)
+    results = {}
+
+    def worker(number):
+        texts = [f"{number}-{index}" for index in range(50)]
+        results[number] = pool.translate_batch('fr', texts) == [f"en:{text}" for text in texts]
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {0: True, 1: True, 2: True, 3: True}
+    pool.shutdown()
+
+
+def test_unsupported_language_does_not_open_the_circuit():
+    built = []
+
+    def factory(lang):
+        built.append(lang)
+        if lang == 'xx':
+            raise UnsupportedLanguage(lang)
+        return EchoTranslator(lang)
+
+    pool = make_pool(factory, max_workers=1)
+    for _ in range(10):
+        assert pool.translate_batch('xx', ['shalom']) == [None]
+    assert pool.breaker.state == CircuitBreaker.CLOSED
+    # The language is remembered, not rebuilt on every call
+    assert built == ['xx']
+    assert pool.translate('fr', 'bonjour') == 'en:bonjour'
+    pool.shutdown()
+
+
+def test_outages_open_the_circuit():
+    pool = make_pool(FailingTranslator, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    for _ in range(3):
+        assert pool.translate('fr', 'bonjour') is None
+    assert pool.breaker.state == CircuitBreaker.OPEN
+    pool.shutdown()
+
+
+def test_timeouts_count_as_failures():
+    pool = make_pool(lambda lang: EchoTranslator(lang, delay=0.5), max_workers=1, timeout=0.05,
+                     breaker=CircuitBreaker(failure_threshold=1))
+    assert pool.translate('fr', 'bonjour') is None
+    assert pool.breaker.state == CircuitBreaker.OPEN
+    pool.shutdown()
+
+
+def test_hung_translator_is_bounded_by_one_deadline_per_request():
+    hang = threading.Event()
+
+    class HungTranslator:
+        def __init__(self, source_lang):
+            pass
+
+        def translate(self, text):
+            hang.wait()
+
+    pool = make_pool(HungTranslator, max_workers=4, batch_timeout=0.2,
+                     breaker=CircuitBreaker(failure_threshold=100))
+    start = time.monotonic()
+    deadline = pool.deadline()
+    results = [pool.translate_batch(lang, [f"{lang} {index}" for index in range(200)], deadline)
+               for lang in ('fr', 'de', 'es')]
+    elapsed = time.monotonic() - start
+    hang.set()
+    assert results == [[None] * 200] * 3
+    assert elapsed < 0.5
+    pool.shutdown()
+
+
+def test_rejected_trial_call_does_not_wedge_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    def factory(lang):
+        if lang == 'xx':
+            raise UnsupportedLanguage(lang)
+        return EchoTranslator(lang)
+
+    pool = make_pool(factory, breaker=breaker)
+    # The half-open trial is used up by a rejected language, then given back
+    assert pool.translate('xx', 'shalom') is None
+    assert pool.translate('fr', 'bonjour') == 'en:bonjour'
+    assert breaker.state == CircuitBreaker.CLOSED
+    pool.shutdown()
+
+
+def test_hebrew_is_sent_with_the_code_google_expects():
+    pytest.importorskip('langdetect')
+    from language_detection import LanguageDetector, translator_code
+
+    language, _ = LanguageDetector().detect("שלום לכולם, מה שלומכם היום")
+    assert translator_code(language) == 'iw'
+    assert translator_code('zh-cn') == 'zh-CN'
+    assert translator_code('fr') == 'fr'
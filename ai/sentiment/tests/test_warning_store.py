@@ -0,0 +1,80 @@
+import threading
+
+from warning_store import WarningStore
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_store(tmp_path, clock, **kwargs):
+    return WarningStore(str(tmp_path / 'warnings.db'), clock=clock, **kwargs)
+
+
+def test_counts_within_the_window(tmp_path):
+    clock = FakeClock()
+    store = make_store(tmp_path, clock, window_seconds=3600, num_buckets=4)
+    assert store.increment('asha') == 1
+    assert store.increment('asha') == 2
+    assert store.increment_many(['asha', 'ravi', 'asha']) == [3, 1, 4]
+    assert store.get('asha') == 4
+    assert store.get('nobody') == 0
+
+
+def test_old_strikes_slide_out_of_the_window(tmp_path):
+    clock = FakeClock()
+    store = make_store(tmp_path, clock, window_seconds=3600, num_buckets=4)
+    store.increment('asha')
+    clock.now += 1800
+    store.increment('asha')
+    assert store.get('asha') == 2
+
+    # The first strike's bucket is now older than the window
+    clock.now += 1900
+    assert store.get('asha') == 1
+    clock.now += 1800
+    assert store.get('asha') == 0
+
+
+def test_recycled_slot_starts_from_zero(tmp_path):
+    clock = FakeClock()
+    store = make_store(tmp_path, clock, window_seconds=3600, num_buckets=4)
+    store.increment_many(['asha'] * 3)
+    # Same slot, one full window later
+    clock.now += 3600
+    assert store.increment('asha') == 1
+
+
+def test_reset_and_purge(tmp_path):
+    clock = FakeClock()
+    store = make_store(tmp_path, clock, window_seconds=3600, num_buckets=4)
+    store.increment('asha')
+    store.increment('ravi')
+    store.reset('asha')
+    assert store.get('asha') == 0
+    clock.now += 7200
+    store.purge_expired()
+    rows = store._conn.execute('SELECT COUNT(*) FROM warning_buckets').fetchone()[0]
+    assert rows == 0
+
+
+def test_import_legacy_counts(tmp_path):
+    store = make_store(tmp_path, FakeClock())
+    store.import_counts({'asha': 2, 'ravi': 0, 'meera': '3'})
+    assert store.get('asha') == 2
+    assert store.get('ravi') == 0
+    assert store.get('meera') == 3
+
+
+def test_concurrent_increments_are_not_lost(tmp_path):
+    store = make_store(tmp_path, FakeClock())
+    threads = [threading.Thread(target=lambda: [store.increment('asha') for _ in range(25)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get('asha') == 100
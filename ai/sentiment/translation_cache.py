@@ -0,0 +1,135 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def translation_key(source_lang, text):
+    """Cache key for a translation: source language plus a hash of the normalized text."""
+    normalized = " ".join(unicodedata.normalize('NFKC', text).split())
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f"{source_lang}:{digest}"
+
+
+class TranslationCache:
+    """
+    Two-level cache of translations to English.
+    An in-process LRU sits in front of a SQLite table that survives
+    restarts. Both levels are size-bounded and entries expire after
+    ttl_seconds. Hit/miss counters are available from stats().
+    """
+
+    def __init__(self, db_path='translation_cache.db', max_memory_entries=10000,
+                 max_disk_entries=200000, ttl_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk_writes = 0
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+        }
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'cache_key TEXT PRIMARY KEY, '
+            'translated_text TEXT NOT NULL, '
+            'created_at REAL NOT NULL, '
+            'last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)')
+        self._conn.commit()
+
+    def _remember(self, key, translated_text, created_at):
+        """Put an entry in the LRU layer, evicting the least recently used one if full."""
+        self._memory[key] = (translated_text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def get(self, source_lang, text):
+        """Return the cached translation of text, or None."""
+        key = translation_key(source_lang, text)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                translated_text, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return translated_text
+                del self._memory[key]
+                self._counters['expired'] += 1
+
+            row = self._conn.execute(
+                'SELECT translated_text, created_at FROM translations WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                translated_text, created_at = row
+                if now - created_at < self.ttl_seconds:
+                    self._conn.execute('UPDATE translations SET last_used = ? WHERE cache_key = ?', (now, key))
+                    self._conn.commit()
+                    self._remember(key, translated_text, created_at)
+                    self._counters['disk_hits'] += 1
+                    return translated_text
+                self._conn.execute('DELETE FROM translations WHERE cache_key = ?', (key,))
+                self._conn.commit()
+                self._counters['expired'] += 1
+
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, source_lang, text, translated_text):
+        """Store the translation of text in both layers."""
+        key = translation_key(source_lang, text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, translated_text, now)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO translations (cache_key, translated_text, created_at, last_used) '
+                'VALUES (?, ?, ?, ?)',
+                (key, translated_text, now, now)
+            )
+            self._disk_writes += 1
+            # Trimming the disk layer needs a COUNT, so only do it every so often
+            if self._disk_writes % 1000 == 0:
+                self._trim_disk(now)
+            self._conn.commit()
+
+    def _trim_disk(self, now):
+        self._conn.execute('DELETE FROM translations WHERE created_at <= ?', (now - self.ttl_seconds,))
+        (count,) = self._conn.execute('SELECT COUNT(*) FROM translations').fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM translations WHERE cache_key IN '
+                '(SELECT cache_key FROM translations ORDER BY last_used LIMIT ?)',
+                (excess,)
+            )
+            self._counters['evictions'] += excess
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the in-process layer."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,174 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+    After failure_threshold consecutive failures the circuit opens and
+    every call fails fast for reset_timeout seconds. Then a single trial
+    call is let through: success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Return True if a call may be attempted now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # Half open: let exactly one trial call through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a call that said nothing about the dependency's health (e.g. it was rejected as bad input)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class TranslatorPool:
+    """
+    Runs translator calls on a bounded thread pool with deadlines.
+    A single text gets timeout seconds; a batch request gets one deadline
+    of batch_timeout seconds however many texts and languages it has
+    (pass deadline() to every translate_batch call of the request).
+    Callers never wait longer than the deadline: a call that times out,
+    raises, cannot get a pool slot in time or finds the circuit open
+    returns None, and the caller falls back to the untranslated text.
+    Exceptions of the input_errors types (an unsupported language, an
+    invalid text) fail that call only: they are not counted against the
+    circuit breaker, and a language whose translator cannot be built is
+    not tried again.
+    """
+
+    def __init__(self, translator_factory, max_workers=4, max_pending=64, timeout=3.0, batch_timeout=10.0,
+                 breaker=None, input_errors=()):
+        self.translator_factory = translator_factory
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.batch_timeout = batch_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.input_errors = tuple(input_errors)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translator')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Translator objects are not thread-safe, so each worker keeps its own
+        self._local = threading.local()
+        self._unsupported = set()
+
+    def _translate_in_worker(self, source_lang, text):
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get(source_lang)
+        if translator is None:
+            try:
+                translator = self.translator_factory(source_lang)
+            except self.input_errors:
+                self._unsupported.add(source_lang)
+                raise
+            translators[source_lang] = translator
+        return translator.translate(text)
+
+    def _submit(self, source_lang, text, timeout):
+        if not self._slots.acquire(timeout=max(0.0, timeout)):
+            return None
+        future = self._executor.submit(self._translate_in_worker, source_lang, text)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def deadline(self):
+        """Deadline (a time.monotonic() value) for all the translation of one batch request."""
+        return time.monotonic() + self.batch_timeout
+
+    def translate(self, source_lang, text):
+        """Translate one text; returns None when the translation is unavailable."""
+        return self.translate_batch(source_lang, [text], time.monotonic() + self.timeout)[0]
+
+    def translate_batch(self, source_lang, texts, deadline=None):
+        """
+        Translate texts concurrently, finishing by deadline (by default
+        a new deadline()). Returns a list aligned with texts; entries
+        that could not be translated in time are None.
+        """
+        results = [None] * len(texts)
+        if deadline is None:
+            deadline = self.deadline()
+        # An earlier language group of the request may have used up the deadline
+        if not texts or source_lang in self._unsupported or deadline <= time.monotonic() or not self.breaker.allow():
+            return results
+
+        futures = {}
+        for index, text in enumerate(texts):
+            # Batches larger than the pool wait for slots to free up
+            future = self._submit(source_lang, text, deadline - time.monotonic())
+            if future is None:
+                break
+            futures[future] = index
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+        failed = bool(not_done)
+        translated = False
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+                translated = True
+            except self.input_errors as e:
+                print(f"Translation rejected ({source_lang}): {e}")
+            except Exception as e:
+                print(f"Translation error: {e}")
+                failed = True
+
+        # Texts that never got a slot or were rejected say nothing about the translator
+        if failed:
+            self.breaker.record_failure()
+        elif translated:
+            self.breaker.record_success()
+        else:
+            self.breaker.release()
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+import codecs
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Mapping
+from functools import lru_cache
+
+import vaderSentiment.vaderSentiment as vader
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# Artifact layout (little endian, every section padded to 4 bytes):
+#   header: magic, lexicon entry count, emoji entry count
+#   lexicon table: key offsets (count + 1 x uint32), key bytes, valences (count x float32)
+#   emoji table:   key offsets, key bytes, value offsets (count + 1 x uint32), value bytes
+# Keys are UTF-8 and sorted bytewise, so lookups are a binary search over the mapping.
+MAGIC = b'VADERLX1'
+HEADER = struct.Struct('<8sII')
+
+
+def _pad(data):
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _pack_strings(strings):
+    offsets = [0]
+    blob = bytearray()
+    for string in strings:
+        blob += string
+        offsets.append(len(blob))
+    return struct.pack(f'<{len(offsets)}I', *offsets) + _pad(bytes(blob))
+
+
+def _read_vader_file(file_name):
+    path = os.path.join(os.path.dirname(os.path.abspath(vader.__file__)), file_name)
+    with codecs.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def parse_vader_lexicons():
+    """Parse VADER's bundled lexicon and emoji files the same way SentimentIntensityAnalyzer does."""
+    lexicon = {}
+    for line in _read_vader_file('vader_lexicon.txt').rstrip('\n').split('\n'):
+        if not line:
+            continue
+        (word, measure) = line.strip().split('\t')[0:2]
+        lexicon[word] = float(measure)
+
+    emojis = {}
+    for line in _read_vader_file('emoji_utf8_lexicon.txt').rstrip('\n').split('\n'):
+        (emoji, description) = line.strip().split('\t')[0:2]
+        emojis[emoji] = description
+    return lexicon, emojis
+
+
+def build_lexicon_artifact(path):
+    """Compile VADER's lexicons into the binary artifact at path (written atomically)."""
+    lexicon, emojis = parse_vader_lexicons()
+
+    lexicon_keys = sorted(word.encode('utf-8') for word in lexicon)
+    valences = [lexicon[key.decode('utf-8')] for key in lexicon_keys]
+    emoji_keys = sorted(emoji.encode('utf-8') for emoji in emojis)
+    descriptions = [emojis[key.decode('utf-8')].encode('utf-8') for key in emoji_keys]
+
+    data = b''.join([
+        HEADER.pack(MAGIC, len(lexicon_keys), len(emoji_keys)),
+        _pack_strings(lexicon_keys),
+        struct.pack(f'<{len(valences)}f', *valences),
+        _pack_strings(emoji_keys),
+        _pack_strings(descriptions),
+    ])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.vader_lexicon.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Workers racing to build the artifact each replace it with identical bytes
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+class MappedTable(Mapping):
+    """
+    Read-only str -> value mapping over a sorted key table inside a memory map.
+    VADER probes the tables for every token and every character, so two
+    small per-process structures sit in front of the binary search: the
+    set of characters keys start with (rejects most characters outright)
+    and an LRU of recent lookups (common words stay hot).
+    """
+
+    def __init__(self, data, keys_offsets, keys_start, value_at, cache_size=8192):
+        self._data = data
+        self._offsets = keys_offsets
+        self._start = keys_start
+        self._value_at = value_at
+        self._count = len(keys_offsets) - 1
+        self._first_chars = frozenset(key[0] for key in self)
+        self._lookup = lru_cache(maxsize=cache_size)(self._index)
+
+    def _key(self, index):
+        return self._data[self._start + self._offsets[index]:self._start + self._offsets[index + 1]]
+
+    def _index(self, key):
+        target = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == target:
+            return low
+        return -1
+
+    def _find(self, key):
+        if not isinstance(key, str) or not key or key[0] not in self._first_chars:
+            return -1
+        return self._lookup(key)
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._value_at(index)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._key(index).decode('utf-8')
+
+    def __len__(self):
+        return self._count
+
+
+class MappedLexicon:
+    """
+    VADER lexicons served straight from the memory-mapped artifact.
+    The pages are mapped read-only from one file, so every worker
+    process shares a single copy through the page cache.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, lexicon_count, emoji_count = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a VADER lexicon artifact")
+        position = HEADER.size
+
+        def strings(count):
+            """Return (offsets view, start of the string bytes) and move past the section."""
+            nonlocal position
+            offsets = view[position:position + 4 * (count + 1)].cast('I')
+            start = position + 4 * (count + 1)
+            position = start + offsets[count] + (-offsets[count] % 4)
+            return offsets, start
+
+        data = self._mmap
+        lexicon_offsets, lexicon_start = strings(lexicon_count)
+        valences = view[position:position + 4 * lexicon_count].cast('f')
+        position += 4 * lexicon_count
+        emoji_offsets, emoji_start = strings(emoji_count)
+        value_offsets, value_start = strings(emoji_count)
+
+        # float32 storage; rounding restores the lexicon's decimal values exactly
+        self.lexicon = MappedTable(data, lexicon_offsets, lexicon_start, lambda index: round(valences[index], 4))
+        self.emojis = MappedTable(
+            data, emoji_offsets, emoji_start,
+            lambda index: data[value_start + value_offsets[index]:value_start + value_offsets[index + 1]].decode('utf-8')
+        )
+
+
+def load_shared_analyzer(path='vader_lexicon.bin'):
+    """
+    Return a SentimentIntensityAnalyzer whose lexicons are read from the
+    memory-mapped artifact at path, building the artifact first if needed.
+    """
+    if not os.path.exists(path):
+        build_lexicon_artifact(path)
+    mapped = MappedLexicon(path)
+
+    # Skip SentimentIntensityAnalyzer.__init__, which parses the text lexicons into private dicts
+    analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    analyzer.lexicon = mapped.lexicon
+    analyzer.emojis = mapped.emojis
+    analyzer.mapped_lexicon = mapped
+    return analyzer
+
+
+if __name__ == '__main__':
+    # Prebuild the artifact at deploy time: python vader_lexicon.py [output path]
+    output = sys.argv[1] if len(sys.argv) > 1 else 'vader_lexicon.bin'
+    build_lexicon_artifact(output)
+    print(f"Wrote {output}")
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def verdict_key(text, version=''):
+    """
+    Cache key for a message: a hash of the config version and the text
+    with whitespace collapsed. Case is kept because VADER scores
+    capitalised words more strongly.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{version}\0{normalized}".encode('utf-8')).digest()
+
+
+class VerdictCache:
+    """
+    LRU cache of text analyses (lexicon hit, translation outcome and
+    sentiment) keyed by the normalized message text.
+    Only the text-dependent part of a verdict is cached; per-user side
+    effects such as warnings are applied by the caller on every hit.
+    Entries expire after ttl_seconds. Lookups carry the version of the
+    config the analysis depends on, so an analysis finished under an old
+    config is never served under a new one; clear() frees them early.
+    """
+
+    def __init__(self, max_entries=20000, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, text, version=''):
+        """Return the cached analysis of text under config version, or None."""
+        key = verdict_key(text, version)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                analysis, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return analysis
+                del self._entries[key]
+                self._counters['expired'] += 1
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, text, analysis, version=''):
+        """Store the analysis of text, evicting the least recently used entry if full."""
+        key = verdict_key(text, version)
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = (analysis, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the config changed."""
+        with self._lock:
+            self._entries.clear()
+            self._counters['invalidations'] += 1
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+
+
+class WarningStore:
+    """
+    Per-user sentiment warning counters kept in SQLite (WAL mode).
+    Warnings are counted over a sliding window (24 hours by default)
+    split into num_buckets time buckets. Each user owns a fixed-size
+    ring of at most num_buckets rows: a bucket slot is reused once its
+    time has passed, so old strikes decay and idle users are purged.
+    Each increment is a single atomic upsert, so the cost does not grow
+    with the number of users and concurrent workers never lose updates.
+    """
+
+    # Purge expired buckets of idle users after this many increments
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, db_path='moderation_warnings.db', window_seconds=24 * 3600, num_buckets=24, clock=time.time):
+        self.db_path = db_path
+        self.window_seconds = window_seconds
+        self.num_buckets = num_buckets
+        self.bucket_seconds = window_seconds / num_buckets
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._increments = 0
+        # Autocommit mode; transactions are opened explicitly below
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS warning_buckets ('
+            'username TEXT NOT NULL, '
+            'slot INTEGER NOT NULL, '
+            'bucket INTEGER NOT NULL, '
+            'warning_count INTEGER NOT NULL, '
+            'PRIMARY KEY (username, slot))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS warning_buckets_bucket ON warning_buckets (bucket)')
+
+    def _current_bucket(self):
+        return int(self.clock() // self.bucket_seconds)
+
+    def _transaction(self, statements):
+        """Run (sql, params) statements in one write transaction and return the rows fetched."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                rows = []
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                    row = cursor.fetchone()
+                    if row is not None:
+                        rows.append(row)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+        return rows
+
+    def _increment_statements(self, username, bucket, amount=1):
+        oldest = bucket - self.num_buckets
+        return [
+            # A slot still holding an older bucket is recycled for the current one
+            ('INSERT INTO warning_buckets (username, slot, bucket, warning_count) VALUES (?, ?, ?, ?) '
+             'ON CONFLICT(username, slot) DO UPDATE SET '
+             'warning_count = CASE WHEN bucket = excluded.bucket '
+             'THEN warning_count + excluded.warning_count ELSE excluded.warning_count END, '
+             'bucket = excluded.bucket', (username, bucket % self.num_buckets, bucket, amount)),
+            ('SELECT SUM(warning_count) FROM warning_buckets WHERE username = ? AND bucket > ?', (username, oldest)),
+        ]
+
+    def increment(self, username):
+        """Add one warning for a user and return the count within the window."""
+        return self.increment_many([username])[0]
+
+    def increment_many(self, usernames):
+        """Add one warning per username (repeats allowed) in a single transaction; returns window counts in order."""
+        bucket = self._current_bucket()
+        statements = []
+        for username in usernames:
+            statements.extend(self._increment_statements(username, bucket))
+        if not statements:
+            return []
+        counts = [row[0] for row in self._transaction(statements)]
+
+        self._increments += len(usernames)
+        if self._increments >= self.PURGE_INTERVAL:
+            self._increments = 0
+            self.purge_expired()
+        return counts
+
+    def get(self, username):
+        """Return the number of warnings a user received within the window."""
+        oldest = self._current_bucket() - self.num_buckets
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT SUM(warning_count) FROM warning_buckets WHERE username = ? AND bucket > ?',
+                (username, oldest)
+            ).fetchone()
+        return row[0] or 0
+
+    def reset(self, username):
+        """Clear the warnings for a user."""
+        self._transaction([('DELETE FROM warning_buckets WHERE username = ?', (username,))])
+
+    def purge_expired(self):
+        """Drop buckets that fell out of the window, forgetting users idle for a whole window."""
+        oldest = self._current_bucket() - self.num_buckets
+        self._transaction([('DELETE FROM warning_buckets WHERE bucket <= ?', (oldest,))])
+
+    def import_counts(self, counts):
+        """Import legacy lifetime counters (e.g. from moderation_config.json) into the current bucket."""
+        bucket = self._current_bucket()
+        statements = []
+        for username, count in counts.items():
+            if int(count) > 0:
+                statements.extend(self._increment_statements(username, bucket, int(count)))
+        if statements:
+            self._transaction(statements)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
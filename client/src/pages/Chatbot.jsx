@@ -15,6 +15,9 @@ const BOT_TYPES = {
 // API endpoint for backend
 const API_ENDPOINT = "http://127.0.0.1:5000/api/chatbot";
 
+// How often to ask the backend whether an uploaded document is processed
+const JOB_POLL_INTERVAL_MS = 1500;
+
 const Chatbot = () => {
   // State variables
   const [isSidebarOpen, setSidebarOpen] = useState(true);
@@ -27,6 +30,7 @@ const Chatbot = () => {
   const [file, setFile] = useState(null);
   const [error, setError] = useState(null);
   const [isTyping, setIsTyping] = useState(false);
+  const [documentId, setDocumentId] = useState(null);
   
   // Refs
   const messagesEndRef = useRef(null);
@@ -58,7 +62,8 @@ const Chatbot = () => {
     try {
         const response = await axios.post(`${API_ENDPOINT}/askdoubt`, {
             question: message,
-            botType: selectedBotType
+            botType: selectedBotType,
+            documentId
         }, {
             headers: {
                 'Content-Type': 'application/json'
@@ -89,6 +94,25 @@ const Chatbot = () => {
     }
   };
 
+  // Uploads are processed in the background; poll the job until it is done
+  const waitForUploadJob = async (jobId) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const response = await axios.get(`${API_ENDPOINT}/jobs/${jobId}`);
+      if (!response.data.success) {
+        throw new Error(response.data.message);
+      }
+
+      const job = response.data.data;
+      if (job.status === "succeeded") {
+        return job.result;
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "Failed to process the file");
+      }
+    }
+  };
+
   // Fetch chat history on component mount
   useEffect(() => {
     fetchChatHistory();
@@ -236,6 +260,7 @@ const Chatbot = () => {
     setCurrentChatId(null);
     setMessages([{ text: botConfig[selectedBotType].greeting, sender: "bot" }]);
     setFile(null);
+    setDocumentId(null);
   };
 
   const scrollToBottom = () => {
@@ -298,14 +323,22 @@ const Chatbot = () => {
           }
         });
         
-        if (response.data.success) {
-          setMessages(prevMessages => [...prevMessages, { 
-            text: response.data.data.response, 
-            sender: "bot" 
-          }]);
-        } else {
+        if (!response.data.success) {
           throw new Error(response.data.message);
         }
+
+        // Images are answered right away; documents come back as a queued job
+        const result = response.data.data.jobId
+          ? await waitForUploadJob(response.data.data.jobId)
+          : response.data.data;
+
+        if (result.documentId) {
+          setDocumentId(result.documentId);
+        }
+        setMessages(prevMessages => [...prevMessages, { 
+          text: result.response, 
+          sender: "bot" 
+        }]);
       } else {
         // For text-only messages
         await sendmessagetogemini(userMessage);